@@ -4,12 +4,18 @@
 class Column(object):
     """Class representing columns in a table
     """
+    __slots__ = ('column_name', 'column_type', 'encoding', 'fk_reference',
+                 'fk_table', 'is_distkey', 'is_sortkey', '_is_primarykey',
+                 'is_null', 'is_not_null', 'position', '_owner')
+
     def __init__(self, column_name, column_type, encoding=None,
                  fk_reference=None, fk_table=None, is_distkey=False,
                  is_sortkey=False, is_primarykey=False, is_null=False,
                  is_not_null=False, position=None):
         """Constructor for Column class
         """
+        # Table notified when the key properties of the column change
+        self._owner = None
 
         self.column_name = column_name
         self.column_type = column_type
@@ -18,7 +24,7 @@ class Column(object):
         self.fk_table = fk_table
         self.is_distkey = is_distkey
         self.is_sortkey = is_sortkey
-        self.is_primarykey = is_primarykey
+        self._is_primarykey = is_primarykey
         self.is_null = is_null
         self.is_not_null = is_not_null
         self.position = position
@@ -30,6 +36,17 @@ class Column(object):
             self.is_not_null = True
             self.is_null = False
 
+    def __getstate__(self):
+        """State of the column for pickling, as slots have no __dict__
+        """
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore the state of the column after unpickling
+        """
+        for slot, value in state.iteritems():
+            setattr(self, slot, value)
+
     def __str__(self):
         """String output for the columns
         """
@@ -41,19 +58,36 @@ class Column(object):
     def primary(self):
         """Property for the column being part of primary key
         """
-        return self.is_primarykey
+        return self._is_primarykey
 
     @primary.setter
     def primary(self, value=True):
         """Set the primary flag for the column
         """
-        self.is_primarykey = value
+        self._is_primarykey = value
 
         # Force not null for primary key columns
-        if self.is_primarykey:
+        if self._is_primarykey:
             self.is_not_null = True
             self.is_null = False
 
+        if self._owner is not None:
+            self._owner.invalidate_columns()
+
+    is_primarykey = primary
+
+    @property
+    def owner(self):
+        """Table the column belongs to
+        """
+        return self._owner
+
+    @owner.setter
+    def owner(self, table):
+        """Set the table notified when the column changes
+        """
+        self._owner = table
+
     @property
     def name(self):
         """Get the name of the column
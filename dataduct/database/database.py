@@ -1,11 +1,17 @@
 """Script containing the database class object
 """
+from collections import defaultdict
 from copy import deepcopy
+import multiprocessing
+import re
+import traceback
 
+from .dependency_graph import DependencyGraph
 from .relation import Relation
 from .view import View
 from .table import Table
 from .sql import SqlScript
+from .parsers import warm_up_grammars
 
 from ..utils.helpers import atmost_one
 from ..utils.helpers import parse_path
@@ -15,21 +21,71 @@ from ..utils.exceptions import DatabaseInputError
 import logging
 logger = logging.getLogger(__name__)
 
+# Number of chunks handed to every worker when loading files in parallel
+CHUNKS_PER_WORKER = 4
+
+VARCHAR_REGEX = re.compile(
+    r'^\s*(?:VARCHAR|CHARACTER\s+VARYING|NVARCHAR)\s*\(\s*(\d+)\s*\)\s*$',
+    re.IGNORECASE)
+
+# Redshift can not alter the type of columns with these encodings
+UNALTERABLE_VARCHAR_ENCODINGS = ['BYTEDICT', 'RUNLENGTH', 'TEXT255', 'TEXT32K']
+
+
+def _load_relation(filename):
+    """Read the file and create the relation defined in it
+    """
+    with open(parse_path(filename)) as f:
+        script = SqlScript(f.read())
+    if script.creates_table():
+        return Table(script)
+    elif script.creates_view():
+        return View(script)
+    raise ValueError('File %s does not create a relation' % filename)
+
+
+def _load_relation_worker(filename):
+    """Load a relation in a worker process and return errors as values
+
+    Note:
+        Traceback objects can not be pickled back to the parent process, so
+        the traceback of the error is returned formatted as a string
+
+    Returns:
+        result(tuple): Relation and error with its formatted traceback, only
+            one of them is not None
+    """
+    try:
+        return _load_relation(filename), None
+    except Exception as error:
+        return None, (error, traceback.format_exc())
+
 
 class Database(object):
     """Class representing a database
     """
 
-    def __init__(self, relations=None, files=None):
+    def __init__(self, relations=None, files=None, workers=None):
         """Constructor for the database class
+
+        Args:
+            relations(list of Relation): Relations of the database
+            files(list of path): Files with the definitions of the relations
+            workers(int): Number of processes used to parse the files,
+                files are parsed in the current process if None or 1
         """
         self._relations = {}
+        self._graph = None
+
+        # Reverse indexes from a relation name to the relations using it
+        self._dependents = defaultdict(set)
+        self._foreign_key_references = defaultdict(list)
 
         if not atmost_one(relations, files):
             raise ValueError('Only one of relations and files should be given')
 
         if files:
-            relations = self._initialize_relations(files)
+            relations = self._initialize_relations(files, workers)
 
         if relations:
             for relation in relations:
@@ -41,19 +97,38 @@ class Database(object):
         return deepcopy(self)
 
     @staticmethod
-    def _initialize_relations(files):
+    def _initialize_relations(files, workers=None):
         """Read the files and create relations from the files
         """
+        if workers is None or workers <= 1 or len(files) <= 1:
+            relations = []
+            for filename in files:
+                try:
+                    relations.append(_load_relation(filename))
+                except Exception:
+                    logger.error('Could not load relation from %s', filename)
+                    raise
+            return relations
+
+        # Build the grammars once so that forked workers inherit them
+        warm_up_grammars()
+        chunksize = max(1, len(files) // (workers * CHUNKS_PER_WORKER))
+
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(_load_relation_worker, files, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
         relations = []
-        for filename in files:
-            with open(parse_path(filename)) as f:
-                script = SqlScript(f.read())
-                if script.creates_table():
-                    relations.append(Table(script))
-                elif script.creates_view():
-                    relations.append(View(script))
-                else:
-                    raise ValueError('File does not create a relation')
+        for filename, (relation, failure) in zip(files, results):
+            if failure is not None:
+                error, worker_traceback = failure
+                logger.error('Could not load relation from %s\n%s',
+                             filename, worker_traceback)
+                raise error
+            relations.append(relation)
         return relations
 
     def add_relation(self, relation):
@@ -65,6 +140,17 @@ class Database(object):
                 'Relation %s already added to database' % relation.full_name)
 
         self._relations[relation.full_name] = relation
+        self._graph = None
+
+        for dependency in relation.dependencies:
+            if dependency != relation.full_name:
+                self._dependents[dependency].add(relation.full_name)
+
+        if isinstance(relation, Table):
+            for column_names, ref_name, ref_columns in \
+                    relation.foreign_key_references():
+                self._foreign_key_references[ref_name].append(
+                    (relation.full_name, column_names, ref_columns))
 
     def relations(self):
         """Unsorted list of relations of the database
@@ -88,54 +174,47 @@ class Database(object):
         """
         return len([a for a in self.relations() if isinstance(a, Table)])
 
-    def has_cycles(self, relation=None, visited=None):
-        """Check if the database has no circular dependencies
-        """
-        if visited is None:
-            visited = list()
-
-        if relation:
-            # Don't include table as own dependency, ignore references not in DB
-            relations_to_check = [
-                self.relation(x) for x in relation.dependencies
-                if x != relation and self.relation(x) is not None]
-        else:
-            relations_to_check = self._relations.values()
-
-        for relation in relations_to_check:
-            if relation.full_name in visited:
-                return True
-            # Make a copy for immutability
-            visited_copy = deepcopy(visited)
-            visited_copy.append(relation.full_name)
-            if self.has_cycles(relation, visited_copy):
-                return True
-        return False
+    def dependency_graph(self):
+        """Dependency graph of the relations, built once and then reused
+        """
+        if self._graph is None:
+            self._graph = DependencyGraph(dict(
+                (x.full_name, x.dependencies) for x in self.relations()))
+        return self._graph
+
+    def cycles(self):
+        """Names of the relations that are part of each circular dependency
+        """
+        return self.dependency_graph().cycles()
+
+    def has_cycles(self):
+        """Check if the database has any circular dependencies
+        """
+        return self.dependency_graph().has_cycles()
+
+    def _check_cycles(self):
+        """Log the members of every circular dependency of the database
+        """
+        for cycle in self.cycles():
+            logger.warning('Database has a cycle between: %s',
+                           ', '.join(cycle))
 
     def sorted_relations(self):
         """Topological sort of the relations for dependency management
         """
-        if self.has_cycles():
-            logger.warning('Database has cycles')
+        self._check_cycles()
+        return [self.relation(x)
+                for x in self.dependency_graph().topological_sort()]
 
-        sorted_relations = []
-        graph = dict((x.full_name, x.dependencies) for x in self.relations())
-
-        # Run until the unsorted graph is empty
-        while graph:
-            acyclic = False
-            for relation_name, dependencies in graph.items():
-                for dependency in dependencies:
-                    if dependency in graph:
-                        break
-                else:
-                    acyclic = True
-                    graph.pop(relation_name)
-                    sorted_relations.append(self.relation(relation_name))
+    def sorted_relation_levels(self):
+        """Relations grouped into levels that only depend on earlier levels
 
-            if not acyclic:
-                raise RuntimeError("A cyclic dependency occurred")
-        return sorted_relations
+        Note:
+            Relations in the same level can be processed in parallel
+        """
+        self._check_cycles()
+        return [[self.relation(x) for x in level]
+                for level in self.dependency_graph().topological_levels()]
 
     def relations_script(self, function_name, **kwargs):
         """SQL Script for all the relations of the database
@@ -168,31 +247,297 @@ class Database(object):
         return self.relations_script(
             'recreate_script', grant_permissions=grant_permissions)
 
+    def _sorted_subset(self, relation_names):
+        """Topological sort of a subset of the relations of the database
+        """
+        graph = DependencyGraph(dict(
+            (x, self.relation(x).dependencies) for x in relation_names))
+        if graph.has_cycles():
+            logger.warning('Dependents have cycles, sorting them by name')
+            return sorted(relation_names)
+        return graph.topological_sort()
+
+    def _transitive_dependents(self, relation_name, relation_type=None):
+        """Names of all the relations that depend on the given relation
+
+        Args:
+            relation_name(str): Name of the relation
+            relation_type(class): Only follow dependents of the given type
+        """
+        visited = set()
+        pending = [relation_name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), list()):
+                if dependent in visited or dependent == relation_name:
+                    continue
+                if relation_type is not None and not isinstance(
+                        self.relation(dependent), relation_type):
+                    continue
+                visited.add(dependent)
+                pending.append(dependent)
+        return visited
+
+    def dependents(self, relation_name, transitive=False):
+        """Relations that depend on the relation with the given name
+
+        Args:
+            relation_name(str): Name of the relation
+            transitive(bool): Include the dependents of the dependents
+
+        Returns:
+            result(list of Relation): Direct dependents sorted by name, or
+                all dependents in topological order if transitive
+        """
+        if not transitive:
+            return [self.relation(x) for x in sorted(
+                self._dependents.get(relation_name, list()))
+                if x != relation_name]
+
+        return [self.relation(x) for x in self._sorted_subset(
+            self._transitive_dependents(relation_name))]
+
     def recreate_table_dependencies(self, table_name, grant_permissions=True):
         """Recreate the dependencies for a particular table from the database
+
+        Note:
+            Views are dropped with cascade, so views on top of the dependent
+            views are recreated as well
         """
         result = SqlScript()
-        for relation in self.relations():
-            if relation.full_name == table_name:
+
+        # Recreate foreign key relations
+        references = sorted(self._foreign_key_references.get(table_name, []))
+        for relation_name, column_names, ref_columns in references:
+            if relation_name == table_name:
                 # Continue as cannnot be dependecy of self
                 continue
+            result.append(
+                self.relation(relation_name).foreign_key_reference_script(
+                    source_columns=column_names,
+                    reference_name=table_name,
+                    reference_columns=ref_columns))
+
+        # Recreate views pointing to the table
+        views = self._transitive_dependents(table_name, View)
+        for view_name in self._sorted_subset(views):
+            result.append(self.relation(view_name).recreate_script(
+                grant_permissions=grant_permissions))
+        return result
+
+    @staticmethod
+    def _column_signature(column):
+        """Properties of a column that can only be changed by a copy
+        """
+        return (column.column_type.upper(), column.encoding,
+                column.is_not_null, column.primary)
+
+    @classmethod
+    def _widened_varchar(cls, current, target):
+        """Check if the column only changed by widening a VARCHAR, which
+        can be done in place
+
+        Returns:
+            result(str): New type of the column or None
+        """
+        if cls._column_signature(current)[1:] != \
+                cls._column_signature(target)[1:] or \
+                (current.encoding or '').upper() in \
+                UNALTERABLE_VARCHAR_ENCODINGS:
+            return None
+
+        current_match = VARCHAR_REGEX.match(current.column_type)
+        target_match = VARCHAR_REGEX.match(target.column_type)
+        if current_match is None or target_match is None or \
+                int(target_match.group(1)) < int(current_match.group(1)):
+            return None
+        return target.column_type
+
+    @classmethod
+    def _alter_table_script(cls, current, target):
+        """Sql script altering the current table into the target table
+
+        Note:
+            Columns can only be added at the end of the table and VARCHAR
+            columns can only be widened, all other changes to the columns
+            or keys require the rows to be copied to a new table
+
+        Returns:
+            result(SqlScript): Alter statements or None if a copy is needed
+        """
+        name = target.full_name
+        if current.primary_key_names != target.primary_key_names or \
+                current.sort_keys != target.sort_keys or \
+                current.dist_keys != target.dist_keys or \
+                current.diststyle != target.diststyle:
+            logger.warning('Keys of %s changed, it must be copied', name)
+            return None
+
+        current_names = [c.name for c in current.columns()]
+        target_names = [c.name for c in target.columns()]
+        dropped = [x for x in current_names if target.column(x) is None]
+        added = [x for x in target_names if current.column(x) is None]
+        kept = [x for x in current_names if target.column(x) is not None]
+
+        if kept + added != target_names:
+            logger.warning('Columns of %s were reordered, it must be copied',
+                           name)
+            return None
+
+        widened = list()
+        for column_name in kept:
+            current_column = current.column(column_name)
+            target_column = target.column(column_name)
+            if cls._column_signature(current_column) == \
+                    cls._column_signature(target_column):
+                continue
+
+            column_type = cls._widened_varchar(current_column, target_column)
+            if column_type is None:
+                logger.warning('Column %s of %s changed, it must be copied',
+                               column_name, name)
+                return None
+            widened.append((column_name, column_type))
+
+        for column_name in added:
+            if target.column(column_name).is_not_null:
+                logger.warning('Column %s of %s is not null, it must be '
+                               'copied', column_name, name)
+                return None
+
+        script = SqlScript()
+        for column_name in dropped:
+            script.append(current.drop_column_script(column_name))
+        for column_name, column_type in widened:
+            script.append(
+                target.alter_column_type_script(column_name, column_type))
+        for column_name in added:
+            script.append(target.add_column_script(target.column(column_name)))
+
+        current_references = current.foreign_key_references()
+        for column_names, ref_name, ref_columns in \
+                target.foreign_key_references():
+            if (column_names, ref_name, ref_columns) not in current_references:
+                script.append(target.foreign_key_reference_script(
+                    source_columns=column_names,
+                    reference_name=ref_name,
+                    reference_columns=ref_columns))
+        return script
+
+    @staticmethod
+    def _drop_foreign_keys_script(current, target):
+        """Sql script dropping the foreign keys removed from an altered table
+
+        Note:
+            Foreign keys on dropped columns are removed with the columns
+
+        Returns:
+            result(SqlScript): Drop constraint statements
+        """
+        script = SqlScript()
+        target_references = target.foreign_key_references()
+        for column_names, ref_name, ref_columns in \
+                current.foreign_key_references():
+            if (column_names, ref_name, ref_columns) in target_references:
+                continue
+            if any(target.column(x) is None for x in column_names):
+                continue
+            script.append(current.drop_foreign_key_script(column_names))
+        return script
+
+    def diff(self, other, grant_permissions=True):
+        """Sql script to migrate the relations of the database to another one
+
+        Tables are altered in place when possible, otherwise their rows are
+        copied to a table with the new definition that replaces them. Views
+        are only recreated if they changed or depend on a changed relation.
+
+        Args:
+            other(Database): Database with the target definitions
+            grant_permissions(bool): Grant permissions on created relations
+
+        Returns:
+            result(SqlScript): Migration script from this database to other
+        """
+        created, removed, copied = set(), set(), set()
+        altered, changed = dict(), set()
+
+        for relation in other.relations():
+            name = relation.full_name
+            current = self.relation(name)
+            if current is None or type(current) != type(relation):
+                created.add(name)
+            elif current.sql().sql() == relation.sql().sql():
+                continue
+            elif isinstance(relation, Table):
+                script = self._alter_table_script(current, relation)
+                if script is None:
+                    copied.add(name)
+                else:
+                    altered[name] = script
+            else:
+                changed.add(name)
 
-            if isinstance(relation, Table):
-                # Recreate foreign key relations
-                for column_names, ref_name, ref_columns in \
-                        relation.foreign_key_references():
-                    if ref_name == table_name:
-                        result.append(
-                            relation.foreign_key_reference_script(
-                                source_columns=column_names,
-                                reference_name=ref_name,
-                                reference_columns=ref_columns))
-
-            if isinstance(relation, View):
-                # Recreate view if pointing to table
-                if table_name in relation.dependencies:
-                    result.append(relation.recreate_script(
-                        grant_permissions=grant_permissions))
+        for relation in self.relations():
+            other_relation = other.relation(relation.full_name)
+            if other_relation is None or \
+                    type(other_relation) != type(relation):
+                removed.add(relation.full_name)
+
+        # Views are dropped with cascade, so rebuild everything on top of them
+        rebuilt = set(changed)
+        for name in copied | set(altered) | changed:
+            rebuilt.update(other._transitive_dependents(name, View))
+        rebuilt -= created
+
+        result = SqlScript()
+        # Dropped before replacing tables, whose CASCADE also drops the keys
+        for name in sorted(altered):
+            result.append(self._drop_foreign_keys_script(
+                self.relation(name), other.relation(name)))
+
+        for name in sorted(removed | rebuilt):
+            if isinstance(self.relation(name), View):
+                result.append(self.relation(name).drop_script())
+
+        for name in sorted(removed):
+            if isinstance(self.relation(name), Table):
+                result.append(self.relation(name).drop_script())
+
+        sorted_relations = other.sorted_relations()
+        for relation in sorted_relations:
+            if not isinstance(relation, Table):
+                continue
+            if relation.full_name in created:
+                result.append(relation.create_script(grant_permissions))
+            elif relation.full_name in copied:
+                current = self.relation(relation.full_name)
+                result.append(current.copy_through_script(
+                    relation, grant_permissions))
+
+        for name in sorted(altered):
+            result.append(altered[name])
+
+        # Restore the foreign keys dropped along with the replaced tables
+        for name in sorted(copied):
+            for table_name, column_names, ref_columns in sorted(
+                    other._foreign_key_references.get(name, list())):
+                if table_name in created | copied:
+                    continue
+                reference = (column_names, name, ref_columns)
+                if reference not in \
+                        self.relation(table_name).foreign_key_references():
+                    # New references are added with the table alterations
+                    continue
+                result.append(
+                    other.relation(table_name).foreign_key_reference_script(
+                        source_columns=column_names,
+                        reference_name=name,
+                        reference_columns=ref_columns))
+
+        for relation in sorted_relations:
+            if isinstance(relation, View) and \
+                    relation.full_name in created | rebuilt:
+                result.append(relation.create_script(grant_permissions))
         return result
 
     @staticmethod
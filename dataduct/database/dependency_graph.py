@@ -0,0 +1,196 @@
+"""Script containing the dependency graph class object
+"""
+import heapq
+
+
+class DependencyGraph(object):
+    """Directed graph of the dependencies between named nodes
+
+    The adjacency index is built once when the graph is created and the
+    cycles are found once on first use. Nodes are always visited in sorted
+    order so that all the results are deterministic.
+
+    Note:
+        Dependencies on the node itself or on nodes that are not part of the
+        graph are ignored
+    """
+    def __init__(self, dependencies):
+        """Constructor for the DependencyGraph class
+
+        Args:
+            dependencies(dict of str -> list of str): Map from every node of
+                the graph to the names of the nodes it depends on
+        """
+        self._dependencies = dict()
+        self._cycles = None
+        self._dependents = dict((node, set()) for node in dependencies)
+
+        for node, node_dependencies in dependencies.iteritems():
+            self._dependencies[node] = set(
+                d for d in node_dependencies
+                if d != node and d in self._dependents)
+
+            for dependency in self._dependencies[node]:
+                self._dependents[dependency].add(node)
+
+    def __len__(self):
+        """Number of nodes in the graph
+        """
+        return len(self._dependencies)
+
+    def nodes(self):
+        """Sorted list of the nodes of the graph
+        """
+        return sorted(self._dependencies)
+
+    def dependencies(self, node):
+        """Sorted list of the nodes that the node depends on
+        """
+        return sorted(self._dependencies[node])
+
+    def dependents(self, node):
+        """Sorted list of the nodes that depend on the node
+        """
+        return sorted(self._dependents[node])
+
+    def strongly_connected_components(self):
+        """Strongly connected components of the graph using Tarjan's algorithm
+
+        Returns:
+            result(list of list of str): Sorted components, dependencies of a
+                component are listed before the component itself
+        """
+        index = dict()
+        lowlink = dict()
+        stack = list()
+        on_stack = set()
+        components = list()
+
+        for root in self.nodes():
+            if root in index:
+                continue
+
+            # Iterative depth first search to avoid the recursion limit
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.dependencies(root)))]
+
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.dependencies(child))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                    if lowlink[node] == index[node]:
+                        component = list()
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(sorted(component))
+
+        return components
+
+    def cycles(self):
+        """Groups of nodes that depend on each other
+
+        Note:
+            The graph does not change after it is built, so the strongly
+            connected components are only computed once
+
+        Returns:
+            result(list of list of str): Members of each cycle in the graph
+        """
+        if self._cycles is None:
+            self._cycles = [
+                component for component in self.strongly_connected_components()
+                if len(component) > 1]
+        return [list(cycle) for cycle in self._cycles]
+
+    def has_cycles(self):
+        """Check if the graph has any circular dependencies
+        """
+        return len(self.cycles()) > 0
+
+    def _check_acyclic(self):
+        """Raise an error naming the cycles of the graph if there are any
+        """
+        cycles = self.cycles()
+        if cycles:
+            raise RuntimeError(
+                'A cyclic dependency occurred between: %s' % '; '.join(
+                    ', '.join(cycle) for cycle in cycles))
+
+    def topological_sort(self):
+        """Topological sort of the nodes using Kahn's algorithm
+
+        Note:
+            Ties are broken by picking the smallest node name first
+
+        Returns:
+            result(list of str): Nodes sorted after all their dependencies
+
+        Raises:
+            RuntimeError: If the graph has cycles
+        """
+        self._check_acyclic()
+
+        remaining = dict(
+            (node, len(deps)) for node, deps in self._dependencies.iteritems())
+        ready = [node for node, count in remaining.iteritems() if count == 0]
+        heapq.heapify(ready)
+
+        result = list()
+        while ready:
+            node = heapq.heappop(ready)
+            result.append(node)
+            for dependent in self._dependents[node]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        return result
+
+    def topological_levels(self):
+        """Group the nodes into levels that can be processed in parallel
+
+        Note:
+            Every node is in the level after the last of its dependencies
+
+        Returns:
+            result(list of list of str): Sorted nodes of each level
+
+        Raises:
+            RuntimeError: If the graph has cycles
+        """
+        self._check_acyclic()
+
+        remaining = dict(
+            (node, len(deps)) for node, deps in self._dependencies.iteritems())
+        level = sorted(
+            node for node, count in remaining.iteritems() if count == 0)
+
+        result = list()
+        while level:
+            result.append(level)
+            next_level = list()
+            for node in level:
+                for dependent in self._dependents[node]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        next_level.append(dependent)
+            level = sorted(next_level)
+        return result
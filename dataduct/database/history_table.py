@@ -1,15 +1,35 @@
 """Script containing the history table class object
 Child of the table class object
 """
+import re
 
 from .table import Table
+from .table import DELETE_IN
+from .table import comma_seperated
 from .sql import SqlScript
+from .sql import format_sql
 from .select_statement import SelectStatement
 
 HIST_EFFECTIVE_COLUMN = 'effective_ts'
 HIST_EXPIRATION_COLUMN = 'expiration_ts'
 HIST_EXPIRATION_MAX = '9999-12-31 23:59:59.999999'
 
+# Versions are consecutive if the next one starts within this interval
+HIST_GAP_TOLERANCE = '1 second'
+
+IAM_ROLE_REGEX = re.compile(
+    r'^arn:aws[a-z-]*:iam::[0-9]{12}:role/[a-zA-Z0-9_+=,.@/-]+$')
+
+HASH_FUNCTIONS = {
+    'md5': 'MD5({value})',
+    'fnv': 'FNV_HASH({value})',
+}
+
+MAX_VARCHAR_LENGTH = 65535
+
+# Characters of the text of a column hash, 32 for MD5 and 20 for FNV
+COLUMN_HASH_LENGTH = 32
+
 
 class HistoryTable(Table):
     """A history table is a table specifically designed to represent
@@ -31,136 +51,343 @@ class HistoryTable(Table):
             raise ValueError('History table must have effective and expiration'
                              ' timestamps')
 
-    def _select_current_script(self):
+    def _select_current_script(self, hash_column=None):
         """SQL script to select current view of table
         """
 
-        # Get all columns except for the two timestamps
+        # Get all columns except for the two timestamps and the hash
         selected_columns = [c.name for c in self.columns()
-                            if c.name != HIST_EFFECTIVE_COLUMN and
-                            c.name != HIST_EXPIRATION_COLUMN]
+                            if c.name not in [HIST_EFFECTIVE_COLUMN,
+                                              HIST_EXPIRATION_COLUMN,
+                                              hash_column]]
 
-        return SelectStatement("""
+        sql = format_sql("""
             SELECT {selected_columns}
             FROM {history_name}
             WHERE {expiration_column} = '{expiration_max}'
-            """.format(selected_columns=', '.join(selected_columns),
-                       history_name=self.full_name,
-                       expiration_column=HIST_EXPIRATION_COLUMN,
-                       expiration_max=HIST_EXPIRATION_MAX))
-
-    def _expire_history_script(self, source):
-        """SQL script to expire outdated records
-
-        Args:
-          source (Table): The source from which to update history
+            """, selected_columns=', '.join(selected_columns),
+                 history_name=self.full_name,
+                 expiration_column=HIST_EXPIRATION_COLUMN,
+                 expiration_max=HIST_EXPIRATION_MAX)
+        return SelectStatement.from_trusted_sql(
+            sql, selected_columns, [self.full_name])
 
-        Returns:
-          SqlScript: a SQL statement that removes outdated records
+    @staticmethod
+    def _hash_expression(relation_name, columns, hash_function):
+        """SQL expression hashing the values of the columns of a relation
 
-        A history row will be expired if:
-            It is currently unexpired (expiration timestamp is at max); and
-            either:
-                It's corresponding row in the source table has been changed; or
-                It's corresponding row in the source table has been deleted.
+        Note:
+            Every column is hashed separately and the hash of the row is the
+            hash of the separated column hashes, so that the concatenation
+            stays far below the VARCHAR limit for any number of columns.
+            NULL values are hashed as 'N', which no column hash equals.
         """
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError('Hash function must be one of %s' %
+                             ', '.join(sorted(HASH_FUNCTIONS)))
 
-        if not isinstance(source, Table):
-            raise ValueError('Source must be a table')
-
-        # Get the secondary columns of the table
-        secondary_columns = [column for column in source.columns()
-                             if not column.primary]
+        hash_template = HASH_FUNCTIONS[hash_function]
+        column_template = (
+            "CASE WHEN {relation}.{column} IS NULL THEN 'N' ELSE CAST(" +
+            hash_template.format(value='CAST({relation}.{column} AS '
+                                       'VARCHAR(%d))' % MAX_VARCHAR_LENGTH) +
+            " AS VARCHAR(%d)) END" % COLUMN_HASH_LENGTH)
+        value = " || '|' || ".join(
+            [column_template.format(relation=relation_name, column=column.name)
+             for column in columns])
+        return hash_template.format(value=value)
 
-        # There must be at least one primary and secondary key
-        if len(source.primary_keys) == 0:
-            raise ValueError('Source table must have a primary key')
-        if len(secondary_columns) == 0:
-            raise ValueError('Source table must have a non-primary column')
+    def _matching_primary_keys_condition(self, source, target_name=None):
+        """Condition matching the history rows with the rows of the source
+        """
+        if target_name is None:
+            target_name = self.full_name
 
-        # Expire if corresponding row in the source table has been changed
-        # First, match primary key info to determine corresponding rows
         same_statement =\
             '{history_name}.{column_name} = {source_name}.{column_name}'
-        matching_primary_keys_condition = ' AND '.join(
-            [same_statement.format(history_name=self.full_name,
+        return ' AND '.join(
+            [same_statement.format(history_name=target_name,
                                    source_name=source.full_name,
                                    column_name=column.name)
              for column in source.primary_keys]
         )
-        # Then, filter to get only the records that have changed
+
+    @staticmethod
+    def _not_expired_condition():
+        """Condition filtering the current rows of the history
+        """
+        return '{expiration_column} = \'{expiration_max}\''.format(
+            expiration_column=HIST_EXPIRATION_COLUMN,
+            expiration_max=HIST_EXPIRATION_MAX,
+        )
+
+    def _record_changed_condition(self, target_name, source, columns,
+                                  hash_function=None, hash_column=None):
+        """Condition matching the rows that differ from the source rows
+
+        Args:
+          target_name (str): Relation compared with the source
+          source (Table): Rows to compare with
+          columns (list of Column): Non-key columns that are compared
+          hash_function (str): Compare a 'md5' or 'fnv' hash of the columns
+          hash_column (str): Column of the target storing the hash of the row
+        """
         # A record has been changed if one of it's non-primary columns
         # are different
         different_statement = """
-            {history_name}.{column_name} != {source_name}.{column_name}
+            {target_name}.{column_name} != {source_name}.{column_name}
             OR (
-                {history_name}.{column_name} IS NULL
+                {target_name}.{column_name} IS NULL
                 AND {source_name}.{column_name} IS NOT NULL
             )
             OR (
-                {history_name}.{column_name} IS NOT NULL
+                {target_name}.{column_name} IS NOT NULL
                 AND {source_name}.{column_name} IS NULL
             )
             """
-        record_changed_condition = '(' + ' OR '.join(
-            [different_statement.format(history_name=self.full_name,
-                                        source_name=source.full_name,
-                                        column_name=column.name)
-             for column in secondary_columns]
-        ) + ')'
-        # Lastly, filter to get only the non-expired columns
-        # This statement will be reused for the removal check
-        not_expired_condition =\
-            '{expiration_column} = \'{expiration_max}\''.format(
-                expiration_column=HIST_EXPIRATION_COLUMN,
-                expiration_max=HIST_EXPIRATION_MAX,
-            )
-        # Expire changed columns
-        script = SqlScript("""
+        if hash_function is not None:
+            source_hash = self._hash_expression(
+                source.full_name, columns, hash_function)
+            if hash_column is not None:
+                # Rows written before the hash column existed have no hash
+                return '({target}.{hash} IS NULL OR {target}.{hash} != ' \
+                    '{source_hash})'.format(target=target_name,
+                                            hash=hash_column,
+                                            source_hash=source_hash)
+            return '%s != %s' % (self._hash_expression(
+                target_name, columns, hash_function), source_hash)
+
+        return '( ' + ' OR '.join(
+            [format_sql(different_statement,
+                        target_name=target_name,
+                        source_name=source.full_name,
+                        column_name=column.name)
+             for column in columns]
+        ) + ' )'
+
+    def _expire_changed_script(self, source, hash_function=None,
+                               hash_column=None):
+        """SQL script to expire the records changed in the source
+
+        Args:
+          source (Table): Rows to compare the current history with
+          hash_function (str): Compare a 'md5' or 'fnv' hash of the
+            non-key columns instead of every column
+          hash_column (str): History column storing the hash of the row
+
+        Returns:
+          SqlScript: a SQL statement that expires the changed records
+        """
+
+        if not isinstance(source, Table):
+            raise ValueError('Source must be a table')
+
+        # Get the secondary columns of the table
+        secondary_columns = [column for column in source.columns()
+                             if not column.primary]
+
+        # There must be at least one primary and secondary key
+        if len(source.primary_keys) == 0:
+            raise ValueError('Source table must have a primary key')
+        if len(secondary_columns) == 0:
+            raise ValueError('Source table must have a non-primary column')
+
+        record_changed_condition = self._record_changed_condition(
+            self.full_name, source, secondary_columns, hash_function,
+            hash_column)
+
+        return SqlScript.from_trusted_sql(format_sql("""
             UPDATE {history_name}
                 SET {expiration_column} = SYSDATE - INTERVAL '0.000001 seconds'
             FROM {source_name}
             WHERE {matching_primary_keys}
                 AND {record_changed}
-                AND {not_expired};
-            """.format(history_name=self.full_name,
-                       expiration_column=HIST_EXPIRATION_COLUMN,
-                       source_name=source.full_name,
-                       matching_primary_keys=matching_primary_keys_condition,
-                       record_changed=record_changed_condition,
-                       not_expired=not_expired_condition))
-
-        # Expire if corresponding row in the source table has been deleted
+                AND {not_expired}
+            """, history_name=self.full_name,
+                 expiration_column=HIST_EXPIRATION_COLUMN,
+                 source_name=source.full_name,
+                 matching_primary_keys=self._matching_primary_keys_condition(
+                     source),
+                 record_changed=record_changed_condition,
+                 not_expired=self._not_expired_condition()))
+
+    def _expire_deleted_script(self, source):
+        """SQL script to expire the records deleted from the source
+
+        Args:
+          source (Table): Complete source table
+
+        Returns:
+          SqlScript: a SQL statement that expires the deleted records
+        """
+        if len(source.primary_keys) == 0:
+            raise ValueError('Source table must have a primary key')
+
         # Filter to get the history rows which have primary keys
-        # that are no longer in the source table
-        primary_keys = ",".join([name for name in source.primary_key_names])
-        missing_primary_keys_condition = """
-            (
-                {primary_keys}
-            )
-            NOT IN (
-                SELECT {primary_keys}
+        # that are no longer in the source table, NOT EXISTS is planned as
+        # an anti-join unlike NOT IN
+        missing_primary_keys_condition = format_sql("""
+            NOT EXISTS (
+                SELECT 1
                 FROM {source_name}
+                WHERE {matching_primary_keys}
             )
-            """.format(primary_keys=primary_keys,
-                       source_name=source.full_name)
+            """, source_name=source.full_name,
+                 matching_primary_keys=self._matching_primary_keys_condition(
+                     source))
 
-        script.append("""
+        return SqlScript.from_trusted_sql(format_sql("""
             UPDATE {history_name}
                 SET {expiration_column} = SYSDATE - INTERVAL '0.000001 seconds'
             WHERE {missing_primary_keys}
-                AND {not_expired};
-            """.format(history_name=self.full_name,
-                       expiration_column=HIST_EXPIRATION_COLUMN,
-                       missing_primary_keys=missing_primary_keys_condition,
-                       not_expired=not_expired_condition))
+                AND {not_expired}
+            """, history_name=self.full_name,
+                 expiration_column=HIST_EXPIRATION_COLUMN,
+                 missing_primary_keys=missing_primary_keys_condition,
+                 not_expired=self._not_expired_condition()))
+
+    def _expire_history_script(self, source, hash_function=None,
+                               hash_column=None):
+        """SQL script to expire outdated records
+
+        Args:
+          source (Table): The source from which to update history
+          hash_function (str): Compare a 'md5' or 'fnv' hash of the
+            non-key columns instead of every column
+          hash_column (str): History column storing the hash of the row
+
+        Returns:
+          SqlScript: a SQL statement that removes outdated records
+
+        A history row will be expired if:
+            It is currently unexpired (expiration timestamp is at max); and
+            either:
+                It's corresponding row in the source table has been changed; or
+                It's corresponding row in the source table has been deleted.
+        """
+        script = self._expire_changed_script(
+            source, hash_function, hash_column)
+        script.append(self._expire_deleted_script(source))
         return script
 
-    def update_history_script(self, source):
+    def _fill_current_script(self, current_table, hash_column=None):
+        """SQL script copying the current history into an empty current table
+
+        Note:
+            Only the first update fills the table, as later updates keep it
+            in sync with the history
+        """
+        select = self._select_current_script(hash_column)
+        return SqlScript.from_trusted_sql(format_sql("""
+            INSERT INTO {current_name} (
+                SELECT *
+                FROM ( {select} ) current_rows
+                WHERE NOT EXISTS (SELECT 1 FROM {current_name}))
+            """, current_name=current_table.full_name,
+                 select=select.sql()))
+
+    def _remove_outdated_current_script(self, current_table, source,
+                                        changed_source, detect_deletes,
+                                        hash_function=None):
+        """SQL script deleting the changed and deleted rows of the current
+        table, the rows left match the unexpired history rows
+
+        Args:
+          current_table (Table): Current rows of the history
+          source (Table): Complete source table
+          changed_source (Table): Rows of the source that may have changed
+          detect_deletes (bool): Delete the rows deleted from the source
+          hash_function (str): Compare a 'md5' or 'fnv' hash of the
+            non-key columns instead of every column
+        """
+        secondary_columns = [column for column in changed_source.columns()
+                             if not column.primary]
+
+        result = SqlScript.from_trusted_sql(format_sql("""
+            DELETE FROM {current_name}
+            USING {source_name}
+            WHERE {matching_primary_keys}
+                AND {record_changed}
+            """, current_name=current_table.full_name,
+                 source_name=changed_source.full_name,
+                 matching_primary_keys=self._matching_primary_keys_condition(
+                     changed_source, current_table.full_name),
+                 record_changed=self._record_changed_condition(
+                     current_table.full_name, changed_source,
+                     secondary_columns, hash_function)))
+
+        if detect_deletes:
+            result.append(SqlScript.from_trusted_sql(format_sql("""
+                DELETE FROM {current_name}
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM {source_name}
+                    WHERE {matching_primary_keys}
+                )
+                """, current_name=current_table.full_name,
+                     source_name=source.full_name,
+                     matching_primary_keys=\
+                         self._matching_primary_keys_condition(
+                             source, current_table.full_name))))
+        return result
+
+    def _watermark_changes(self, source, watermark_column):
+        """Rows of the source newer than the latest row of the history
+
+        Args:
+          source (Table): The source from which to update history
+          watermark_column (str): Column increasing with every change
+        """
+        if source.column(watermark_column) is None or \
+                self.column(watermark_column) is None:
+            raise ValueError('Watermark column %s must be in the source and '
+                             'the history table' % watermark_column)
+
+        sql = format_sql("""
+            SELECT *
+            FROM {source_name}
+            WHERE {watermark} > (SELECT MAX({watermark}) FROM {history_name})
+                OR (SELECT MAX({watermark}) FROM {history_name}) IS NULL
+            """, source_name=source.full_name,
+                 watermark=watermark_column,
+                 history_name=self.full_name)
+        return SelectStatement.from_trusted_sql(
+            sql, [c.name for c in source.columns()],
+            [source.full_name, self.full_name])
+
+    def update_history_script(self, source, delete_method=DELETE_IN,
+                              staging_attributes=None, hash_function=None,
+                              hash_column=None, changes=None,
+                              watermark_column=None, detect_deletes=None,
+                              current_table=None):
         """SQL script to update the history table
 
+        By default the whole source is compared with the history. In the
+        incremental mode only the rows of a change set, given as a select
+        statement or as the source rows past the watermark of the history,
+        are compared, so history rows with other keys are left untouched.
+
+        A current table with the columns of the source can be kept in sync
+        with the unexpired history rows, in the same transaction. The
+        unchanged rows are then found in the current table instead of the
+        whole history.
+
         Args:
           source (Table): The source from which to update history
+          delete_method (str): How unchanged rows are matched, 'in' or 'join'
+          staging_attributes (dict): Arguments of the temporary clone of the
+            source, overriding its inherited keys
+          hash_function (str): Detect changed rows with a 'md5' or 'fnv'
+            hash of the non-key columns
+          hash_column (str): Last column of the history table, storing the
+            hash of every row so that it is not computed for history rows
+          changes (SelectStatement): Changed rows of the source, with the
+            columns of the source
+          watermark_column (str): Column increasing with every change of a
+            source row, rows past its latest value in history are changed
+          detect_deletes (bool): Expire the history rows deleted from the
+            source, by default only done without a change set
+          current_table (Table): Table with the current rows of the history
 
         Returns:
           SqlScript: a SQL statement that updates history
@@ -172,31 +399,300 @@ class HistoryTable(Table):
         if not isinstance(source, Table):
             raise ValueError('Source must be a table')
 
+        if changes is not None and watermark_column is not None:
+            raise ValueError('Only one of changes and watermark column')
+        if watermark_column is not None:
+            changes = self._watermark_changes(source, watermark_column)
+        if detect_deletes is None:
+            detect_deletes = changes is None
+
+        if hash_column is not None:
+            if hash_function is None:
+                raise ValueError('Hash column needs a hash function')
+            if self.columns()[-1].name != hash_column:
+                raise ValueError('Hash column must be the last column')
+
+        if current_table is not None and \
+                [c.name for c in current_table.columns()] != \
+                [c.name for c in source.columns()]:
+            raise ValueError('Current table must have the columns of the '
+                             'source')
+
         # Create a temporary copy of the source relation as another table
-        temp_table = Table(source.temporary_clone_script())
+        temp_table = source.temporary_clone(**(staging_attributes or dict()))
         result = temp_table.create_script(grant_permissions=False)
+        if current_table is not None:
+            result.append(self._fill_current_script(
+                current_table, hash_column))
 
         # Insert the values of the original table into the temp table
-        result.append(temp_table.insert_script(source))
+        if changes is None:
+            result.append(temp_table.insert_script(source))
+            changed_source = source
+        else:
+            # Only the rows of the change set are compared with the history
+            result.append(temp_table.insert_script(changes))
+            changed_source = temp_table
 
         # Expire outdated records
-        result.append(self._expire_history_script(source))
+        result.append(self._expire_changed_script(
+            changed_source, hash_function, hash_column))
+        if detect_deletes:
+            result.append(self._expire_deleted_script(source))
 
         # Delete records from the temp table that have not changed
+        if current_table is None:
+            current_rows = self._select_current_script(hash_column)
+        else:
+            result.append(self._remove_outdated_current_script(
+                current_table, source, changed_source, detect_deletes,
+                hash_function))
+            current_rows = current_table
         result.append(
             temp_table.delete_matching_rows_script(
-                self._select_current_script()))
+                current_rows, delete_method))
 
         # Insert the remaining rows into destination
-        select_statement = SelectStatement("""
+        column_names = [c.name for c in temp_table.columns()]
+        selected_columns = list(column_names)
+        if hash_column is not None:
+            selected_columns.append(self._hash_expression(
+                temp_table.full_name,
+                [c for c in temp_table.columns() if not c.primary],
+                hash_function))
+            column_names.append(hash_column)
+
+        select_statement = SelectStatement.from_trusted_sql(format_sql("""
             SELECT SYSDATE, '{expiration_max}'::TIMESTAMP, {columns}
             FROM {temp_table_name}
-            """.format(expiration_max=HIST_EXPIRATION_MAX,
-                       columns=', '.join(
-                           [c.name for c in temp_table.columns()]),
-                       temp_table_name=temp_table.full_name))
+            """, expiration_max=HIST_EXPIRATION_MAX,
+                 columns=', '.join(selected_columns),
+                 temp_table_name=temp_table.full_name),
+            [HIST_EFFECTIVE_COLUMN, HIST_EXPIRATION_COLUMN] + column_names,
+            [temp_table.full_name])
         result.append(self.insert_script(select_statement))
+        if current_table is not None:
+            result.append(current_table.insert_script(temp_table))
 
         # Drop the temp table, in case the temporary flag isn't enough
         result.append(temp_table.drop_script())
+
+        if current_table is not None:
+            # The current table must never be out of sync with the history
+            result = result.wrap_transaction()
+        return result
+
+    def _key_columns(self, key_columns=None):
+        """Columns identifying the rows that the versions belong to
+
+        Args:
+          key_columns (list of str): Names of the key columns, defaults to
+            the primary keys of the history table other than the timestamps
+        """
+        if key_columns is None:
+            key_columns = [c.name for c in self.primary_keys
+                           if c.name not in [HIST_EFFECTIVE_COLUMN,
+                                             HIST_EXPIRATION_COLUMN]]
+        if len(key_columns) == 0:
+            raise ValueError('History table needs key columns')
+
+        for name in key_columns:
+            if self.column(name) is None:
+                raise ValueError('Key column %s is not in the history table' %
+                                 name)
+        return [self.column(name) for name in key_columns]
+
+    def compaction_script(self, key_columns=None, batch_count=1,
+                          gap_tolerance=HIST_GAP_TOLERANCE,
+                          hash_function=None):
+        """SQL script merging consecutive versions with identical values
+
+        The keys are split into batches of ranges of the first key column.
+        Every batch is rewritten in its own transaction, consecutive versions
+        of a key with the same values are replaced by a single version
+        spanning all of them.
+
+        Args:
+          key_columns (list of str): Columns identifying the versioned rows
+          batch_count (int): Number of key ranges compacted separately
+          gap_tolerance (str): Interval allowed between the expiration of a
+            version and the start of the next for them to be consecutive
+          hash_function (str): Compare a 'md5' or 'fnv' hash of the values
+            instead of every column
+
+        Returns:
+          SqlScript: a SQL script that compacts the history
+        """
+        if batch_count < 1:
+            raise ValueError('Batch count must be positive')
+
+        keys = self._key_columns(key_columns)
+        key_names = [c.name for c in keys]
+        values = [c for c in self.columns()
+                  if c.name not in key_names + [HIST_EFFECTIVE_COLUMN,
+                                                HIST_EXPIRATION_COLUMN]]
+        if len(values) == 0:
+            raise ValueError('History table must have a non-key column')
+
+        window = 'OVER (PARTITION BY %s ORDER BY %s)' % (
+            comma_seperated(key_names), HIST_EFFECTIVE_COLUMN)
+        if hash_function is not None:
+            row_hash = self._hash_expression(
+                'history_rows', values, hash_function)
+            same_values = 'LAG(%s) %s = %s' % (row_hash, window, row_hash)
+        else:
+            same_values = ' AND '.join(
+                ['(LAG({column}) {window} = {column} OR '
+                 '(LAG({column}) {window} IS NULL AND {column} IS NULL))'
+                 .format(column=c.name, window=window) for c in values])
+
+        # Aggregate the versions of every island of consecutive versions
+        selected_columns = list()
+        for column in self.columns():
+            if column.name == HIST_EFFECTIVE_COLUMN:
+                selected_columns.append('MIN(%s)' % column.name)
+            elif column.name == HIST_EXPIRATION_COLUMN:
+                selected_columns.append('MAX(%s)' % column.name)
+            else:
+                selected_columns.append(column.name)
+
+        ranges_name = self.table_name + '_ranges'
+        result = SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s' % ranges_name,
+            format_sql("""
+                CREATE TEMPORARY TABLE {ranges_name} AS (
+                    SELECT batch, MIN(value) min_value, MAX(value) max_value
+                    FROM (
+                        SELECT value, NTILE({batch_count}) OVER (
+                            ORDER BY value) batch
+                        FROM (
+                            SELECT DISTINCT {first_key} AS value
+                            FROM {history_name}
+                            WHERE {first_key} IS NOT NULL) key_values
+                    ) key_batches
+                    GROUP BY batch)
+            """, ranges_name=ranges_name,
+                 batch_count=batch_count,
+                 first_key=key_names[0],
+                 history_name=self.full_name))
+
+        in_batch = format_sql("""
+            {ranges_name}.batch = {{batch}}
+            AND {history_name}.{first_key} BETWEEN
+                {ranges_name}.min_value AND {ranges_name}.max_value
+        """, ranges_name=ranges_name,
+             history_name='{history_name}',
+             first_key=key_names[0])
+
+        temp_table = self.temporary_clone(inherit_attributes=True)
+        for batch in range(1, batch_count + 1):
+            batch_script = temp_table.create_script(grant_permissions=False)
+            batch_script.append(SqlScript.from_trusted_sql(format_sql("""
+                INSERT INTO {temp_name} (
+                    SELECT {selected_columns}
+                    FROM (
+                        SELECT *, SUM(new_version) OVER (
+                            PARTITION BY {key_names} ORDER BY {effective}
+                            ROWS UNBOUNDED PRECEDING) version
+                        FROM (
+                            SELECT history_rows.*,
+                                CASE WHEN {same_values}
+                                    AND LAG({expiration}) {window} +
+                                        INTERVAL '{gap_tolerance}' >=
+                                        {effective}
+                                THEN 0 ELSE 1 END new_version
+                            FROM {history_name} history_rows, {ranges_name}
+                            WHERE {in_batch}
+                        ) versions
+                    ) islands
+                    GROUP BY {group_by})
+            """, temp_name=temp_table.full_name,
+                 selected_columns=comma_seperated(selected_columns),
+                 key_names=comma_seperated(key_names),
+                 effective=HIST_EFFECTIVE_COLUMN,
+                 same_values=same_values,
+                 expiration=HIST_EXPIRATION_COLUMN,
+                 window=window,
+                 gap_tolerance=gap_tolerance,
+                 history_name=self.full_name,
+                 ranges_name=ranges_name,
+                 in_batch=in_batch.format(
+                     history_name='history_rows', batch=batch),
+                 group_by=comma_seperated(
+                     key_names + ['version'] + [c.name for c in values]))))
+
+            # Replace the versions of the batch with the compacted versions
+            batch_script.append(SqlScript.from_trusted_sql(
+                format_sql("""
+                    DELETE FROM {history_name}
+                    USING {ranges_name}
+                    WHERE {in_batch}
+                """, history_name=self.full_name,
+                     ranges_name=ranges_name,
+                     in_batch=in_batch.format(
+                         history_name=self.full_name, batch=batch))))
+            batch_script.append(self.insert_script(temp_table))
+            batch_script.append(temp_table.drop_script())
+            result.append(batch_script.wrap_transaction())
+
+        result.append(SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s' % ranges_name))
         return result
+
+    def retention_script(self, horizon, archive_table=None,
+                         archive_path=None, archive_iam_role=None):
+        """SQL script purging the versions that expired before a horizon
+
+        The versions are copied into an archive table or unloaded to S3
+        before they are deleted, in the same transaction.
+
+        Args:
+          horizon (str): SQL expression of the oldest expiration timestamp
+            that is kept, e.g. SYSDATE - INTERVAL '365 days'
+          archive_table (Table): Table with the columns of the history the
+            purged versions are inserted into
+          archive_path (str): S3 prefix the purged versions are unloaded to
+          archive_iam_role (str): ARN of the IAM role the cluster assumes to
+            unload to S3, so that no secret is written into the script
+
+        Returns:
+          SqlScript: a SQL script that purges the expired versions
+        """
+        if archive_path is not None:
+            if archive_iam_role is None:
+                raise ValueError('Unloading to S3 needs an IAM role')
+            if not IAM_ROLE_REGEX.match(archive_iam_role):
+                raise ValueError('Invalid IAM role ARN: %s' % archive_iam_role)
+
+        expired = format_sql("""
+            SELECT *
+            FROM {history_name}
+            WHERE {expiration} < {horizon}
+        """, history_name=self.full_name,
+             expiration=HIST_EXPIRATION_COLUMN,
+             horizon=horizon)
+
+        result = SqlScript()
+        if archive_table is not None:
+            result.append(archive_table.insert_script(
+                SelectStatement.from_trusted_sql(
+                    expired, [c.name for c in self.columns()],
+                    [self.full_name])))
+
+        if archive_path is not None:
+            result.append(SqlScript.from_trusted_sql(format_sql("""
+                UNLOAD ('{expired}')
+                TO '{archive_path}'
+                IAM_ROLE '{iam_role}'
+                DELIMITER '\\t' ESCAPE NULL AS 'NULL' GZIP ALLOWOVERWRITE
+            """, expired=expired.replace("'", "''"),
+                 archive_path=archive_path,
+                 iam_role=archive_iam_role)))
+
+        result.append(SqlScript.from_trusted_sql(format_sql("""
+            DELETE FROM {history_name}
+            WHERE {expiration} < {horizon}
+        """, history_name=self.full_name,
+             expiration=HIST_EXPIRATION_COLUMN,
+             horizon=horizon)))
+        return result.wrap_transaction()
@@ -0,0 +1,133 @@
+"""Script deciding the maintenance a table needs after it is loaded
+
+The decisions are based on the statistics of the table in SVV_TABLE_INFO,
+so that ANALYZE and VACUUM are only issued when they are worth their cost.
+"""
+from .sql import SqlScript
+from .sql import format_sql
+
+import logging
+logger = logging.getLogger(__name__)
+
+ANALYZE = 'ANALYZE'
+VACUUM_DELETE = 'VACUUM DELETE ONLY'
+VACUUM_SORT = 'VACUUM SORT ONLY'
+
+# Thresholds are percentages of the rows of the table
+DEFAULT_THRESHOLDS = {
+    'analyze_threshold': 10.0,
+    'vacuum_delete_threshold': 20.0,
+    'vacuum_sort_threshold': 20.0,
+}
+
+TABLE_INFO_COLUMNS = ['tbl_rows', 'estimated_visible_rows', 'stats_off',
+                      'unsorted']
+
+
+def table_info_script(table_name):
+    """Sql script selecting the statistics of the table from SVV_TABLE_INFO
+
+    Args:
+        table_name(str): Full name of the table, in the public schema if it
+            is not qualified
+    """
+    if '.' in table_name:
+        schema_name, table_name = table_name.split('.', 1)
+    else:
+        schema_name = 'public'
+
+    return SqlScript.from_trusted_sql(format_sql("""
+        SELECT {columns}
+        FROM svv_table_info
+        WHERE "schema" = '{schema_name}' AND "table" = '{table_name}'
+    """, columns=', '.join(TABLE_INFO_COLUMNS),
+         schema_name=schema_name,
+         table_name=table_name))
+
+
+def _percentage(part, total):
+    """Part as a percentage of the total, zero for empty totals
+    """
+    if not total:
+        return 0.0
+    return 100.0 * part / total
+
+
+def maintenance_decisions(table_info, analyze_threshold=None,
+                          vacuum_delete_threshold=None,
+                          vacuum_sort_threshold=None):
+    """Decide which maintenance commands the table needs
+
+    Args:
+        table_info(dict): Row of SVV_TABLE_INFO for the table with the
+            TABLE_INFO_COLUMNS, None if the table is not listed as it is empty
+        analyze_threshold(float): Percentage of stale statistics for ANALYZE
+        vacuum_delete_threshold(float): Percentage of deleted rows for
+            VACUUM DELETE ONLY
+        vacuum_sort_threshold(float): Percentage of unsorted rows for
+            VACUUM SORT ONLY
+
+    Returns:
+        result(list of tuple): The command, whether it should run and the
+            reason for every command, in the order they should run
+    """
+    if analyze_threshold is None:
+        analyze_threshold = DEFAULT_THRESHOLDS['analyze_threshold']
+    if vacuum_delete_threshold is None:
+        vacuum_delete_threshold = DEFAULT_THRESHOLDS['vacuum_delete_threshold']
+    if vacuum_sort_threshold is None:
+        vacuum_sort_threshold = DEFAULT_THRESHOLDS['vacuum_sort_threshold']
+
+    if table_info is None:
+        reason = 'table has no rows in SVV_TABLE_INFO'
+        return [(command, False, reason)
+                for command in [VACUUM_DELETE, VACUUM_SORT, ANALYZE]]
+
+    total_rows = table_info['tbl_rows'] or 0
+    visible_rows = table_info['estimated_visible_rows'] or 0
+    decisions = list()
+
+    # Deleted rows are kept in the table until it is vacuumed
+    deleted = _percentage(max(total_rows - visible_rows, 0), total_rows)
+    decisions.append((
+        VACUUM_DELETE, deleted >= vacuum_delete_threshold,
+        '%.1f%% of the rows are deleted, threshold %.1f%%' % (
+            deleted, vacuum_delete_threshold)))
+
+    unsorted = table_info['unsorted']
+    if unsorted is None:
+        decisions.append((VACUUM_SORT, False, 'table has no sort key'))
+    else:
+        decisions.append((
+            VACUUM_SORT, unsorted >= vacuum_sort_threshold,
+            '%.1f%% of the rows are unsorted, threshold %.1f%%' % (
+                unsorted, vacuum_sort_threshold)))
+
+    # The load activities do not report their row counts, the staleness of
+    # the statistics measures the rows changed since the last ANALYZE
+    stale = table_info['stats_off'] or 0.0
+    decisions.append((
+        ANALYZE, stale >= analyze_threshold,
+        'statistics are %.1f%% stale, threshold %.1f%%' % (
+            stale, analyze_threshold)))
+    return decisions
+
+
+def maintenance_script(table_name, decisions):
+    """Sql script running the maintenance commands that were decided on
+
+    Note:
+        VACUUM can not run inside a transaction block
+
+    Args:
+        table_name(str): Full name of the table
+        decisions(list of tuple): Output of maintenance_decisions
+    """
+    commands = list()
+    for command, run, reason in decisions:
+        if run:
+            logger.info('Running %s on %s: %s', command, table_name, reason)
+            commands.append('%s %s' % (command, table_name))
+        else:
+            logger.info('Skipping %s on %s: %s', command, table_name, reason)
+    return SqlScript.from_trusted_sql(*commands)
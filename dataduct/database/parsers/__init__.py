@@ -4,10 +4,21 @@ from .transform import remove_transactional
 from .transform import split_statements
 from .transform import remove_newlines
 
+from .lexer import lex_statements
+
 from .select_query import parse_select_dependencies
 from .select_query import parse_select_columns
 from .select_query import parse_column_name
+from .select_query import parse_select_statement
 
 from .create_table import parse_create_table
 from .create_table import create_exists_clone
 from .create_view import parse_create_view
+
+from .registry import get_grammar
+from .registry import register_grammar
+from .registry import unregister_grammar
+from .registry import warm_up_grammars
+
+from .cache import cached_parse
+from .cache import ParseCache
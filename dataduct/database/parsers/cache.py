@@ -0,0 +1,216 @@
+"""Persistent cache for the output of the SQL parsers
+"""
+import cPickle as pickle
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from pyparsing import __version__ as pyparsing_version
+from pyparsing import ParseException
+
+from ...config import Config
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Bump the version whenever the output of a parser changes
+PARSER_VERSION = '1'
+
+PARSE_CACHE_DIR = 'PARSE_CACHE_DIR'
+PARSE_CACHE_SIZE = 'PARSE_CACHE_SIZE'
+
+# Entries kept in memory and in the cache directory
+DEFAULT_CACHE_SIZE = 10000
+
+
+class ParseCache(object):
+    """Cache of parser results keyed by the hash of the parsed string
+
+    Results are kept in memory and optionally persisted in a directory so
+    that later runs can skip parsing statements that did not change. Failed
+    parses are cached as well, as the relation type of a file is found with
+    trial parses. Past max_size entries the least recently used ones are
+    dropped from memory and the oldest files are removed from the directory.
+    """
+    def __init__(self, directory=None, max_size=DEFAULT_CACHE_SIZE):
+        """Constructor for the ParseCache class
+
+        Args:
+            directory(path): Directory for the cache, memory only if None
+            max_size(int): Maximum number of entries in memory and on disk
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._file_count = None
+
+    @staticmethod
+    def _key(parser, string):
+        """Hash of the parser version, the parser and the parsed string
+        """
+        digest = hashlib.sha1()
+        for part in [PARSER_VERSION, pyparsing_version, parser.__module__,
+                     parser.__name__, string]:
+            if isinstance(part, unicode):
+                part = part.encode('utf-8')
+            digest.update(part)
+            digest.update('\0')
+        return digest.hexdigest()
+
+    def _read(self, key):
+        """Read an entry from the cache directory
+
+        Returns:
+            result(tuple): Pickled entry and its value, None if unreadable
+        """
+        if self.directory is None:
+            return None
+
+        try:
+            with open(os.path.join(self.directory, key), 'rb') as f:
+                entry = f.read()
+            return entry, pickle.loads(entry)
+        except Exception:
+            return None
+
+    def _write(self, key, entry):
+        """Atomically write an entry to the cache directory
+        """
+        if self.directory is None:
+            return
+
+        temp_path = None
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            if self._file_count is None:
+                self._file_count = len(os.listdir(self.directory))
+            handle, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(handle, 'wb') as f:
+                f.write(entry)
+            path = os.path.join(self.directory, key)
+            exists = os.path.exists(path)
+            os.rename(temp_path, path)
+            temp_path = None
+            if not exists:
+                self._file_count += 1
+            if self._file_count > self.max_size:
+                self._prune()
+        except (IOError, OSError) as error:
+            logger.debug('Could not write to parse cache: %s', error)
+        finally:
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        """Remove the oldest files of the cache directory past max_size
+
+        Note:
+            Only called once the tracked file count passes max_size, so the
+            directory is not listed on every write
+        """
+        paths = [os.path.join(self.directory, name)
+                 for name in os.listdir(self.directory)]
+        self._file_count = len(paths)
+        if len(paths) <= self.max_size:
+            return
+
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_size]:
+            try:
+                os.remove(path)
+                self._file_count -= 1
+            except OSError:
+                pass
+
+    def parse(self, parser, string):
+        """Parse the string with the parser unless the result is cached
+
+        Args:
+            parser(function): Parser function taking the string as input
+            string(str): String to be parsed
+
+        Returns:
+            result: A fresh copy of the output of the parser
+
+        Raises:
+            ParseException: If the string could not be parsed
+        """
+        key = self._key(parser, string)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            success, value = pickle.loads(entry)
+            self._remember(key, entry)
+        else:
+            cached = self._read(key)
+            if cached is not None:
+                entry, (success, value) = cached
+                self._remember(key, entry)
+            else:
+                try:
+                    result = parser(string)
+                except ParseException as error:
+                    self._store(key, (False, (error.loc, error.msg)))
+                    raise
+                # Unpickle the stored entry so the caller gets a copy
+                success, value = pickle.loads(self._store(key, (True, result)))
+
+        if not success:
+            location, message = value
+            raise ParseException(string, location, message)
+        return value
+
+    def _remember(self, key, entry):
+        """Keep the entry in memory, dropping the least recently used ones
+        """
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _store(self, key, value):
+        """Store the value in memory and in the cache directory
+
+        Returns:
+            result(str): Pickled entry of the value
+        """
+        entry = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def clear(self):
+        """Clear the in memory entries of the cache
+        """
+        self._entries = OrderedDict()
+
+
+def _shared_cache():
+    """Parse cache based on the config, only kept in memory unless
+    database.PARSE_CACHE_DIR is set
+    """
+    config = getattr(Config(), 'database', dict())
+    directory = config.get(PARSE_CACHE_DIR)
+    if directory is not None:
+        directory = os.path.expanduser(directory)
+    return ParseCache(directory,
+                      config.get(PARSE_CACHE_SIZE, DEFAULT_CACHE_SIZE))
+
+
+parse_cache = _shared_cache()
+
+
+def cached_parse(parser, string):
+    """Parse the string with the parser using the shared parse cache
+
+    Args:
+        parser(function): Parser function taking the string as input
+        string(str): String to be parsed
+
+    Returns:
+        result: A fresh copy of the output of the parser
+    """
+    return parse_cache.parse(parser, string)
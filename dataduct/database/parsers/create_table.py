@@ -28,11 +28,19 @@ from .helpers import paranthesis_list
 from .helpers import temporary_check
 from .helpers import to_dict
 
+from .registry import get_grammar
+from .registry import register_grammar
+
 import logging
 logger = logging.getLogger(__name__)
 
 FK_REFERENCE = 'fk_reference'
 
+CREATE_TABLE_GRAMMAR = 'create_table'
+COLUMN_GRAMMAR = 'create_table_column'
+CONSTRAINTS_GRAMMAR = 'create_table_constraints'
+EXISTS_CLONE_GRAMMAR = 'create_table_exists_clone'
+
 
 def fk_reference():
     """Get Parser for foreign key references
@@ -122,6 +130,22 @@ def get_attributes_parser():
     return ZeroOrMore(diststyle_def | sortkey_def | distkey_def)
 
 
+def get_exists_clone_parser():
+    """Get a pyparsing parser for splitting the start of a create table
+    statement from the rest of its definition
+
+    Returns:
+        clone_parser(pyparsing): Parser for create table statements
+    """
+    return get_definition_start() + restOfLine.setResultsName('definition')
+
+
+register_grammar(CREATE_TABLE_GRAMMAR, get_base_parser)
+register_grammar(COLUMN_GRAMMAR, get_column_parser)
+register_grammar(CONSTRAINTS_GRAMMAR, get_constraints_parser)
+register_grammar(EXISTS_CLONE_GRAMMAR, get_exists_clone_parser)
+
+
 def parse_create_table(string):
     """Parse the create table sql query and return metadata
 
@@ -132,16 +156,20 @@ def parse_create_table(string):
         table_data(dict): table_data dictionary for instantiating a table object
     """
     # Parse the base table definitions
-    table_data = to_dict(get_base_parser().parseString(string))
+    table_data = to_dict(
+        get_grammar(CREATE_TABLE_GRAMMAR).parseString(string))
 
     # Parse the columns and append to the list
     table_data['columns'] = list()
     table_data['constraints'] = list()
 
+    column_parser = get_grammar(COLUMN_GRAMMAR)
+    constraints_parser = get_grammar(CONSTRAINTS_GRAMMAR)
+
     column_position = 0
     for field in table_data['raw_fields']:
         try:
-            column = to_dict(get_column_parser().parseString(field))
+            column = to_dict(column_parser.parseString(field))
 
             # Add position of the column
             column['position'] = column_position
@@ -155,8 +183,7 @@ def parse_create_table(string):
 
         except ParseException:
             try:
-                constraint = to_dict(
-                    get_constraints_parser().parseString(field))
+                constraint = to_dict(constraints_parser.parseString(field))
                 table_data['constraints'].append(constraint)
             except ParseException:
                 logger.error(field)
@@ -165,13 +192,18 @@ def parse_create_table(string):
     return table_data
 
 
-def create_exists_clone(string):
+def create_exists_clone(string, table_name=None):
     """Create a clone of the table statement which has the exists check
+
+    Args:
+        string(sql): SQL string of the create table statement
+        table_name(str): Name of the clone, the name of the table if None
     """
-    parser = get_definition_start() + restOfLine.setResultsName('definition')
-    result = to_dict(parser.parseString(string))
+    result = to_dict(get_grammar(EXISTS_CLONE_GRAMMAR).parseString(string))
+    if table_name is None:
+        table_name = result['full_name']
     template = 'CREATE {temp} TABLE IF NOT EXISTS {table_name} {definition}'
     return template.format(temp='TEMP' if result['temporary'] else '',
-                           table_name=result['full_name'],
+                           table_name=table_name,
                            definition=result['definition'])
 
@@ -14,6 +14,11 @@ from .utils import _as
 from .helpers import to_dict
 from .helpers import replace_check
 
+from .registry import get_grammar
+from .registry import register_grammar
+
+CREATE_VIEW_GRAMMAR = 'create_view'
+
 
 merge = lambda x: ' '.join(x[0])
 
@@ -22,18 +27,13 @@ def rreplace(s, old, new):
     li = s.rsplit(old, 1)
     return new.join(li)
 
-def parse_create_view(string):
-    """Parse the create view sql query and return metadata
 
-    Args:
-        string(str): Input sql string that should be parsed
+def get_create_view_parser():
+    """Get a pyparsing parser for a create view statement
 
     Returns:
-        view_data(dict): view_data dictionary for instantiating a view object
+        view_definition(pyparsing): Parser for create view statements
     """
-
-    string = rreplace(string, ')', ' )')
-
     end = ')' + StringEnd()
     select = Group(ZeroOrMore(~end + Word(printables)))
 
@@ -41,8 +41,25 @@ def parse_create_view(string):
     parser += _db_name.setResultsName('view_name') + _as + '('
     parser += select.setParseAction(merge).setResultsName('select_statement')
     parser += end
+    return parser
+
+
+register_grammar(CREATE_VIEW_GRAMMAR, get_create_view_parser)
+
+
+def parse_create_view(string):
+    """Parse the create view sql query and return metadata
+
+    Args:
+        string(str): Input sql string that should be parsed
+
+    Returns:
+        view_data(dict): view_data dictionary for instantiating a view object
+    """
+
+    string = rreplace(string, ')', ' )')
 
     # Parse the base table definitions
-    view_data = to_dict(parser.parseString(string))
+    view_data = to_dict(get_grammar(CREATE_VIEW_GRAMMAR).parseString(string))
 
     return view_data
@@ -0,0 +1,126 @@
+"""Single pass lexer that cleans up and splits SQL scripts
+"""
+
+import re
+
+# Tokens are matched in order, comments and quotes take precedence over words
+TOKEN_REGEX = re.compile(r"""
+    (?P<quoted>'(?:[^'\\]|\\.)*')
+    |(?P<unterminated_quote>')
+    |(?P<line_comment>--[^\n]*)
+    |(?P<block_comment>/\*)
+    |(?P<space>\s+)
+    |(?P<separator>;)
+    |(?P<word>[^\s';/-]+|[/-])
+""", re.VERBOSE | re.DOTALL)
+
+BLOCK_COMMENT_REGEX = re.compile(r'/\*|\*/')
+
+TRANSACTIONAL_REGEX = re.compile(r'(?:BEGIN|COMMIT)(?![a-zA-Z0-9_$])',
+                                 re.IGNORECASE)
+
+
+def _block_comment_end(string, position):
+    """Find the end of a possibly nested block comment
+
+    Args:
+        string(str): String being processed
+        position(int): Position just after the opening of the comment
+
+    Returns:
+        result(int): Position just after the closing of the comment
+
+    Raises:
+        ValueError: If the comment is never closed
+    """
+    start = position
+    depth = 1
+    while depth > 0:
+        match = BLOCK_COMMENT_REGEX.search(string, position)
+        if match is None:
+            raise ValueError('Unterminated comment in SQL: %s' %
+                             string[start - 2:start + 40])
+
+        depth += 1 if match.group() == '/*' else -1
+        position = match.end()
+    return position
+
+
+def lex_statements(string, keep_transaction=False):
+    """Split a SQL string into cleaned up statements in a single pass
+
+    Comments are dropped, runs of whitespace outside of quotes are collapsed
+    into a single space, empty statements are removed and unless asked
+    otherwise begin and commit keywords are stripped.
+
+    Note:
+        Like the pyparsing transforms this replaces, begin and commit are
+        only stripped at the start of the string or after whitespace or a
+        comment, not right after a seperator or inside quotes
+
+    Args:
+        string(str): String to be processed
+        keep_transaction(bool): Keep the begin and commit keywords
+
+    Returns:
+        result(list of str): Statements split based on the seperator
+
+    Raises:
+        ValueError: If a quote or a block comment is never closed
+    """
+    statements = list()
+    pieces = list()
+
+    # A space is only emitted between two tokens of the same statement
+    pending_space = False
+
+    # Begin and commit are only stripped at the start of a word
+    word_start = True
+
+    position = 0
+    length = len(string)
+    while position < length:
+        match = TOKEN_REGEX.match(string, position)
+        kind = match.lastgroup
+        token = match.group()
+        position = match.end()
+
+        if kind == 'unterminated_quote':
+            raise ValueError('Unterminated quote in SQL: %s' %
+                             string[position - 1:position + 40])
+
+        if kind == 'space' or kind == 'line_comment':
+            pending_space = True
+            word_start = True
+            continue
+
+        if kind == 'block_comment':
+            position = _block_comment_end(string, position)
+            pending_space = True
+            word_start = True
+            continue
+
+        if kind == 'separator':
+            if pieces:
+                statements.append(''.join(pieces))
+            pieces = list()
+            pending_space = False
+            word_start = False
+            continue
+
+        if kind == 'word' and word_start and not keep_transaction:
+            keyword = TRANSACTIONAL_REGEX.match(token)
+            if keyword is not None:
+                token = token[keyword.end():]
+                if not token:
+                    continue
+
+        if pending_space and pieces:
+            pieces.append(' ')
+        pieces.append(token)
+        pending_space = False
+        word_start = False
+
+    if pieces:
+        statements.append(''.join(pieces))
+    return statements
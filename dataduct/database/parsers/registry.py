@@ -0,0 +1,54 @@
+"""Registry of pre-built SQL grammars shared by the parser entry points
+"""
+
+_builders = dict()
+_grammars = dict()
+
+
+def register_grammar(name, builder):
+    """Register the function that builds the grammar for the given name
+
+    Args:
+        name(str): Name the grammar is looked up with
+        builder(function): Function without arguments returning the grammar
+    """
+    _builders[name] = builder
+    _grammars.pop(name, None)
+
+
+def unregister_grammar(name):
+    """Remove the grammar registered for the given name
+
+    Args:
+        name(str): Name the grammar was registered with
+    """
+    _builders.pop(name, None)
+    _grammars.pop(name, None)
+
+
+def get_grammar(name):
+    """Get the compiled grammar for the given name
+
+    Note:
+        Grammars are built on first use and shared by every caller afterwards,
+        so the returned parser must not be modified in place
+
+    Args:
+        name(str): Name the grammar was registered with
+
+    Returns:
+        grammar(pyparsing): Compiled parser for the grammar
+    """
+    grammar = _grammars.get(name)
+    if grammar is None:
+        grammar = _builders[name]()
+        grammar.streamline()
+        _grammars[name] = grammar
+    return grammar
+
+
+def warm_up_grammars():
+    """Build all the registered grammars ahead of the first parse
+    """
+    for name in _builders:
+        get_grammar(name)
@@ -13,6 +13,54 @@ from .utils import _join
 from .utils import _select
 from .utils import def_field
 
+from .registry import get_grammar
+from .registry import register_grammar
+
+SELECT_BASE_GRAMMAR = 'select_base'
+SELECT_DEPENDENCIES_GRAMMAR = 'select_dependencies'
+SELECT_SUPPRESS_FROM_GRAMMAR = 'select_suppress_from'
+SELECT_COLUMNS_GRAMMAR = 'select_columns'
+COLUMN_NAME_GRAMMAR = 'column_name'
+
+
+def get_select_base_parser():
+    """Get a pyparsing parser for the start of a select query
+    """
+    return _select + restOfLine
+
+
+def get_dependencies_parser():
+    """Get a pyparsing parser for the relations a select query reads from
+    """
+    dep_parse = WordStart() + (_from | _join) + _db_name.setResultsName('table')
+    return dep_parse.setParseAction(lambda x: x.table)
+
+
+def get_suppress_from_parser():
+    """Get a pyparsing parser that drops everything after the first from
+    """
+    suppressor = MatchFirst(_from) + restOfLine
+    return suppressor.suppress()
+
+
+def get_columns_parser():
+    """Get a pyparsing parser for the column list of a select query
+    """
+    return _select + delimitedList(def_field).setResultsName('columns')
+
+
+def get_column_name_parser():
+    """Get a pyparsing parser for the words of a column definition
+    """
+    return Word(printables.replace('\n\r', ''))
+
+
+register_grammar(SELECT_BASE_GRAMMAR, get_select_base_parser)
+register_grammar(SELECT_DEPENDENCIES_GRAMMAR, get_dependencies_parser)
+register_grammar(SELECT_SUPPRESS_FROM_GRAMMAR, get_suppress_from_parser)
+register_grammar(SELECT_COLUMNS_GRAMMAR, get_columns_parser)
+register_grammar(COLUMN_NAME_GRAMMAR, get_column_name_parser)
+
 
 def parse_select_base(string):
     """Parse a select query and return the dependencies
@@ -27,10 +75,8 @@ def parse_select_base(string):
     if string == '':
         return
 
-    base_parser = _select + restOfLine
-
     # Sanity check that query starts with select
-    base_parser.parseString(string)
+    get_grammar(SELECT_BASE_GRAMMAR).parseString(string)
 
 
 def parse_select_dependencies(string):
@@ -47,8 +93,7 @@ def parse_select_dependencies(string):
         return list()
 
     # Find all dependent tables
-    dep_parse = WordStart() + (_from | _join) + _db_name.setResultsName('table')
-    output = dep_parse.setParseAction(lambda x: x.table).searchString(string)
+    output = get_grammar(SELECT_DEPENDENCIES_GRAMMAR).searchString(string)
 
     # Flatten the list before returning
     flattened_output = [item for sublist in output for item in sublist]
@@ -71,11 +116,10 @@ def parse_select_columns(string):
         return list()
 
     # Supress everything after the first from
-    suppressor = MatchFirst(_from) + restOfLine
-    string = suppressor.suppress().transformString(string)
+    string = get_grammar(SELECT_SUPPRESS_FROM_GRAMMAR).transformString(string)
 
-    parser = _select + delimitedList(def_field).setResultsName('columns')
-    output = parser.parseString(string).columns.asList()
+    output = get_grammar(SELECT_COLUMNS_GRAMMAR).parseString(
+        string).columns.asList()
 
     # Strip extra whitespace from the string
     return [column.strip() for column in output]
@@ -94,8 +138,26 @@ def parse_column_name(string):
         result(str): column name
     """
     # Find all words in the string
-    words = Word(printables.replace('\n\r', '')).searchString(string)
+    words = get_grammar(COLUMN_NAME_GRAMMAR).searchString(string)
 
     # Get the last word matched
     name = words.pop().asList().pop()
     return name
+
+
+def parse_select_statement(string):
+    """Parse a select query and return its dependencies and columns
+
+    Args:
+        string(str): Input string to be parsed
+
+    Returns:
+        select_data(dict): select_data dictionary with the dependencies, raw
+        columns and column names of the select query
+    """
+    raw_columns = parse_select_columns(string)
+    return {
+        'dependencies': parse_select_dependencies(string),
+        'raw_columns': raw_columns,
+        'column_names': [parse_column_name(c) for c in raw_columns],
+    }
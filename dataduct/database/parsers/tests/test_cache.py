@@ -0,0 +1,166 @@
+"""Tests for the parse cache
+"""
+import os
+
+from unittest import TestCase
+from testfixtures import TempDirectory
+from nose.tools import eq_
+from nose.tools import raises
+from pyparsing import ParseException
+
+from ..cache import ParseCache
+from ..create_table import parse_create_table
+
+
+class CountingParser(object):
+    """Parser that counts the number of times it was called
+    """
+    def __init__(self):
+        self.calls = 0
+        self.__name__ = 'counting_parser'
+
+    def __call__(self, string):
+        self.calls += 1
+        if string.startswith('bad'):
+            raise ParseException(string, 0, 'Bad input')
+        return {'words': string.split()}
+
+
+class TestParseCache(TestCase):
+    """Tests for the parse cache
+    """
+    def setUp(self):
+        """Setup test fixtures
+        """
+        self.parser = CountingParser()
+        self.parser.__module__ = __name__
+
+    def test_memory_cache(self):
+        """Repeated parses only run the parser once
+        """
+        cache = ParseCache()
+        eq_(cache.parse(self.parser, 'a b'), {'words': ['a', 'b']})
+        eq_(cache.parse(self.parser, 'a b'), {'words': ['a', 'b']})
+        eq_(self.parser.calls, 1)
+
+    def test_results_are_copies(self):
+        """Mutating a result does not change the cache
+        """
+        cache = ParseCache()
+        cache.parse(self.parser, 'a b')['words'].append('c')
+        eq_(cache.parse(self.parser, 'a b'), {'words': ['a', 'b']})
+
+    def test_disk_cache(self):
+        """Results are shared through the cache directory
+        """
+        with TempDirectory() as d:
+            ParseCache(d.path).parse(self.parser, 'a b')
+            result = ParseCache(d.path).parse(self.parser, 'a b')
+
+            eq_(result, {'words': ['a', 'b']})
+            eq_(self.parser.calls, 1)
+            eq_(len(os.listdir(d.path)), 1)
+
+    def test_corrupt_entry(self):
+        """Unreadable entries are parsed again
+        """
+        with TempDirectory() as d:
+            ParseCache(d.path).parse(self.parser, 'a b')
+            d.write(os.listdir(d.path)[0], 'corrupt')
+
+            eq_(ParseCache(d.path).parse(self.parser, 'a b'),
+                {'words': ['a', 'b']})
+            eq_(self.parser.calls, 2)
+
+    def test_failures_are_cached(self):
+        """Failed parses raise the same error without parsing again
+        """
+        cache = ParseCache()
+        for _ in range(2):
+            try:
+                cache.parse(self.parser, 'bad input')
+            except ParseException as error:
+                eq_(error.msg, 'Bad input')
+            else:
+                raise AssertionError('ParseException not raised')
+        eq_(self.parser.calls, 1)
+
+    @staticmethod
+    @raises(ParseException)
+    def test_create_table_failure():
+        """Cached create table parses fail like the parser
+        """
+        cache = ParseCache()
+        query = 'CREATE TABLE orders (customer_id NEGATIVE)'
+        try:
+            cache.parse(parse_create_table, query)
+        except ParseException:
+            pass
+        cache.parse(parse_create_table, query)
+
+    def test_non_ascii_string(self):
+        """Unicode strings with non ascii characters are cached
+        """
+        cache = ParseCache()
+        eq_(cache.parse(self.parser, u'caf\xe9 au lait'),
+            {'words': [u'caf\xe9', u'au', u'lait']})
+        cache.parse(self.parser, u'caf\xe9 au lait')
+        eq_(self.parser.calls, 1)
+
+    def test_memory_size(self):
+        """Least recently used entries are dropped from memory
+        """
+        cache = ParseCache(max_size=2)
+        for string in ['a', 'b', 'a', 'c', 'a', 'b']:
+            cache.parse(self.parser, string)
+        eq_(len(cache._entries), 2)
+        eq_(self.parser.calls, 4)
+
+    def test_disk_size(self):
+        """Oldest files are removed from the cache directory
+        """
+        with TempDirectory() as d:
+            cache = ParseCache(d.path, max_size=2)
+            for string in ['a', 'b', 'c']:
+                cache.parse(self.parser, string)
+            eq_(len(os.listdir(d.path)), 2)
+
+    def test_disk_prune_only_past_size(self):
+        """The cache directory is only listed again once it is full
+        """
+        with TempDirectory() as d:
+            cache = ParseCache(d.path, max_size=2)
+            listdir = os.listdir
+            calls = []
+
+            def counting_listdir(path):
+                calls.append(path)
+                return listdir(path)
+
+            os.listdir = counting_listdir
+            try:
+                for string in ['a', 'b', 'a']:
+                    cache.parse(self.parser, string)
+                eq_(len(calls), 1)
+                cache.parse(self.parser, 'c')
+                eq_(len(calls), 2)
+            finally:
+                os.listdir = listdir
+            eq_(len(os.listdir(d.path)), 2)
+
+    def test_failed_rename(self):
+        """Temporary files are removed when the rename fails
+        """
+        with TempDirectory() as d:
+            cache = ParseCache(d.path)
+            rename = os.rename
+
+            def failing_rename(source, destination):
+                raise OSError('Rename failed')
+
+            os.rename = failing_rename
+            try:
+                eq_(cache.parse(self.parser, 'a b'), {'words': ['a', 'b']})
+            finally:
+                os.rename = rename
+            eq_(os.listdir(d.path), [])
@@ -0,0 +1,115 @@
+"""Tests for the single pass SQL lexer
+"""
+from unittest import TestCase
+from nose.tools import eq_
+from nose.tools import raises
+
+from ..lexer import lex_statements
+
+
+class TestLexStatements(TestCase):
+    """Tests for lex_statements function
+    """
+    @staticmethod
+    def test_basic():
+        """Basic test for splitting statements
+        """
+        data = 'a; b \n t; c;    d ; '
+        result = ['a', 'b t', 'c', 'd']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_empty():
+        """Empty strings have no statements
+        """
+        eq_(lex_statements(''), [])
+        eq_(lex_statements(' \n ;; ; '), [])
+
+    @staticmethod
+    def test_empty_statements():
+        """Empty statements are removed
+        """
+        data = '; a;  ; ;;; b; c;;;'
+        result = ['a', 'b', 'c']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_comments():
+        """Single line and multiline comments are removed
+        """
+        data = """a; /* This is \n
+                  a multiline comment */ b;; \n ; -- Comment \n c; d; """
+        result = ['a', 'b', 'c', 'd']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_nested_comments():
+        """Multiline comments can be nested
+        """
+        data = 'a /* outer /* inner */ still outer */ b;'
+        result = ['a b']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_quoted_strings():
+        """Whitespace, seperators and comments are kept inside quotes
+        """
+        data = "select 'a  -- b;\n /* c */', 'it''s' ;  select '\\'';"
+        result = ["select 'a  -- b;\n /* c */', 'it''s'", "select '\\''"]
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_remove_transactional():
+        """Begin and commit are removed
+        """
+        data = 'begin; a; b; COMMIT;'
+        result = ['a', 'b']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_keep_transactional():
+        """Begin and commit are kept when asked for
+        """
+        data = 'begin; a; b; commit;'
+        result = ['begin', 'a', 'b', 'commit']
+
+        eq_(lex_statements(data, keep_transaction=True), result)
+
+    @staticmethod
+    def test_transactional_prefix():
+        """Words that only start with begin or commit are kept
+        """
+        data = 'select commit_id, x.begin from beginning;'
+        result = ['select commit_id, x.begin from beginning']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    def test_transactional_after_seperator():
+        """Begin and commit are only removed after whitespace like the old
+        pyparsing transform
+        """
+        data = 'begin; a;commit; b; commit;'
+        result = ['a', 'commit', 'b']
+
+        eq_(lex_statements(data), result)
+
+    @staticmethod
+    @raises(ValueError)
+    def test_unterminated_quote():
+        """Quotes that are never closed raise an error
+        """
+        lex_statements("select 'a; select b;")
+
+    @staticmethod
+    @raises(ValueError)
+    def test_unterminated_comment():
+        """Block comments that are never closed raise an error
+        """
+        lex_statements('select a; /* outer /* inner */ select b;')
@@ -0,0 +1,79 @@
+"""Tests for the grammar registry
+"""
+from unittest import TestCase
+from nose.tools import eq_
+from nose.tools import raises
+
+from pyparsing import Word
+from pyparsing import alphas
+
+from ..registry import get_grammar
+from ..registry import register_grammar
+from ..registry import unregister_grammar
+from ..registry import warm_up_grammars
+from ..create_table import CREATE_TABLE_GRAMMAR
+from ..create_table import parse_create_table
+
+
+class TestGrammarRegistry(TestCase):
+    """Tests for the grammar registry
+    """
+    def setUp(self):
+        """Register a test grammar that counts its builds
+        """
+        self.calls = list()
+
+        def builder():
+            """Count the number of times the grammar is built"""
+            self.calls.append(1)
+            return Word(alphas)
+
+        register_grammar('test_word', builder)
+
+    def tearDown(self):
+        """Remove the test grammar from the shared registry
+        """
+        unregister_grammar('test_word')
+
+    def test_grammar_built_once(self):
+        """Grammars are shared across lookups
+        """
+        first = get_grammar('test_word')
+        second = get_grammar('test_word')
+
+        eq_(id(first), id(second))
+        eq_(len(self.calls), 1)
+        eq_(first.parseString('hello').asList(), ['hello'])
+
+    @staticmethod
+    def test_warm_up():
+        """Warm up builds the registered grammars
+        """
+        warm_up_grammars()
+        eq_(id(get_grammar(CREATE_TABLE_GRAMMAR)),
+            id(get_grammar(CREATE_TABLE_GRAMMAR)))
+
+    @staticmethod
+    def test_repeated_parses():
+        """Shared grammars give the same result on every parse
+        """
+        query = ('CREATE TABLE orders ('
+                 'customer_id INTEGER DISTKEY PRIMARY KEY,'
+                 'customer_name VARCHAR(200))')
+
+        eq_(parse_create_table(query), parse_create_table(query))
+
+    @staticmethod
+    @raises(KeyError)
+    def test_unknown_grammar():
+        """Looking up a grammar that was never registered
+        """
+        get_grammar('unknown_grammar')
+
+    @staticmethod
+    @raises(KeyError)
+    def test_unregister_grammar():
+        """Unregistered grammars can not be looked up
+        """
+        unregister_grammar('test_word')
+        get_grammar('test_word')
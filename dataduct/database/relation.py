@@ -69,17 +69,17 @@ class Relation(object):
         for permission in permissions:
             sql.extend(self._grant_sql_builder(**permission))
 
-        return SqlScript('; '.join(sql))
+        return SqlScript.from_trusted_sql(*sql)
 
     def select_script(self):
         """Select everything from the relation
         """
-        return SqlScript('SELECT * FROM %s' % self.full_name)
+        return SqlScript.from_trusted_sql('SELECT * FROM %s' % self.full_name)
 
     def create_script(self, grant_permissions=True):
         """Create script for the table object
         """
-        script = SqlScript(statements=[self.sql_statement.copy()])
+        script = SqlScript(statements=[self.sql_statement])
         if grant_permissions:
             script.append(self.grant_script())
         return script
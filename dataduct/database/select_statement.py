@@ -3,9 +3,8 @@
 
 from .sql import SqlStatement
 from .column import Column
-from .parsers import parse_select_dependencies
-from .parsers import parse_select_columns
-from .parsers import parse_column_name
+from .parsers import cached_parse
+from .parsers import parse_select_statement
 
 
 class SelectStatement(SqlStatement):
@@ -16,10 +15,27 @@ class SelectStatement(SqlStatement):
         """
         super(SelectStatement, self).__init__(sql)
 
-        self._dependencies = parse_select_dependencies(self.sql())
-        self._raw_columns = parse_select_columns(self.sql())
+        select_data = cached_parse(parse_select_statement, self.sql())
+
+        self._dependencies = select_data['dependencies']
+        self._raw_columns = select_data['raw_columns']
         self._columns = [
-            Column(parse_column_name(c), None) for c in self._raw_columns]
+            Column(name, None) for name in select_data['column_names']]
+
+    @classmethod
+    def from_trusted_sql(cls, sql, column_names, dependencies):
+        """Create a select statement generated by the library itself
+
+        Args:
+            sql(str): SQL of the select statement
+            column_names(list of str): Names of the selected columns
+            dependencies(list of str): Relations the statement selects from
+        """
+        statement = super(SelectStatement, cls).from_trusted_sql(sql)
+        statement._dependencies = list(dependencies)
+        statement._raw_columns = list(column_names)
+        statement._columns = [Column(name, None) for name in column_names]
+        return statement
 
     @property
     def dependencies(self):
@@ -1,2 +1,3 @@
 from .sql_statement import SqlStatement
 from .sql_script import SqlScript
+from .utils import format_sql
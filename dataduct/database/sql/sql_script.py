@@ -1,6 +1,6 @@
 """Script that contains the sql script class
 """
-from copy import deepcopy
+from itertools import islice
 
 from .sql_statement import SqlStatement
 from .transaction import BeginStatement
@@ -12,6 +12,12 @@ from ...utils.helpers import atmost_one
 
 class SqlScript(object):
     """Class representing a single SQL Script
+
+    Note:
+        Copies of a script share the list of immutable statements and each
+        script only sees the statements up to its own length. A script only
+        takes a private copy of the list when another script sharing it has
+        already appended, so appending and copying are both O(1).
     """
     def __init__(self, sql=None, statements=None, filename=None):
         """Constructor for the SqlScript class
@@ -26,13 +32,22 @@ class SqlScript(object):
                 sql = f.read()
 
         self._raw_sql = sql
-        self._raw_statements = self._sanatize_sql()
         self._statements = self._initialize_statements()
+        self._length = len(self._statements)
 
         # Add the statements that the script was initialized from
         if statements:
             self.append(statements)
 
+    @classmethod
+    def from_trusted_sql(cls, *sql):
+        """Create a script from statements generated by the library itself
+
+        Args:
+            *sql(str): SQL of each statement, see SqlStatement.from_trusted_sql
+        """
+        return cls(statements=[SqlStatement.from_trusted_sql(x) for x in sql])
+
     def __str__(self):
         """Print a SqlScript object
         """
@@ -41,23 +56,23 @@ class SqlScript(object):
     def __iter__(self):
         """Iterator for iterating over all the sql statements
         """
-        return iter(self._statements)
+        return islice(self._statements, self._length)
 
     def __len__(self):
         """Length of the sqlscript
         """
-        return len(self._statements)
+        return self._length
 
     @property
     def statements(self):
         """Returns the SQLStatements of the script
         """
-        return self._statements
+        return self._statements[:self._length]
 
     def sql(self):
         """Returns the sql for the SqlScript
         """
-        return ';\n'.join([x.sql() for x in self._statements]) + ';'
+        return ';\n'.join([x.sql() for x in self]) + ';'
 
     def _sanatize_sql(self):
         """Clean the SQL, remove comments and empty statements
@@ -67,12 +82,17 @@ class SqlScript(object):
     def _initialize_statements(self):
         """Initialize SQL Statements based on the inputscipt
         """
-        return [SqlStatement(x) for x in self._raw_statements]
+        return [SqlStatement(x) for x in self._sanatize_sql()]
 
     def copy(self):
         """Create a copy of the SQL Script object
+
+        Note:
+            The copy shares the statements with the original script
         """
-        return deepcopy(self)
+        new_script = self.__class__.__new__(self.__class__)
+        new_script.__dict__.update(self.__dict__)
+        return new_script
 
     def append(self, elements):
         """Append the elements to the SQL script
@@ -98,8 +118,12 @@ class SqlScript(object):
         if not isinstance(statement, SqlStatement):
             raise ValueError('Input must be of the type SqlStatement')
 
+        if len(self._statements) != self._length:
+            # Another script sharing the statements has appended to them
+            self._statements = self._statements[:self._length]
+
         self._statements.append(statement)
-        self._raw_statements.append(statement.sql())
+        self._length += 1
 
     def wrap_transaction(self):
         """Wrap the script in transaction
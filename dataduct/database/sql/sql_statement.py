@@ -2,12 +2,17 @@
 """
 from copy import deepcopy
 from .utils import sanatize_sql
+from ..parsers import cached_parse
 from ..parsers import parse_create_table
 from ..parsers import parse_create_view
 
 
 class SqlStatement(object):
     """Class representing a single SQL statement
+
+    Note:
+        Statements are immutable once created and can be shared freely
+        between SQL scripts
     """
     def __init__(self, sql=None, transactional=False):
         """Constructor for the SqlStatement class
@@ -18,6 +23,24 @@ class SqlStatement(object):
         self.transactional = transactional
         self._raw_statement = self._sanatize_sql()
 
+    @classmethod
+    def from_trusted_sql(cls, sql, transactional=False):
+        """Create a statement from SQL generated by the library itself
+
+        Note:
+            The SQL is not lexed, it must be a single sanatized statement
+            without comments or separators, see format_sql for templates
+
+        Args:
+            sql(str): SQL for a single statement
+            transactional(bool): Keep the begin and commit keywords
+        """
+        statement = cls.__new__(cls)
+        statement._raw_sql = sql
+        statement.transactional = transactional
+        statement._raw_statement = sql.strip()
+        return statement
+
     def __str__(self):
         """Print a SqlStatement object
         """
@@ -52,7 +75,7 @@ class SqlStatement(object):
         """Check if a parser satisfies the sql statement
         """
         try:
-            func(self.sql())
+            cached_parse(func, self.sql())
         except Exception:
             return False
         return True
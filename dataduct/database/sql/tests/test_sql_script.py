@@ -168,3 +168,31 @@ class TestSqlScript(TestCase):
         """
         script = SqlScript('CREATE VIEW test_begin (session_id INTEGER);')
         eq_(script.creates_view(), False)
+
+    @staticmethod
+    def test_append_returns_copy():
+        """Appending returns a copy of the updated script
+        """
+        script = SqlScript('SELECT 1;')
+        result = script.append('SELECT 2;')
+        eq_(result.sql(), 'SELECT 1;\nSELECT 2;')
+
+        # The returned copy is independent of the original script
+        script.append('SELECT 3;')
+        eq_(result.sql(), 'SELECT 1;\nSELECT 2;')
+        eq_(script.sql(), 'SELECT 1;\nSELECT 2;\nSELECT 3;')
+
+    @staticmethod
+    def test_copy_independent():
+        """Appending to a copy does not change the original script
+        """
+        script = SqlScript('SELECT 1;')
+        script_new = script.copy()
+        script_new.append('SELECT 2;')
+        script.append('SELECT 3;')
+        script_new.append('SELECT 4;')
+
+        eq_(script.sql(), 'SELECT 1;\nSELECT 3;')
+        eq_(script_new.sql(), 'SELECT 1;\nSELECT 2;\nSELECT 4;')
+        eq_(len(script), 2)
+        eq_(len(script_new), 3)
@@ -5,6 +5,7 @@ from nose.tools import eq_
 from nose.tools import raises
 
 from ..sql_statement import SqlStatement
+from ..utils import format_sql
 
 
 class TestSqlStatement(TestCase):
@@ -41,3 +42,16 @@ class TestSqlStatement(TestCase):
         """Empty if no sql query is passed
         """
         eq_(SqlStatement().sql(), '')
+
+    @staticmethod
+    def test_from_trusted_sql():
+        """Trusted statements are taken as they are
+        """
+        sql = format_sql("""
+            SELECT {columns}
+            FROM {table}
+        """, columns="'a   b'", table='test_table')
+        statement = SqlStatement.from_trusted_sql(sql)
+
+        eq_(statement.sql(), "SELECT 'a   b' FROM test_table")
+        eq_(statement.sql(), SqlStatement(sql).sql())
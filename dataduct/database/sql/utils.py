@@ -1,11 +1,7 @@
 """
 Shared utility functions
 """
-from ..parsers import remove_comments
-from ..parsers import remove_empty_statements
-from ..parsers import split_statements
-from ..parsers import remove_transactional
-from ..parsers import remove_newlines
+from ..parsers import lex_statements
 
 
 def balanced_parenthesis(statement):
@@ -24,19 +20,17 @@ def balanced_parenthesis(statement):
 
 def sanatize_sql(sql, keep_transaction=False):
     """Sanatize the sql string
-    """
-    # remove comments
-    string = remove_comments(sql)
 
-    # remove transactionals
-    if not keep_transaction:
-        string = remove_transactional(string)
+    Removes comments, transactionals, new lines and empty statements before
+    splitting the sql into multiple statements
+    """
+    return lex_statements(sql, keep_transaction)
 
-    # remove new lines
-    string = remove_newlines(string)
 
-    # remove empty statements
-    string = remove_empty_statements(string)
+def format_sql(template, **kwargs):
+    """Fill a SQL template of the library with already sanatized values
 
-    # split into multiple statements
-    return split_statements(string)
+    The whitespace of the template is collapsed before it is formatted, so
+    the result matches the sanatized SQL without lexing the values again.
+    """
+    return ' '.join(template.split()).format(**kwargs).strip()
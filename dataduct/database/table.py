@@ -1,12 +1,68 @@
 """Script containing the table class object
 """
+import re
+
+from .parsers import cached_parse
 from .parsers import parse_create_table
 from .parsers import create_exists_clone
 from .sql import SqlScript
+from .sql import SqlStatement
+from .sql import format_sql
 from .select_statement import SelectStatement
 from .column import Column
 from .relation import Relation
 
+import logging
+logger = logging.getLogger(__name__)
+
+
+DELETE_IN = 'in'
+DELETE_JOIN = 'join'
+DELETE_METHODS = [DELETE_IN, DELETE_JOIN]
+
+SHADOW_SUFFIX = '_shadow'
+OLD_SUFFIX = '_old'
+
+IDENTIFIER_REGEX = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_$]*$')
+
+# Longest identifier kept by the database, longer names are truncated
+MAX_IDENTIFIER_LENGTH = 63
+
+# Column of an ORDER BY list with its optional direction and NULLS order
+ORDER_BY_ITEM_REGEX = re.compile(r"""
+    ^\s*((?:[a-zA-Z_][a-zA-Z0-9_$]*|"[a-zA-Z0-9_$ ]+")
+        (?:\.(?:[a-zA-Z_][a-zA-Z0-9_$]*|"[a-zA-Z0-9_$ ]+"))?)
+    (?:\s+(ASC|DESC))?
+    (?:\s+NULLS\s+(FIRST|LAST))?\s*$
+""", re.VERBOSE | re.IGNORECASE)
+
+
+def default_constraint_name(table_name, column_names, label):
+    """Name given by the database to a constraint added without a name
+
+    The name is <table>_<columns>_<label>, with the longer of the table and
+    column parts shortened one character at a time until the name fits in
+    MAX_IDENTIFIER_LENGTH characters.
+
+    Args:
+        table_name(str): Name of the table without the schema
+        column_names(list of str): Columns of the constraint
+        label(str): Suffix of the constraint type such as fkey
+
+    Returns:
+        result(str): Name of the constraint
+    """
+    columns = '_'.join(column_names)
+    available = MAX_IDENTIFIER_LENGTH - len(label) - 2
+    table_length, columns_length = len(table_name), len(columns)
+    while table_length + columns_length > available:
+        if table_length > columns_length:
+            table_length -= 1
+        else:
+            columns_length -= 1
+    return '%s_%s_%s' % (
+        table_name[:table_length], columns[:columns_length], label)
+
 
 def comma_seperated(elements):
     """Create a comma separated string from the iterator
@@ -14,6 +70,56 @@ def comma_seperated(elements):
     return ','.join(elements)
 
 
+def unique(elements):
+    """Remove duplicates from the list while keeping the first occurrences
+    """
+    seen = set()
+    return [x for x in elements if not (x in seen or seen.add(x))]
+
+
+def order_by_list(order_by):
+    """Validate a list of columns to order by, as it is put into the SQL
+    without being sanatized
+
+    Args:
+        order_by(str): Comma separated columns, each optionally followed by
+            ASC or DESC and NULLS FIRST or NULLS LAST
+
+    Returns:
+        result(str): Normalized ORDER BY list
+
+    Raises:
+        ValueError: If the list has anything but columns and orders
+    """
+    items = list()
+    for item in order_by.split(','):
+        match = ORDER_BY_ITEM_REGEX.match(item)
+        if match is None:
+            raise ValueError('Invalid ORDER BY list: %s' % order_by)
+        column, direction, nulls = match.groups()
+        if direction is not None:
+            column += ' ' + direction.upper()
+        if nulls is not None:
+            column += ' NULLS ' + nulls.upper()
+        items.append(column)
+    return ', '.join(items)
+
+
+def equality_condition(column, left_name, right_name):
+    """Condition matching the values of a column between two relations
+
+    Note:
+        Nullable columns also match when the values are NULL on both sides
+    """
+    if column.is_not_null:
+        condition = '{left}.{column} = {right}.{column}'
+    else:
+        condition = ('({left}.{column} = {right}.{column} OR '
+                     '({left}.{column} IS NULL AND {right}.{column} IS NULL))')
+    return condition.format(
+        left=left_name, right=right_name, column=column.name)
+
+
 class Table(Relation):
     """Class representing tables in the database
     """
@@ -26,8 +132,24 @@ class Table(Relation):
             # Take the first statement and ignore the rest
             sql = sql.statements[0]
 
-        parameters = parse_create_table(sql.sql())
+        parameters = cached_parse(parse_create_table, sql.sql())
+        self._initialize(sql, parameters)
+
+    @classmethod
+    def from_parameters(cls, sql, parameters):
+        """Create a table from known parameters without parsing the SQL
+
+        Args:
+            sql(SqlStatement): Statement creating the table
+            parameters(dict): Table data as returned by parse_create_table
+        """
+        table = cls.__new__(cls)
+        table._initialize(sql, parameters)
+        return table
 
+    def _initialize(self, sql, parameters):
+        """Initialize the table attributes from the parsed parameters
+        """
         self.sql_statement = sql
         self.parameters = parameters
 
@@ -41,10 +163,13 @@ class Table(Relation):
 
         self._constraints = parameters.get('constraints', list())
 
+        self._column_cache = None
         self._columns = dict()
         for column_params in parameters.get('columns', list()):
             column_name = column_params['column_name']
-            self._columns[column_name] = Column(**column_params)
+            column = Column(**column_params)
+            column.owner = self
+            self._columns[column_name] = column
 
         self.schema_name, self.table_name = self.initialize_name()
         self.update_attributes_from_columns()
@@ -53,17 +178,18 @@ class Table(Relation):
     def update_attributes_from_columns(self):
         """ Update attributes sortkey and distkey based on columns
         """
-        distkeys = self.dist_keys
-        sortkeys = self.sort_keys
-        for column in self._columns.values():
+        distkeys = list(self.dist_keys)
+        sortkeys = list(self.sort_keys)
+        for column in self.columns():
             # Update the table attributes based on columns
             if column.is_distkey:
                 distkeys.append(column.name)
             if column.is_sortkey:
                 sortkeys.append(column.name)
 
-        self.dist_keys = list(set(distkeys))
-        self.sort_keys = list(set(sortkeys))
+        # Remove duplicates while keeping the order of compound keys
+        self.dist_keys = unique(distkeys)
+        self.sort_keys = unique(sortkeys)
 
     def update_columns_with_constrains(self):
         """ Update columns with primary and foreign key constraints
@@ -71,11 +197,41 @@ class Table(Relation):
         for constraint in self._constraints:
             for col_name in constraint.get('pk_columns', list()):
                 self._columns[col_name].primary = True
+        self.invalidate_columns()
+
+    def invalidate_columns(self):
+        """Clear the cached column orderings after the columns changed
+        """
+        self._column_cache = None
+
+    def _cached_columns(self):
+        """Ordered columns and keys of the table, computed once per change
+        """
+        if self._column_cache is None:
+            columns = tuple(
+                sorted(self._columns.values(), key=lambda x: x.position))
+            primary_keys = tuple(c for c in columns if c.primary)
+
+            references = [([c.name], c.fk_table, [c.fk_reference])
+                          for c in columns if c.fk_table is not None]
+            for constraint in self._constraints:
+                if 'fk_table' in constraint:
+                    references.append((constraint.get('fk_columns'),
+                                       constraint.get('fk_table'),
+                                       constraint.get('fk_reference')))
+
+            self._column_cache = {
+                'columns': columns,
+                'primary_keys': primary_keys,
+                'primary_key_names': tuple(c.name for c in primary_keys),
+                'foreign_key_references': tuple(references),
+            }
+        return self._column_cache
 
     def columns(self):
-        """Unsorted list of columns in the table
+        """Tuple of the columns in the table sorted by position
         """
-        return sorted(self._columns.values(), key=lambda x: x.position)
+        return self._cached_columns()['columns']
 
     def column(self, column_name):
         """Get the column with the given name
@@ -86,29 +242,18 @@ class Table(Relation):
     def primary_keys(self):
         """Primary keys of the table
         """
-        return [c for c in self.columns() if c.primary]
+        return list(self._cached_columns()['primary_keys'])
 
     @property
     def primary_key_names(self):
         """Primary keys of the table
         """
-        return [c.name for c in self.columns() if c.primary]
+        return list(self._cached_columns()['primary_key_names'])
 
     def foreign_key_references(self):
         """Get a list of all foreign key references from the table
         """
-        result = list()
-        for column in self.columns():
-            if column.fk_table is not None:
-                result.append((
-                    [column.name], column.fk_table, [column.fk_reference]))
-
-        for constraint in self._constraints:
-            if 'fk_table' in constraint:
-                result.append((constraint.get('fk_columns'),
-                               constraint.get('fk_table'),
-                               constraint.get('fk_reference')))
-        return result
+        return list(self._cached_columns()['foreign_key_references'])
 
     @property
     def dependencies(self):
@@ -117,28 +262,89 @@ class Table(Relation):
         return [table_name for _, table_name, _
                 in self.foreign_key_references()]
 
-    def temporary_clone_script(self):
-        """Sql script to create a temporary clone table
+    def temporary_clone(self, inherit_attributes=True, diststyle=None,
+                        dist_keys=None, sort_keys=None):
+        """Temporary table with the same columns and primary keys
 
         Note:
-            The temporary table only copies the schema and not any data
+            The table is built from the columns so the SQL is never parsed
+
+        Args:
+            inherit_attributes(bool): Copy the encodings, distribution and
+                sort keys so that joins with this table are co-located
+            diststyle(str): Distribution style overriding the inherited one
+            dist_keys(list of str): Distribution key overriding the inherited
+            sort_keys(list of str): Sort keys overriding the inherited ones
         """
-
         # We don't need to use schema for temp tables
         table_name = self.table_name + '_temp'
 
-        # Create a list of column definitions
-        columns = comma_seperated(
-            ['%s %s' % (c.column_name, c.column_type) for c in self.columns()])
+        if inherit_attributes:
+            if diststyle is None:
+                # The default style is not written out to keep it implicit
+                diststyle = self.parameters.get('diststyle')
+            if dist_keys is None:
+                dist_keys = self.dist_keys
+            if sort_keys is None:
+                sort_keys = self.sort_keys
+
+        columns = list()
+        definitions = list()
+        for column in self.columns():
+            definition = '%s %s' % (column.column_name, column.column_type)
+            column_params = {
+                'column_name': column.column_name,
+                'column_type': column.column_type,
+                'position': len(columns),
+            }
+            if inherit_attributes and column.encoding is not None:
+                definition += ' ENCODE %s' % column.encoding
+                column_params['encoding'] = column.encoding
+            definitions.append(definition)
+            columns.append(column_params)
+        definitions = comma_seperated(definitions)
+
+        constraints = list()
+        if self.primary_key_names:
+            constraints.append({'pk_columns': self.primary_key_names})
+            definitions += ', PRIMARY KEY( %s )' % comma_seperated(
+                self.primary_key_names)
+
+        parameters = {
+            'full_name': table_name,
+            'temporary': True,
+            'columns': columns,
+            'constraints': constraints,
+        }
+
+        attributes = list()
+        if diststyle:
+            attributes.append('DISTSTYLE %s' % diststyle)
+            parameters['diststyle'] = diststyle
+        if dist_keys:
+            attributes.append('DISTKEY(%s)' % comma_seperated(dist_keys))
+            parameters['distkey'] = list(dist_keys)
+        if sort_keys:
+            attributes.append('SORTKEY(%s)' % comma_seperated(sort_keys))
+            parameters['sortkey'] = list(sort_keys)
+
+        sql = format_sql(
+            'CREATE TEMPORARY TABLE {table_name} ( {definitions} ) '
+            '{attributes}',
+            table_name=table_name,
+            definitions=definitions,
+            attributes=' '.join(attributes))
+
+        return Table.from_parameters(
+            SqlStatement.from_trusted_sql(sql), parameters)
 
-        sql = """CREATE TEMPORARY TABLE {table_name} (
-                    {columns},
-                    PRIMARY KEY( {primary_keys} )
-              )""".format(table_name=table_name,
-                          columns=columns,
-                          primary_keys=comma_seperated(self.primary_key_names))
+    def temporary_clone_script(self):
+        """Sql script to create a temporary clone table
 
-        return SqlScript(sql)
+        Note:
+            The temporary table only copies the schema and not any data
+        """
+        return SqlScript(statements=[self.temporary_clone().sql_statement])
 
     def exists_clone_script(self):
         """Sql script to create a exists clone table
@@ -148,53 +354,177 @@ class Table(Relation):
     def drop_script(self):
         """Sql script to drop the table
         """
-        return SqlScript('DROP TABLE IF EXISTS %s CASCADE' % self.full_name)
+        return SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s CASCADE' % self.full_name)
 
     def analyze_script(self):
         """Sql script to analyze the table
         """
-        return SqlScript('ANALYZE %s' % self.full_name)
+        return SqlScript.from_trusted_sql('ANALYZE %s' % self.full_name)
 
     def rename_script(self, new_name):
         """Sql script to rename the table
         """
-        return SqlScript(
-            'ALTER TABLE %s RENAME TO %s' %(self.full_name, new_name))
+        return SqlScript.from_trusted_sql(
+            'ALTER TABLE %s RENAME TO %s' % (self.full_name, new_name))
+
+    def shadow_clone(self, suffix=SHADOW_SUFFIX):
+        """Table with the same definition in the same schema, that is loaded
+        and then swapped with this table
+
+        Args:
+            suffix(str): Suffix added to the name of the table
+        """
+        return Table(SqlStatement.from_trusted_sql(create_exists_clone(
+            self.sql_statement.sql(), self.full_name + suffix)))
+
+    def swap_script(self, shadow, dependencies=None, grant_permissions=True):
+        """Sql script replacing this table by the loaded shadow table in a
+        single transaction
+
+        Note:
+            Views and foreign keys are bound to the replaced table and are
+            dropped with it, so they must be recreated by the dependencies.
+            Without dependencies the replaced table is dropped without
+            cascade, and the swap fails if anything depends on the table.
+
+        Args:
+            shadow(Table): Shadow clone of this table, see shadow_clone
+            dependencies(SqlScript): Script recreating the dependencies, see
+                Database.recreate_table_dependencies
+            grant_permissions(bool): Grant the permissions on the new table
+        """
+        return self._swap_statements(
+            shadow, dependencies, grant_permissions).wrap_transaction()
+
+    def _swap_statements(self, shadow, dependencies, grant_permissions):
+        """Statements of the swap script without the transaction
+        """
+        old_name = self.full_name + OLD_SUFFIX
+        script = SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s' % old_name)
+        script.append(self.rename_script(self.table_name + OLD_SUFFIX))
+        script.append(shadow.rename_script(self.table_name))
+        script.append(SqlScript.from_trusted_sql('DROP TABLE %s%s' % (
+            old_name, ' CASCADE' if dependencies is not None else '')))
+        if grant_permissions:
+            script.append(self.grant_script())
+        script.append(dependencies)
+        return script
 
     def delete_script(self, where_condition=''):
         """Sql script to delete from table based on where condition
         """
-        return SqlScript('DELETE FROM %s %s' %(self.full_name, where_condition))
+        if where_condition:
+            # Conditions given by the caller still need to be sanatized
+            return SqlScript(
+                'DELETE FROM %s %s' % (self.full_name, where_condition))
+        return SqlScript.from_trusted_sql('DELETE FROM %s' % self.full_name)
+
+    def add_column_script(self, column):
+        """Sql script to add a column at the end of the table
+        """
+        sql = 'ALTER TABLE %s ADD COLUMN %s' % (self.full_name, column)
+        if column.encoding is not None:
+            sql += ' ENCODE %s' % column.encoding
+        return SqlScript.from_trusted_sql(sql)
+
+    def drop_column_script(self, column_name):
+        """Sql script to drop a column from the table
+        """
+        return SqlScript.from_trusted_sql(
+            'ALTER TABLE %s DROP COLUMN %s' % (self.full_name, column_name))
 
     def foreign_key_reference_script(self, source_columns, reference_name,
                                      reference_columns):
         """Sql Script to create a FK reference from table x to y
         """
-        sql = """
+        sql = format_sql("""
             ALTER TABLE {source_name}
             ADD FOREIGN KEY ({source_columns})
             REFERENCES {reference_name} ({reference_columns})
-        """.format(source_name=self.full_name,
-                   source_columns=comma_seperated(source_columns),
-                   reference_name=reference_name,
-                   reference_columns=comma_seperated(reference_columns))
+        """, source_name=self.full_name,
+             source_columns=comma_seperated(source_columns),
+             reference_name=reference_name,
+             reference_columns=comma_seperated(reference_columns))
+
+        return SqlScript.from_trusted_sql(sql)
+
+    def drop_foreign_key_script(self, source_columns):
+        """Sql Script to drop the FK reference from the source columns
+
+        Note:
+            The name of the constraint is not looked up in the catalog, the
+            dropped name is the one given by the database to constraints
+            added without a name. Named constraints can not be parsed from
+            the table definition, but a constraint renamed by hand or given
+            a numbered name to avoid a clash with another constraint is not
+            found and the script fails.
+        """
+        constraint_name = default_constraint_name(
+            self.table_name, source_columns, 'fkey')
+        return SqlScript.from_trusted_sql(
+            'ALTER TABLE %s DROP CONSTRAINT %s' % (
+                self.full_name, constraint_name))
+
+    def alter_column_type_script(self, column_name, column_type):
+        """Sql script to change the type of a column in place, only
+        supported by Redshift to widen VARCHAR columns
+        """
+        return SqlScript.from_trusted_sql(
+            'ALTER TABLE %s ALTER COLUMN %s TYPE %s' % (
+                self.full_name, column_name, column_type))
+
+    def copy_through_script(self, target, grant_permissions=True):
+        """Sql script replacing this table by the target definition while
+        keeping the rows, in a single transaction
+
+        The target is created as a shadow table, the columns kept by the
+        target are copied over and the shadow is swapped with this table.
+        The transaction fails and leaves the table as is if the rows do not
+        fit the new definition.
+
+        Note:
+            Views and foreign keys bound to this table are dropped with the
+            replaced table and must be recreated by the caller
 
-        return SqlScript(sql)
+        Args:
+            target(Table): New definition of the table
+            grant_permissions(bool): Grant the permissions on the new table
+        """
+        shadow = target.shadow_clone()
+        column_names = [c.name for c in target.columns()
+                        if self.column(c.name) is not None]
+
+        script = SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s' % shadow.full_name)
+        script.append(shadow.create_script(grant_permissions=False))
+        if column_names:
+            script.append(SqlScript.from_trusted_sql(format_sql("""
+                INSERT INTO {shadow} ({columns})
+                SELECT {columns} FROM {table}
+            """, shadow=shadow.full_name, table=self.full_name,
+                 columns=comma_seperated(column_names))))
+
+        # The rows were copied, so the old table only holds dependencies
+        script.append(self._swap_statements(
+            shadow, SqlScript(), grant_permissions))
+        return script.wrap_transaction()
 
     def select_duplicates_script(self):
         """Sql Script to select duplicate primary keys from the table
         """
         pk_columns = comma_seperated(self.primary_key_names)
-        sql = """
+        sql = format_sql("""
             SELECT {pk_columns}
                 ,COUNT(1) duplicate_count
             FROM {table_name}
             GROUP BY {pk_columns}
             HAVING COUNT(1) > 1
-        """.format(table_name=self.full_name,
-                   pk_columns=pk_columns)
+        """, table_name=self.full_name,
+             pk_columns=pk_columns)
 
-        return SqlScript(sql)
+        return SqlScript.from_trusted_sql(sql)
 
     def _source_sql(self, source_relation):
         """Get the source sql based on the type of the source specified
@@ -218,26 +548,46 @@ class Table(Relation):
         """
         sql = 'INSERT INTO %s (SELECT * FROM %s)' % (
             self.full_name, self._source_sql(source_relation))
-        return SqlScript(sql)
+        return SqlScript.from_trusted_sql(sql)
 
-    def delete_matching_rows_script(self, source_relation):
+    def delete_matching_rows_script(self, source_relation,
+                                    delete_method=DELETE_IN):
         """Sql Script to delete matching rows between table and source
+
+        Args:
+            source_relation(Relation / SelectStatement): Rows to be deleted
+            delete_method(str): 'in' to match the primary keys with a
+                subquery or 'join' to delete with a join against the source
         """
         if len(self.primary_keys) == 0:
             raise RuntimeError(
                 'Cannot delete matching rows from table with no primary keys')
 
-        source_col_names, pk_names = [], []
-        for column in self.columns():
-            if column.primary:
-                pk_names.append(column.name)
-                source_col_names.append(column.name)
+        if delete_method not in DELETE_METHODS:
+            raise ValueError('Delete method must be one of %s' %
+                             comma_seperated(DELETE_METHODS))
+
+        source_sql = self._source_sql(source_relation)
+        if delete_method == DELETE_JOIN:
+            if isinstance(source_relation, SelectStatement):
+                # Subqueries need an alias to be referenced in the condition
+                source_name = self.table_name + '_source'
+                source_sql = '%s %s' % (source_sql, source_name)
+            else:
+                source_name = source_sql
 
-        where_condition = 'WHERE (%s) IN (SELECT DISTINCT %s FROM %s)' % (
-            comma_seperated(pk_names), comma_seperated(source_col_names),
-            self._source_sql(source_relation))
+            condition = ' AND '.join(
+                [equality_condition(c, self.full_name, source_name)
+                 for c in self.primary_keys])
+            sql = 'DELETE FROM %s USING %s WHERE %s' % (
+                self.full_name, source_sql, condition)
+            return SqlScript.from_trusted_sql(sql)
 
-        return self.delete_script(where_condition)
+        pk_names = comma_seperated(self.primary_key_names)
+        sql = 'DELETE FROM %s WHERE (%s) IN (SELECT DISTINCT %s FROM %s)' % (
+            self.full_name, pk_names, pk_names, source_sql)
+
+        return SqlScript.from_trusted_sql(sql)
 
     def de_duplication_script(self):
         """De-duplicate the table to enforce primary keys
@@ -246,16 +596,15 @@ class Table(Relation):
             raise RuntimeError(
                 'Cannot de-duplicate table with no primary keys')
 
-        script = self.temporary_clone_script()
+        temp_table = self.temporary_clone()
+        script = temp_table.create_script(grant_permissions=False)
         column_names = [c.name for c in self.columns()]
 
-        # Create a temporary clone from the script
-        temp_table = self.__class__(script)
         script.append(temp_table.insert_script(self))
         script.append(self.delete_script())
 
         # Pick a random value on multiple primary keys
-        sql = """
+        sql = format_sql("""
             INSERT INTO {table_name} (
                 SELECT {column_names}
                 FROM (
@@ -265,16 +614,169 @@ class Table(Relation):
                         ORDER BY 1 ROWS UNBOUNDED PRECEDING) rnk
                     FROM {temp_table})
                 WHERE rnk = 1)
-        """.format(table_name=self.full_name,
-                   column_names=comma_seperated(column_names),
-                   pk_names=comma_seperated(self.primary_key_names),
-                   temp_table=temp_table.full_name)
+        """, table_name=self.full_name,
+             column_names=comma_seperated(column_names),
+             pk_names=comma_seperated(self.primary_key_names),
+             temp_table=temp_table.full_name)
 
-        script.append(SqlScript(sql))
+        script.append(SqlScript.from_trusted_sql(sql))
+        return script
+
+    @staticmethod
+    def _output_column_names(source_relation):
+        """Names of the columns of the source as seen by an outer query
+
+        Returns:
+            result(list of str): Column names or None if any of the columns
+                is an expression without an alias
+        """
+        names = list()
+        for column in source_relation.columns():
+            # Qualified columns are named after the column itself
+            name = column.name.split('.')[-1]
+            if not IDENTIFIER_REGEX.match(name):
+                return None
+            names.append(name)
+        return names
+
+    def deduplicated_insert_script(self, source_relation, order_by=None):
+        """Sql Script to insert the source keeping one row per primary key
+
+        The rows are ranked with ROW_NUMBER in the same statement as the
+        insert, so the data is only written once. If the source columns
+        can not be referenced by name the rows are inserted and the table is
+        de-duplicated afterwards.
+
+        Args:
+            source_relation(Relation / SelectStatement): Rows to be inserted
+            order_by(str): Order of the rows within a primary key, the first
+                row is kept. Columns are referenced by their source names.
+
+        Raises:
+            ValueError: If order_by is not a list of columns, see
+                order_by_list
+        """
+        if len(self.primary_keys) == 0:
+            raise RuntimeError(
+                'Cannot de-duplicate table with no primary keys')
+        if order_by:
+            order_by = order_by_list(order_by)
+
+        source_sql = self._source_sql(source_relation)
+        source_names = self._output_column_names(source_relation)
+        if source_names is None:
+            if order_by:
+                logger.warning('Source columns are not named, ignoring the '
+                               'de-duplication order %s', order_by)
+            script = self.insert_script(source_relation)
+            script.append(self.de_duplication_script())
+            return script
+
+        # Source columns are matched with the table columns by position
+        pk_names = [source_names[c.position] for c in self.primary_keys
+                    if c.position < len(source_names)]
+        if len(pk_names) != len(self.primary_keys):
+            raise ValueError('Source does not have all the primary keys')
+
+        window = 'PARTITION BY %s' % comma_seperated(pk_names)
+        if order_by:
+            window += ' ORDER BY %s' % order_by
+
+        sql = format_sql("""
+            INSERT INTO {table_name} (
+                SELECT {column_names}
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER ({window}) rnk
+                    FROM {source_sql}) ranked
+                WHERE rnk = 1)
+        """, table_name=self.full_name,
+             column_names=comma_seperated(source_names),
+             window=window,
+             source_sql=source_sql)
+
+        return SqlScript.from_trusted_sql(sql)
+
+    def merge_script(self, source_relation, enforce_primary_key=True,
+                     delete_existing=False, dedupe_order_by=None,
+                     staging_attributes=None):
+        """Sql script to upsert into a table with a single MERGE statement
+
+        Sources that need to be de-duplicated and sources other than tables
+        with the columns of this table are staged in a temporary table first,
+        other tables are merged directly. Deleting the existing rows uses the
+        delete and insert of upsert_script as there is nothing to merge with.
+
+        Args:
+            source_relation(Relation / SelectStatement): Rows to be upserted
+            enforce_primary_key(bool): Keep one source row per primary key
+            delete_existing(bool): Replace all the rows of the table
+            dedupe_order_by(str): Order of the rows within a primary key
+            staging_attributes(dict): Arguments of the temporary clone
+        """
+        if delete_existing:
+            return self.upsert_script(
+                source_relation, enforce_primary_key, delete_existing,
+                dedupe_order_by=dedupe_order_by,
+                staging_attributes=staging_attributes)
+
+        if len(self.primary_keys) == 0:
+            raise RuntimeError('Cannot merge into table with no primary keys')
+
+        # Merge can only reference the source by the names of the columns of
+        # the table, other sources are copied into a temporary table first
+        column_names = [c.name for c in self.columns()]
+        staged = enforce_primary_key or \
+            not isinstance(source_relation, Table) or \
+            [c.name for c in source_relation.columns()] != column_names
+
+        script = SqlScript()
+        temp_table = None
+        if staged:
+            temp_table = self.temporary_clone(
+                **(staging_attributes or dict()))
+            script.append(temp_table.create_script(grant_permissions=False))
+            if enforce_primary_key:
+                script.append(temp_table.deduplicated_insert_script(
+                    source_relation, dedupe_order_by))
+            else:
+                script.append(temp_table.insert_script(source_relation))
+            source_relation = temp_table
+
+        target_name, source_name = 'target_rows', 'source_rows'
+        condition = ' AND '.join(
+            [equality_condition(c, target_name, source_name)
+             for c in self.primary_keys])
+
+        # Merge needs an update clause even if every column is a key
+        updated_names = [c.name for c in self.columns() if not c.primary] or \
+            column_names[:1]
+
+        sql = format_sql("""
+            MERGE INTO {table_name} {target_name}
+            USING {source_table} {source_name}
+            ON {condition}
+            WHEN MATCHED THEN UPDATE SET {updates}
+            WHEN NOT MATCHED THEN INSERT ({column_names})
+                VALUES ({values})
+        """, table_name=self.full_name,
+             target_name=target_name,
+             source_table=source_relation.full_name,
+             source_name=source_name,
+             condition=condition,
+             updates=', '.join(['%s = %s.%s' % (name, source_name, name)
+                                for name in updated_names]),
+             column_names=comma_seperated(column_names),
+             values=comma_seperated(['%s.%s' % (source_name, name)
+                                     for name in column_names]))
+        script.append(SqlScript.from_trusted_sql(sql))
+
+        if temp_table is not None:
+            script.append(temp_table.drop_script())
         return script
 
     def upsert_script(self, source_relation, enforce_primary_key=True,
-                      delete_existing=False):
+                      delete_existing=False, delete_method=DELETE_IN,
+                      dedupe_order_by=None, staging_attributes=None):
         """Sql script to upsert into a table
 
         The script first copies all the source data into a temporary table.
@@ -282,21 +784,173 @@ class Table(Relation):
         table. After which if the delete existing flag is set we delete all
         the data from the destination table otherwise only the rows that match
         the temporary table. After which we copy the temporary table into the
-        destination table.
-        """
-        script = self.temporary_clone_script()
+        destination table. The delete method picks how the matching rows are
+        found, see delete_matching_rows_script.
 
-        # Create a temporary clone from the script
-        temp_table = self.__class__(script)
-        script.append(temp_table.insert_script(source_relation))
+        Duplicates are dropped while the source is copied into the temporary
+        table, dedupe_order_by picks the row kept for every primary key.
+        The temporary table inherits the keys of the table unless they are
+        overridden by the temporary_clone arguments in staging_attributes.
+        """
+        temp_table = self.temporary_clone(**(staging_attributes or dict()))
+        script = temp_table.create_script(grant_permissions=False)
         if enforce_primary_key:
-            script.append(temp_table.de_duplication_script())
+            script.append(temp_table.deduplicated_insert_script(
+                source_relation, dedupe_order_by))
+        else:
+            script.append(temp_table.insert_script(source_relation))
 
         if delete_existing:
             script.append(self.delete_script())
         else:
-            script.append(self.delete_matching_rows_script(temp_table))
+            script.append(
+                self.delete_matching_rows_script(temp_table, delete_method))
 
         script.append(self.insert_script(temp_table))
         script.append(temp_table.drop_script())
         return script
+
+    def chunked_upsert_script(self, source_relation, chunk_count,
+                              chunk_column=None, chunk_rows=None,
+                              enforce_primary_key=True, delete_existing=False,
+                              delete_method=DELETE_IN, dedupe_order_by=None,
+                              staging_attributes=None):
+        """Sql script to upsert into a table in ranges of a column
+
+        The ranges of the chunk column are computed once and stored in a
+        state table along with the chunks that are committed. Every chunk is
+        upserted in its own transaction, so a failed script resumes from the
+        first chunk that was not committed when it is run again. Rows without
+        a value in the chunk column are upserted first as chunk 0. The state
+        table is dropped once every chunk is upserted.
+
+        Note:
+            Rows are de-duplicated within a chunk, so the chunk column should
+            be part of the primary key for an exact de-duplication
+
+        Args:
+            source_relation(Relation / SelectStatement): Rows to be upserted
+            chunk_count(int): Number of chunks, or the maximum number of
+                chunks if chunk_rows is given
+            chunk_column(str): Column of the table to split the source on,
+                defaults to the first primary key
+            chunk_rows(int): Target number of source rows in every chunk
+            enforce_primary_key(bool): Keep one source row per primary key
+            delete_existing(bool): Delete all the rows of the table before
+                the first chunk
+            delete_method(str): How the matching rows are deleted
+            dedupe_order_by(str): Order of the rows within a primary key
+            staging_attributes(dict): Arguments of the temporary clone
+        """
+        if len(self.primary_keys) == 0:
+            raise RuntimeError(
+                'Cannot upsert in chunks into table with no primary keys')
+        if chunk_count < 1:
+            raise ValueError('Chunk count must be positive')
+
+        if chunk_column is None:
+            chunk_column = self.primary_keys[0].name
+        column = self.column(chunk_column)
+        if column is None:
+            raise ValueError('Chunk column %s is not in the table' %
+                             chunk_column)
+
+        # Source columns are matched with the table columns by position
+        source_sql = self._source_sql(source_relation)
+        source_names = self._output_column_names(source_relation)
+        if source_names is None or column.position >= len(source_names):
+            raise ValueError('Source does not have a named chunk column')
+        source_column = source_names[column.position]
+        if isinstance(source_relation, SelectStatement):
+            dependencies = source_relation.dependencies
+        else:
+            dependencies = [source_relation.full_name]
+
+        state_name = self.full_name + '_upsert_chunks'
+        if chunk_rows is None:
+            tiles = format_sql("""
+                SELECT value, NTILE({chunk_count}) OVER (ORDER BY value) chunk
+                FROM (
+                    SELECT DISTINCT {source_column} AS value
+                    FROM {source_sql} chunk_source
+                    WHERE {source_column} IS NOT NULL) chunk_values
+            """, chunk_count=chunk_count,
+                 source_column=source_column,
+                 source_sql=source_sql)
+        else:
+            # Values are weighted by their rows and never split across chunks
+            tiles = format_sql("""
+                SELECT value, LEAST({chunk_count}, FLOOR((
+                    SUM(value_rows) OVER (
+                        ORDER BY value ROWS UNBOUNDED PRECEDING) -
+                    value_rows) / {chunk_rows}) + 1) chunk
+                FROM (
+                    SELECT {source_column} AS value, COUNT(1) value_rows
+                    FROM {source_sql} chunk_source
+                    WHERE {source_column} IS NOT NULL
+                    GROUP BY 1) chunk_values
+            """, chunk_count=chunk_count,
+                 chunk_rows=chunk_rows,
+                 source_column=source_column,
+                 source_sql=source_sql)
+
+        script = SqlScript.from_trusted_sql(format_sql("""
+            CREATE TABLE IF NOT EXISTS {state_name} (
+                chunk INTEGER,
+                min_value {column_type},
+                max_value {column_type},
+                completed BOOLEAN)
+        """, state_name=state_name, column_type=column.column_type))
+
+        # Only the first run deletes the rows and computes the ranges
+        state_script = SqlScript()
+        if delete_existing:
+            state_script.append(SqlScript.from_trusted_sql(format_sql("""
+                DELETE FROM {table_name}
+                WHERE NOT EXISTS (SELECT 1 FROM {state_name})
+            """, table_name=self.full_name, state_name=state_name)))
+        # The NULL chunk is always there, as the ranges never include NULL
+        state_script.append(SqlScript.from_trusted_sql(format_sql("""
+            INSERT INTO {state_name} (
+                SELECT chunk, MIN(value), MAX(value), FALSE
+                FROM ( {tiles} UNION ALL SELECT NULL, 0 ) chunk_tiles
+                WHERE NOT EXISTS (SELECT 1 FROM {state_name})
+                GROUP BY chunk)
+        """, state_name=state_name, tiles=tiles)))
+        script.append(state_script.wrap_transaction())
+
+        for chunk in range(chunk_count + 1):
+            if chunk == 0:
+                condition = 'chunk_source.%s IS NULL' % source_column
+            else:
+                condition = ('chunk_source.{0} BETWEEN chunk_state.min_value '
+                             'AND chunk_state.max_value'.format(source_column))
+
+            chunk_source = SelectStatement.from_trusted_sql(format_sql("""
+                SELECT {columns}
+                FROM {source_sql} chunk_source, {state_name} chunk_state
+                WHERE chunk_state.chunk = {chunk}
+                    AND NOT chunk_state.completed
+                    AND {condition}
+            """, columns=comma_seperated(
+                     ['chunk_source.' + name for name in source_names]),
+                 source_sql=source_sql,
+                 state_name=state_name,
+                 chunk=chunk,
+                 condition=condition),
+                source_names, dependencies + [state_name])
+
+            chunk_script = self.upsert_script(
+                chunk_source,
+                enforce_primary_key=enforce_primary_key,
+                delete_method=delete_method,
+                dedupe_order_by=dedupe_order_by,
+                staging_attributes=staging_attributes)
+            chunk_script.append(SqlScript.from_trusted_sql(format_sql("""
+                UPDATE {state_name} SET completed = TRUE WHERE chunk = {chunk}
+            """, state_name=state_name, chunk=chunk)))
+            script.append(chunk_script.wrap_transaction())
+
+        script.append(SqlScript.from_trusted_sql(
+            'DROP TABLE IF EXISTS %s' % state_name))
+        return script
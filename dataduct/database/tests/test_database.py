@@ -3,6 +3,7 @@
 import os
 
 from unittest import TestCase
+from testfixtures import LogCapture
 from testfixtures import TempDirectory
 from nose.tools import assert_not_equal
 from nose.tools import eq_
@@ -111,6 +112,51 @@ class TestDatabase(TestCase):
                     'SELECT * FROM test_table;')
             Database(files=[os.path.join(d.path, 'test.sql')])
 
+    def test_create_from_file_parallel(self):
+        """Database initialization from files with worker processes keeps
+        the order of the files
+        """
+        with TempDirectory() as d:
+            filenames = list()
+            for i in range(6):
+                d.write('table_%d.sql' % i,
+                        'CREATE TABLE table_%d (id INTEGER);' % i)
+                filenames.append(os.path.join(d.path, 'table_%d.sql' % i))
+            relations = Database._initialize_relations(filenames, workers=2)
+            eq_([x.full_name for x in relations],
+                ['table_%d' % i for i in range(6)])
+
+    @staticmethod
+    @raises(ValueError)
+    def test_create_from_file_parallel_no_relation():
+        """Errors of the worker processes are raised in the parent
+        """
+        with TempDirectory() as d:
+            d.write('table.sql', 'CREATE TABLE test_table (id INTEGER);')
+            d.write('test.sql', 'SELECT * FROM test_table;')
+            Database(files=[os.path.join(d.path, 'table.sql'),
+                            os.path.join(d.path, 'test.sql')], workers=2)
+
+    @staticmethod
+    def test_create_from_file_parallel_traceback():
+        """The traceback of a worker error is logged in the parent
+        """
+        with TempDirectory() as d, LogCapture() as log:
+            d.write('table.sql', 'CREATE TABLE test_table (id INTEGER);')
+            d.write('test.sql', 'SELECT * FROM test_table;')
+            try:
+                Database(files=[os.path.join(d.path, 'table.sql'),
+                                os.path.join(d.path, 'test.sql')], workers=2)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError('ValueError not raised')
+
+            message = log.records[-1].getMessage()
+            assert 'test.sql' in message
+            assert 'in _load_relation' in message
+            assert 'does not create a relation' in message
+
     @staticmethod
     @raises(ValueError)
     def test_create_two_arguments():
@@ -182,6 +228,38 @@ class TestDatabase(TestCase):
                                        self.second_table_dependent])
         database.sorted_relations()
 
+    def test_database_cycles(self):
+        """Members of the cycles of a database are reported
+        """
+        database = Database(relations=[self.first_table_dependent,
+                                       self.second_table_dependent,
+                                       self.basic_table])
+        eq_(database.cycles(), [['first_table', 'second_table']])
+
+    def test_database_sorted_relations_self_reference(self):
+        """Self referencing tables are not cycles
+        """
+        table = self._create_table(
+            """CREATE TABLE tree (
+                id INTEGER PRIMARY KEY,
+                parent_id INTEGER REFERENCES tree(id)
+            );""")
+        database = Database(relations=[table])
+        eq_(database.has_cycles(), False)
+        eq_(database.sorted_relations(), [table])
+
+    def test_database_sorted_relation_levels(self):
+        """Relations are grouped into levels of independent relations
+        """
+        database = Database(relations=[self.first_table_dependent,
+                                       self.second_table,
+                                       self.basic_table,
+                                       self.basic_view])
+        levels = [[x.full_name for x in level]
+                  for level in database.sorted_relation_levels()]
+        eq_(levels, [['second_table', 'test_table'],
+                     ['first_table', 'test_view']])
+
     @staticmethod
     def _compare_scripts(actual_script, expected_script):
         """Validates a SqlScript chain
@@ -238,3 +316,190 @@ class TestDatabase(TestCase):
             result)
         eq_(database.recreate_table_dependencies('first_table', False).sql(),
             ';')
+
+    def test_database_dependents(self):
+        """Direct and transitive dependents of a relation
+        """
+        view = self._create_view(
+            """CREATE VIEW view AS (
+                SELECT id1 FROM second_table
+            );""")
+        view_on_view = self._create_view(
+            'CREATE VIEW a_view AS (SELECT id1 FROM view);')
+        database = Database(relations=[self.first_table_dependent,
+                                       self.second_table, view, view_on_view])
+
+        eq_([x.full_name for x in database.dependents('second_table')],
+            ['first_table', 'view'])
+        eq_([x.full_name for x in database.dependents(
+            'second_table', transitive=True)],
+            ['first_table', 'view', 'a_view'])
+        eq_(database.dependents('a_view'), [])
+
+    def test_database_recreate_table_dependencies_transitive(self):
+        """Views on top of dependent views are recreated after them
+        """
+        view = self._create_view(
+            """CREATE VIEW view AS (
+                SELECT id1 FROM second_table
+            );""")
+        view_on_view = self._create_view(
+            'CREATE VIEW a_view AS (SELECT id1 FROM view);')
+        database = Database(relations=[self.second_table, view, view_on_view])
+
+        result = ['DROP VIEW IF EXISTS view CASCADE',
+                  'CREATE VIEW view AS ( SELECT id1 FROM second_table )',
+                  'DROP VIEW IF EXISTS a_view CASCADE',
+                  'CREATE VIEW a_view AS (SELECT id1 FROM view)']
+        self._compare_scripts(
+            database.recreate_table_dependencies('second_table', False),
+            result)
+
+    def test_database_diff_add_column(self):
+        """Appending a nullable column alters the table in place and
+        recreates the dependent views
+        """
+        view = self._create_view(
+            'CREATE VIEW test_view AS (SELECT id FROM test_table);')
+        current = Database(relations=[self.basic_table, view])
+        target = Database(relations=[
+            self._create_table(
+                'CREATE TABLE test_table (id INTEGER, name VARCHAR(10));'),
+            view.copy()])
+
+        result = ['DROP VIEW IF EXISTS test_view CASCADE',
+                  'ALTER TABLE test_table ADD COLUMN name VARCHAR(10)',
+                  'CREATE VIEW test_view AS (SELECT id FROM test_table)']
+        self._compare_scripts(current.diff(target, False), result)
+
+    def test_database_diff_drop_column_and_foreign_key(self):
+        """Dropping columns and adding foreign keys alters the table
+        """
+        current = Database(relations=[
+            self.second_table,
+            self._create_table('CREATE TABLE first_table '
+                               '(id1 INTEGER, id2 INTEGER, x DATE);')])
+        target = Database(relations=[
+            self.second_table.copy(), self.first_table_dependent])
+
+        result = ['ALTER TABLE first_table DROP COLUMN x',
+                  'ALTER TABLE first_table ADD FOREIGN KEY (id2) '
+                  'REFERENCES second_table (id2)']
+        self._compare_scripts(current.diff(target, False), result)
+
+    def test_database_diff_copy_through(self):
+        """Changing a column type copies the rows to a new table and
+        recreates its dependencies
+        """
+        view = self._create_view(
+            'CREATE VIEW view AS (SELECT id1 FROM second_table);')
+        current = Database(relations=[
+            self.first_table_dependent, self.second_table, view])
+        target = Database(relations=[
+            self.first_table_dependent.copy(),
+            self._create_table(
+                'CREATE TABLE second_table (id1 INTEGER, id2 BIGINT);'),
+            view.copy()])
+
+        result = ['DROP VIEW IF EXISTS view CASCADE',
+                  'BEGIN',
+                  'DROP TABLE IF EXISTS second_table_shadow',
+                  'CREATE  TABLE IF NOT EXISTS second_table_shadow  '
+                  '(id1 INTEGER, id2 BIGINT)',
+                  'INSERT INTO second_table_shadow (id1,id2) '
+                  'SELECT id1,id2 FROM second_table',
+                  'DROP TABLE IF EXISTS second_table_old',
+                  'ALTER TABLE second_table RENAME TO second_table_old',
+                  'ALTER TABLE second_table_shadow RENAME TO second_table',
+                  'DROP TABLE second_table_old CASCADE',
+                  'COMMIT',
+                  'ALTER TABLE first_table ADD FOREIGN KEY (id2) '
+                  'REFERENCES second_table (id2)',
+                  'CREATE VIEW view AS (SELECT id1 FROM second_table)']
+        self._compare_scripts(current.diff(target, False), result)
+
+    def test_database_diff_widen_varchar(self):
+        """Widening a VARCHAR alters the column in place
+        """
+        current = Database(relations=[self._create_table(
+            'CREATE TABLE test_table (id INTEGER, name VARCHAR(10));')])
+        target = Database(relations=[self._create_table(
+            'CREATE TABLE test_table (id INTEGER, name VARCHAR(20));')])
+
+        result = ['ALTER TABLE test_table ALTER COLUMN name TYPE VARCHAR(20)']
+        self._compare_scripts(current.diff(target, False), result)
+
+        # Narrowing a VARCHAR needs the rows to be copied
+        eq_(target.diff(current, False).statements[0].sql(), 'BEGIN')
+
+    def test_database_diff_drop_foreign_key(self):
+        """Removed foreign keys are dropped by their constraint name
+        """
+        current = Database(relations=[
+            self.second_table, self.first_table_dependent])
+        target = Database(relations=[
+            self.second_table.copy(), self.first_table])
+
+        result = ['ALTER TABLE first_table '
+                  'DROP CONSTRAINT first_table_id2_fkey']
+        self._compare_scripts(current.diff(target, False), result)
+
+    def test_database_diff_drop_foreign_key_copied_reference(self):
+        """Foreign keys to a copied table are dropped before the copy
+        removes them along with the old table
+        """
+        current = Database(relations=[
+            self.second_table, self.first_table_dependent])
+        target = Database(relations=[
+            self._create_table(
+                'CREATE TABLE second_table (id1 INTEGER, id2 BIGINT);'),
+            self.first_table])
+
+        statements = [x.sql() for x in current.diff(target, False).statements]
+        eq_(statements[:2], [
+            'ALTER TABLE first_table DROP CONSTRAINT first_table_id2_fkey',
+            'BEGIN'])
+        eq_(statements[-2:], ['DROP TABLE second_table_old CASCADE', 'COMMIT'])
+
+    def test_database_diff_drop_foreign_key_removed_reference(self):
+        """Foreign keys to a removed table are dropped before the table
+        """
+        current = Database(relations=[
+            self.second_table, self.first_table_dependent])
+        target = Database(relations=[self.first_table])
+
+        result = ['ALTER TABLE first_table '
+                  'DROP CONSTRAINT first_table_id2_fkey',
+                  'DROP TABLE IF EXISTS second_table CASCADE']
+        self._compare_scripts(current.diff(target, False), result)
+
+    def test_database_diff_never_drops_rows(self):
+        """No change to a table drops it without copying its rows
+        """
+        current = Database(relations=[self._create_table(
+            'CREATE TABLE test_table (id INTEGER, name VARCHAR(10));')])
+        for sql in ['CREATE TABLE test_table (name VARCHAR(10), id INTEGER);',
+                    'CREATE TABLE test_table (id INTEGER DISTKEY, '
+                    'name VARCHAR(10));',
+                    'CREATE TABLE test_table (id INTEGER NOT NULL, '
+                    'name VARCHAR(10));']:
+            script = current.diff(
+                Database(relations=[self._create_table(sql)]), False)
+            statements = [x.sql() for x in script.statements]
+            assert 'DROP TABLE IF EXISTS test_table CASCADE' not in statements
+            assert 'INSERT INTO test_table_shadow (id,name) ' \
+                'SELECT id,name FROM test_table' in statements or \
+                'INSERT INTO test_table_shadow (name,id) ' \
+                'SELECT name,id FROM test_table' in statements
+
+    def test_database_diff_create_and_drop(self):
+        """Relations only in one of the databases are created or dropped
+        """
+        current = Database(relations=[self.basic_table, self.first_table])
+        target = Database(relations=[
+            self.basic_table.copy(), self.second_table])
+
+        result = ['DROP TABLE IF EXISTS first_table CASCADE',
+                  'CREATE TABLE second_table ( id1 INTEGER, id2 INTEGER )']
+        self._compare_scripts(current.diff(target, False), result)
+        eq_(current.diff(current.copy()).sql(), ';')
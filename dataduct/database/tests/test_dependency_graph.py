@@ -0,0 +1,87 @@
+"""Tests for the dependency graph
+"""
+from unittest import TestCase
+from nose.tools import eq_
+from nose.tools import raises
+
+from ..dependency_graph import DependencyGraph
+
+
+class TestDependencyGraph(TestCase):
+    """Tests for the dependency graph
+    """
+
+    @staticmethod
+    def test_ignores_self_and_missing_dependencies():
+        """Self references and unknown nodes are not edges
+        """
+        graph = DependencyGraph({'a': ['a', 'b', 'missing'], 'b': []})
+        eq_(graph.dependencies('a'), ['b'])
+        eq_(graph.dependents('b'), ['a'])
+        eq_(graph.has_cycles(), False)
+
+    @staticmethod
+    def test_cycles():
+        """Cycles are reported with all their members
+        """
+        graph = DependencyGraph({
+            'a': ['b'], 'b': ['c'], 'c': ['a'],
+            'd': ['e'], 'e': ['d'],
+            'f': ['a'],
+        })
+        eq_(graph.cycles(), [['a', 'b', 'c'], ['d', 'e']])
+        eq_(graph.has_cycles(), True)
+
+    @staticmethod
+    @raises(RuntimeError)
+    def test_topological_sort_cyclic():
+        """Sorting a cyclic graph raises an error
+        """
+        DependencyGraph({'a': ['b'], 'b': ['a']}).topological_sort()
+
+    @staticmethod
+    def test_topological_sort():
+        """Dependencies come first and ties are broken by name
+        """
+        graph = DependencyGraph({
+            'd': ['b', 'c'], 'c': ['a'], 'b': ['a'], 'a': [], 'e': [],
+        })
+        eq_(graph.topological_sort(), ['a', 'b', 'c', 'd', 'e'])
+
+    @staticmethod
+    def test_topological_levels():
+        """Nodes are placed in the level after their last dependency
+        """
+        graph = DependencyGraph({
+            'd': ['b', 'c'], 'c': ['a'], 'b': [], 'a': [], 'e': ['d'],
+        })
+        eq_(graph.topological_levels(), [['a', 'b'], ['c'], ['d'], ['e']])
+
+    @staticmethod
+    def test_deep_chain():
+        """Long chains do not hit the recursion limit
+        """
+        size = 5000
+        graph = DependencyGraph(dict(
+            ('n%05d' % i, ['n%05d' % (i - 1)] if i else [])
+            for i in range(size)))
+        eq_(graph.has_cycles(), False)
+        eq_(len(graph.topological_sort()), size)
+
+    @staticmethod
+    def test_components_computed_once():
+        """Checking and sorting share a single strongly connected pass
+        """
+        graph = DependencyGraph({'b': ['a'], 'a': []})
+        calls = []
+        components = graph.strongly_connected_components
+
+        def counting_components():
+            calls.append(1)
+            return components()
+
+        graph.strongly_connected_components = counting_components
+        graph.has_cycles()
+        eq_(graph.topological_sort(), ['a', 'b'])
+        eq_(graph.topological_levels(), [['a'], ['b']])
+        eq_(len(calls), 1)
@@ -7,6 +7,7 @@ from nose.tools import eq_
 from ..sql.sql_script import SqlScript
 from ..table import Table
 from ..history_table import HistoryTable
+from ..select_statement import SelectStatement
 
 
 class TestHistoryTable(TestCase):
@@ -78,9 +79,10 @@ class TestHistoryTable(TestCase):
             # Expire deleted rows
             'UPDATE test_history_table '
                 'SET expiration_ts = SYSDATE - INTERVAL \'0.000001 seconds\' '
-            'WHERE ( id ) NOT IN ( '
-                'SELECT id '
+            'WHERE NOT EXISTS ( '
+                'SELECT 1 '
                 'FROM test_table '
+                'WHERE test_history_table.id = test_table.id '
             ') '
             'AND expiration_ts = \'9999-12-31 23:59:59.999999\'',
             # Delete updated rows from temp table
@@ -111,3 +113,224 @@ class TestHistoryTable(TestCase):
         eq_(len(actual_script), len(expected_script))
         for actual, expected in zip(actual_script, expected_script):
             eq_(actual.sql(), expected)
+
+    def test_history_script_hash(self):
+        """Changed rows are detected with a hash of the non-key columns
+        """
+        actual_script = self.basic_history_table.update_history_script(
+            self.basic_table, hash_function='md5')
+        value_hash = ("MD5(CASE WHEN {table}.value IS NULL THEN 'N' "
+                      "ELSE CAST(MD5(CAST({table}.value AS VARCHAR(65535))) "
+                      "AS VARCHAR(32)) END)")
+        eq_(actual_script.statements[2].sql(),
+            'UPDATE test_history_table '
+                'SET expiration_ts = SYSDATE - INTERVAL \'0.000001 seconds\' '
+            'FROM test_table '
+            'WHERE test_history_table.id = test_table.id '
+            'AND ' + value_hash.format(table='test_history_table') +
+            ' != ' + value_hash.format(table='test_table') + ' '
+            'AND expiration_ts = \'9999-12-31 23:59:59.999999\'')
+
+    def test_history_script_hash_column(self):
+        """Stored hashes are compared and written with the new rows
+        """
+        history_table = self._create_history_table(
+            """CREATE TABLE test_history_table (
+                effective_ts TIMESTAMP,
+                expiration_ts TIMESTAMP,
+                id INTEGER,
+                value VARCHAR(25),
+                row_hash BIGINT
+            );""")
+        actual_script = history_table.update_history_script(
+            self.basic_table, hash_function='fnv', hash_column='row_hash')
+        value_hash = ("FNV_HASH(CASE WHEN {table}.value IS NULL THEN 'N' "
+                      "ELSE CAST(FNV_HASH(CAST({table}.value AS "
+                      "VARCHAR(65535))) AS VARCHAR(32)) END)")
+
+        assert ('AND (test_history_table.row_hash IS NULL OR '
+                'test_history_table.row_hash != ' +
+                value_hash.format(table='test_table') + ') ') in \
+            actual_script.statements[2].sql()
+        eq_(actual_script.statements[5].sql(),
+            'INSERT INTO test_history_table ('
+                'SELECT * FROM ('
+                    'SELECT SYSDATE, '
+                        '\'9999-12-31 23:59:59.999999\'::TIMESTAMP, '
+                        'id, value, ' +
+                        value_hash.format(table='test_table_temp') + ' '
+                    'FROM test_table_temp'
+                ')'
+            ')')
+
+    def test_hash_expression_wide_rows(self):
+        """Rows are hashed from the hashes of the columns, so the hashed
+        text does not grow with the width of the columns
+        """
+        columns = self.basic_history_table.columns()[2:]
+        column_hash = ("CASE WHEN t.{column} IS NULL THEN 'N' ELSE "
+                       "CAST(MD5(CAST(t.{column} AS VARCHAR(65535))) "
+                       "AS VARCHAR(32)) END")
+        eq_(self.basic_history_table._hash_expression('t', columns, 'md5'),
+            'MD5(' + " || '|' || ".join(
+                column_hash.format(column=c.name) for c in columns) + ')')
+
+    @raises(ValueError)
+    def test_history_script_hash_column_position(self):
+        """The stored hash must be the last column of the history table
+        """
+        history_table = self._create_history_table(
+            """CREATE TABLE test_history_table (
+                effective_ts TIMESTAMP,
+                expiration_ts TIMESTAMP,
+                row_hash BIGINT,
+                id INTEGER,
+                value VARCHAR(25)
+            );""")
+        history_table.update_history_script(
+            self.basic_table, hash_function='fnv', hash_column='row_hash')
+
+    def test_history_script_incremental(self):
+        """Only the change set is compared with the history
+        """
+        changes = SelectStatement(
+            "SELECT id, value FROM test_table WHERE value = 'changed'")
+        actual_script = self.basic_history_table.update_history_script(
+            self.basic_table, changes=changes)
+
+        eq_(len(actual_script), 6)
+        eq_(actual_script.statements[1].sql(),
+            'INSERT INTO test_table_temp (SELECT * FROM '
+            '(SELECT id, value FROM test_table WHERE value = \'changed\'))')
+        assert 'FROM test_table_temp WHERE test_history_table.id = ' \
+            'test_table_temp.id' in actual_script.statements[2].sql()
+
+        # Deletes are only detected on request
+        actual_script = self.basic_history_table.update_history_script(
+            self.basic_table, changes=changes, detect_deletes=True)
+        eq_(len(actual_script), 7)
+        assert 'NOT EXISTS ( SELECT 1 FROM test_table WHERE' in \
+            actual_script.statements[3].sql()
+
+    def test_history_script_watermark(self):
+        """Source rows past the history watermark are the change set
+        """
+        table = self._create_table(
+            """CREATE TABLE test_table (
+                id INTEGER PRIMARY KEY,
+                value VARCHAR(25),
+                updated_at TIMESTAMP
+            );""")
+        history_table = self._create_history_table(
+            """CREATE TABLE test_history_table (
+                effective_ts TIMESTAMP,
+                expiration_ts TIMESTAMP,
+                id INTEGER,
+                value VARCHAR(25),
+                updated_at TIMESTAMP
+            );""")
+        actual_script = history_table.update_history_script(
+            table, watermark_column='updated_at')
+
+        eq_(actual_script.statements[1].sql(),
+            'INSERT INTO test_table_temp (SELECT * FROM ('
+            'SELECT * FROM test_table '
+            'WHERE updated_at > '
+            '(SELECT MAX(updated_at) FROM test_history_table) '
+            'OR (SELECT MAX(updated_at) FROM test_history_table) IS NULL))')
+
+    @raises(ValueError)
+    def test_history_script_unknown_watermark(self):
+        """The watermark column must exist on both sides
+        """
+        self.basic_history_table.update_history_script(
+            self.basic_table, watermark_column='updated_at')
+
+    def test_history_script_current_table(self):
+        """The current table replaces the scan of the history
+        """
+        current_table = self._create_table(
+            """CREATE TABLE test_current_table (
+                id INTEGER PRIMARY KEY,
+                value VARCHAR(25)
+            );""")
+        actual_script = self.basic_history_table.update_history_script(
+            self.basic_table, current_table=current_table)
+        statements = [s.sql() for s in actual_script]
+
+        eq_(statements[0], 'BEGIN')
+        eq_(statements[-1], 'COMMIT')
+        eq_(statements[2],
+            'INSERT INTO test_current_table ( SELECT * FROM ( '
+            'SELECT id, value FROM test_history_table '
+            'WHERE expiration_ts = \'9999-12-31 23:59:59.999999\' '
+            ') current_rows WHERE NOT EXISTS '
+            '(SELECT 1 FROM test_current_table))')
+        assert statements[6].startswith(
+            'DELETE FROM test_current_table USING test_table '
+            'WHERE test_current_table.id = test_table.id AND ( '
+            'test_current_table.value != test_table.value')
+        assert statements[7].startswith(
+            'DELETE FROM test_current_table WHERE NOT EXISTS')
+        eq_(statements[8],
+            'DELETE FROM test_table_temp WHERE (id) IN '
+            '(SELECT DISTINCT id FROM test_current_table)')
+        eq_(statements[10],
+            'INSERT INTO test_current_table (SELECT * FROM test_table_temp)')
+
+    @raises(ValueError)
+    def test_history_script_current_table_columns(self):
+        """The current table must have the columns of the source
+        """
+        current_table = self._create_table(
+            'CREATE TABLE test_current_table (id INTEGER PRIMARY KEY);')
+        self.basic_history_table.update_history_script(
+            self.basic_table, current_table=current_table)
+
+    def test_compaction_script(self):
+        """Every batch of keys is compacted in its own transaction
+        """
+        actual_script = self.basic_history_table.compaction_script(
+            ['id'], batch_count=3)
+        statements = [s.sql() for s in actual_script]
+        eq_(statements.count('BEGIN'), 3)
+        eq_(statements[-1], 'DROP TABLE IF EXISTS test_history_table_ranges')
+        assert "INTERVAL '1 second' >= effective_ts" in statements[4]
+        eq_(statements[5],
+            'DELETE FROM test_history_table USING test_history_table_ranges '
+            'WHERE test_history_table_ranges.batch = 1 '
+            'AND test_history_table.id BETWEEN '
+            'test_history_table_ranges.min_value AND '
+            'test_history_table_ranges.max_value')
+
+    @raises(ValueError)
+    def test_compaction_script_no_keys(self):
+        """Compaction needs the columns identifying the versioned rows
+        """
+        self.basic_history_table.compaction_script()
+
+    @raises(ValueError)
+    def test_retention_script_credentials(self):
+        """Only the ARN of an IAM role is accepted for the unload
+        """
+        self.basic_history_table.retention_script(
+            "SYSDATE - INTERVAL '30 days'", archive_path='s3://bucket/path/',
+            archive_iam_role='aws_access_key_id=a;aws_secret_access_key=b')
+
+    def test_retention_script(self):
+        """Expired versions are unloaded before they are deleted
+        """
+        actual_script = self.basic_history_table.retention_script(
+            "SYSDATE - INTERVAL '30 days'", archive_path='s3://bucket/path/',
+            archive_iam_role='arn:aws:iam::123456789012:role/unload')
+        eq_([s.sql() for s in actual_script], [
+            'BEGIN',
+            'UNLOAD (\'SELECT * FROM test_history_table WHERE expiration_ts '
+            '< SYSDATE - INTERVAL \'\'30 days\'\'\') TO \'s3://bucket/path/\' '
+            'IAM_ROLE \'arn:aws:iam::123456789012:role/unload\' '
+            'DELIMITER \'\\t\' ESCAPE '
+            'NULL AS \'NULL\' GZIP ALLOWOVERWRITE',
+            'DELETE FROM test_history_table WHERE expiration_ts < '
+            'SYSDATE - INTERVAL \'30 days\'',
+            'COMMIT',
+        ])
@@ -0,0 +1,76 @@
+"""Tests for the table maintenance decisions
+"""
+from unittest import TestCase
+from nose.tools import eq_
+
+from ..maintenance import ANALYZE
+from ..maintenance import VACUUM_DELETE
+from ..maintenance import VACUUM_SORT
+from ..maintenance import maintenance_decisions
+from ..maintenance import maintenance_script
+from ..maintenance import table_info_script
+
+
+class TestMaintenance(TestCase):
+    """Tests for the table maintenance decisions
+    """
+
+    @staticmethod
+    def _table_info(tbl_rows=1000, estimated_visible_rows=1000, stats_off=0.0,
+                    unsorted=0.0):
+        """Row of SVV_TABLE_INFO for a table
+        """
+        return {
+            'tbl_rows': tbl_rows,
+            'estimated_visible_rows': estimated_visible_rows,
+            'stats_off': stats_off,
+            'unsorted': unsorted,
+        }
+
+    def test_nothing_needed(self):
+        """Healthy tables are not maintained
+        """
+        decisions = maintenance_decisions(self._table_info())
+        eq_([(command, run) for command, run, _ in decisions],
+            [(VACUUM_DELETE, False), (VACUUM_SORT, False), (ANALYZE, False)])
+        eq_(len(maintenance_script('dev.test_table', decisions)), 0)
+
+    def test_thresholds_crossed(self):
+        """Vacuums run before the analyze when thresholds are crossed
+        """
+        decisions = maintenance_decisions(self._table_info(
+            estimated_visible_rows=700, stats_off=15.0, unsorted=30.0))
+        eq_([run for _, run, _ in decisions], [True, True, True])
+        eq_(maintenance_script('dev.test_table', decisions).sql(),
+            'VACUUM DELETE ONLY dev.test_table;\n'
+            'VACUUM SORT ONLY dev.test_table;\n'
+            'ANALYZE dev.test_table;')
+
+    def test_stale_statistics(self):
+        """Tables are analyzed when their statistics are stale enough
+        """
+        decisions = maintenance_decisions(self._table_info(stats_off=5.0))
+        eq_(decisions[-1],
+            (ANALYZE, False, 'statistics are 5.0% stale, threshold 10.0%'))
+
+        decisions = maintenance_decisions(
+            self._table_info(stats_off=5.0), analyze_threshold=5)
+        eq_(decisions[-1][1], True)
+
+    def test_missing_statistics(self):
+        """Empty tables and tables without sort keys are skipped
+        """
+        decisions = maintenance_decisions(None)
+        eq_([run for _, run, _ in decisions], [False, False, False])
+
+        decisions = maintenance_decisions(self._table_info(unsorted=None))
+        eq_(decisions[1], (VACUUM_SORT, False, 'table has no sort key'))
+
+    @staticmethod
+    def test_table_info_script():
+        """Unqualified tables are in the public schema
+        """
+        eq_(table_info_script('test_table').sql(),
+            'SELECT tbl_rows, estimated_visible_rows, stats_off, unsorted '
+            'FROM svv_table_info WHERE "schema" = \'public\' AND '
+            '"table" = \'test_table\';')
@@ -0,0 +1,417 @@
+"""Tests running the generated SQL against a PostgreSQL database
+
+Note:
+    The tests are skipped unless DATADUCT_TEST_POSTGRES_DSN is set to the
+    connection string of a database the tests can create tables in
+"""
+import os
+
+from unittest import TestCase
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+
+from ..database import Database
+from ..table import Table
+from ..history_table import HistoryTable
+from ..view import View
+from ..select_statement import SelectStatement
+from ..sql import SqlScript
+from ..sql.transaction import BeginStatement
+from ..sql.transaction import CommitStatement
+
+POSTGRES_DSN_VARIABLE = 'DATADUCT_TEST_POSTGRES_DSN'
+
+
+class TestPostgres(TestCase):
+    """Tests for the generated SQL on PostgreSQL
+    """
+
+    def setUp(self):
+        """Connect to the test database, everything is rolled back after
+        """
+        dsn = os.environ.get(POSTGRES_DSN_VARIABLE)
+        if dsn is None:
+            raise SkipTest('%s is not set' % POSTGRES_DSN_VARIABLE)
+
+        try:
+            import psycopg2
+        except ImportError:
+            raise SkipTest('psycopg2 is not installed')
+
+        self.connection = psycopg2.connect(dsn)
+        self.cursor = self.connection.cursor()
+
+        self.table = Table(SqlScript(
+            """CREATE TABLE test_upsert (
+                id INTEGER,
+                day DATE,
+                value VARCHAR(10),
+                PRIMARY KEY (id, day)
+            );"""))
+        self.source = Table(SqlScript(
+            """CREATE TABLE test_upsert_source (
+                id INTEGER,
+                day DATE,
+                value VARCHAR(10)
+            );"""))
+
+        self._run(self.table.create_script(grant_permissions=False))
+        self._run(self.source.create_script(grant_permissions=False))
+        self.cursor.execute("""
+            INSERT INTO test_upsert VALUES
+                (1, '2015-01-01', 'old'),
+                (1, '2015-01-02', 'old'),
+                (2, '2015-01-01', 'old')
+        """)
+        self.cursor.execute("""
+            INSERT INTO test_upsert_source VALUES
+                (1, '2015-01-02', 'new'),
+                (2, '2015-01-01', 'new'),
+                (3, '2015-01-01', 'new')
+        """)
+
+    def tearDown(self):
+        """Discard all the changes of the test
+        """
+        self.connection.rollback()
+        self.connection.close()
+
+    def _run(self, script):
+        """Execute all the statements of the script
+
+        Note:
+            Transactions of the script are skipped as the test rolls back
+        """
+        for statement in script:
+            if not isinstance(statement, (BeginStatement, CommitStatement)):
+                self.cursor.execute(statement.sql())
+
+    def _rows(self, table_name):
+        """All the rows of the table in a deterministic order
+        """
+        self.cursor.execute(
+            'SELECT id, day::VARCHAR, value FROM %s ORDER BY 1, 2' % table_name)
+        return self.cursor.fetchall()
+
+    def _check_upsert(self, delete_method):
+        """Upsert the source and check the resulting rows
+        """
+        self._run(self.table.upsert_script(
+            self.source, delete_method=delete_method))
+        eq_(self._rows('test_upsert'), [
+            (1, '2015-01-01', 'old'),
+            (1, '2015-01-02', 'new'),
+            (2, '2015-01-01', 'new'),
+            (3, '2015-01-01', 'new'),
+        ])
+
+    def test_upsert_delete_in(self):
+        """Upsert deleting matching rows with a subquery
+        """
+        self._check_upsert('in')
+
+    def test_upsert_delete_join(self):
+        """Upsert deleting matching rows with a join
+        """
+        self._check_upsert('join')
+
+    def test_delete_join_select_source(self):
+        """Join deletes work with a select statement as the source
+        """
+        select = SelectStatement(
+            "SELECT id, day FROM test_upsert_source WHERE value = 'new'")
+        self._run(self.table.delete_matching_rows_script(select, 'join'))
+        eq_(self._rows('test_upsert'), [(1, '2015-01-01', 'old')])
+
+    def test_upsert_deduplicate_latest(self):
+        """Duplicate source rows keep the row that sorts first
+        """
+        self.cursor.execute("""
+            INSERT INTO test_upsert_source VALUES
+                (3, '2015-01-01', 'newest'),
+                (4, '2015-01-01', 'b'),
+                (4, '2015-01-01', 'a')
+        """)
+        self._run(self.table.upsert_script(
+            self.source, dedupe_order_by='value DESC'))
+        eq_(self._rows('test_upsert'), [
+            (1, '2015-01-01', 'old'),
+            (1, '2015-01-02', 'new'),
+            (2, '2015-01-01', 'new'),
+            (3, '2015-01-01', 'newest'),
+            (4, '2015-01-01', 'b'),
+        ])
+
+    def _check_merge(self, source, **kwargs):
+        """Merging gives the same rows as upserting the source
+        """
+        if self.connection.server_version < 150000:
+            raise SkipTest('MERGE needs PostgreSQL 15')
+
+        self.cursor.execute('SAVEPOINT before_upsert')
+        self._run(self.table.upsert_script(source, **kwargs))
+        upserted = self._rows('test_upsert')
+        self.cursor.execute('ROLLBACK TO SAVEPOINT before_upsert')
+
+        self._run(self.table.merge_script(source, **kwargs))
+        eq_(self._rows('test_upsert'), upserted)
+
+    def test_merge_table(self):
+        """Merge a table source directly
+        """
+        self._check_merge(self.source, enforce_primary_key=False)
+
+    def test_merge_select_deduplicate(self):
+        """Merge a select statement with duplicate keys
+        """
+        self.cursor.execute("""
+            INSERT INTO test_upsert_source VALUES
+                (3, '2015-01-01', 'newest'),
+                (4, '2015-01-01', 'b'),
+                (4, '2015-01-01', 'a')
+        """)
+        select = SelectStatement(
+            'SELECT id, day, value FROM test_upsert_source')
+        self._check_merge(select, dedupe_order_by='value DESC')
+
+    def test_merge_delete_existing(self):
+        """Merge replacing all the rows of the table
+        """
+        self._check_merge(self.source, delete_existing=True)
+
+    def test_chunked_upsert(self):
+        """Chunked upserts give the same rows as a single upsert
+        """
+        for kwargs in [dict(chunk_count=2), dict(chunk_count=3, chunk_rows=1),
+                       dict(chunk_count=2, chunk_column='day')]:
+            self.cursor.execute('SAVEPOINT before_upsert')
+            self._run(self.table.chunked_upsert_script(self.source, **kwargs))
+            eq_(self._rows('test_upsert'), [
+                (1, '2015-01-01', 'old'),
+                (1, '2015-01-02', 'new'),
+                (2, '2015-01-01', 'new'),
+                (3, '2015-01-01', 'new'),
+            ])
+            self.cursor.execute('ROLLBACK TO SAVEPOINT before_upsert')
+
+    def test_chunked_upsert_null_values(self):
+        """Rows without a value in the chunk column are upserted, even if
+        no row has a value
+        """
+        self.cursor.execute('UPDATE test_upsert_source SET value = NULL')
+        self._run(self.table.chunked_upsert_script(
+            self.source, chunk_count=2, chunk_column='value'))
+        eq_(self._rows('test_upsert'), [
+            (1, '2015-01-01', 'old'),
+            (1, '2015-01-02', None),
+            (2, '2015-01-01', None),
+            (3, '2015-01-01', None),
+        ])
+
+    def test_chunked_upsert_resume(self):
+        """Chunks committed before a failure are not upserted again
+        """
+        script = self.table.chunked_upsert_script(
+            self.source, chunk_count=3, delete_existing=True)
+
+        # Stop after the commit of the first chunk, after the NULL chunk
+        commits = [i for i, statement in enumerate(script)
+                   if isinstance(statement, CommitStatement)]
+        self._run(SqlScript(statements=script.statements[:commits[2] + 1]))
+        eq_(self._rows('test_upsert'), [(1, '2015-01-02', 'new')])
+
+        self.cursor.execute("UPDATE test_upsert_source SET value = 'newer'")
+        self._run(script)
+        eq_(self._rows('test_upsert'), [
+            (1, '2015-01-02', 'new'),
+            (2, '2015-01-01', 'newer'),
+            (3, '2015-01-01', 'newer'),
+        ])
+        self.cursor.execute(
+            "SELECT to_regclass('test_upsert_upsert_chunks') IS NULL")
+        eq_(self.cursor.fetchone(), (True,))
+
+    def test_swap(self):
+        """Views read the rows of the shadow table after the swap
+        """
+        view = View(SqlScript(
+            'CREATE VIEW test_upsert_view AS (SELECT id, day, value '
+            'FROM test_upsert);'))
+        self._run(view.create_script(grant_permissions=False))
+
+        shadow = self.table.shadow_clone()
+        self._run(shadow.create_script(grant_permissions=False))
+        self.cursor.execute(
+            'INSERT INTO test_upsert_shadow SELECT * FROM test_upsert_source')
+
+        # Without the dependencies the view blocks the swap
+        self.cursor.execute('SAVEPOINT before_swap')
+        try:
+            self._run(self.table.swap_script(
+                shadow, grant_permissions=False))
+        except Exception:
+            self.cursor.execute('ROLLBACK TO SAVEPOINT before_swap')
+        else:
+            raise AssertionError('Swap dropped the view')
+
+        self._run(self.table.swap_script(
+            shadow, view.recreate_script(grant_permissions=False),
+            grant_permissions=False))
+        eq_(self._rows('test_upsert_view'), self._rows('test_upsert_source'))
+        eq_(self._rows('test_upsert'), self._rows('test_upsert_source'))
+
+    def test_copy_through(self):
+        """Tables replaced by a new definition keep their rows
+        """
+        view = View(SqlScript(
+            'CREATE VIEW test_upsert_view AS (SELECT id, day, value '
+            'FROM test_upsert);'))
+        self._run(view.create_script(grant_permissions=False))
+        rows = self._rows('test_upsert')
+
+        target = Table(SqlScript(
+            """CREATE TABLE test_upsert (
+                id BIGINT,
+                day DATE,
+                value VARCHAR(20),
+                PRIMARY KEY (id, day)
+            );"""))
+        self._run(view.drop_script())
+        self._run(self.table.copy_through_script(
+            target, grant_permissions=False))
+        self._run(view.create_script(grant_permissions=False))
+
+        eq_(self._rows('test_upsert'), rows)
+        eq_(self._rows('test_upsert_view'), rows)
+        self.cursor.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'test_upsert' AND column_name = 'id'")
+        eq_(self.cursor.fetchone(), ('bigint',))
+
+    def test_drop_foreign_key(self):
+        """Foreign keys are dropped by the name given by the database
+        """
+        self.cursor.execute('DELETE FROM test_upsert_source WHERE id = 3')
+        self._run(self.source.foreign_key_reference_script(
+            ['id', 'day'], 'test_upsert', ['id', 'day']))
+        self._run(self.source.drop_foreign_key_script(['id', 'day']))
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.table_constraints "
+            "WHERE table_name = 'test_upsert_source' "
+            "AND constraint_type = 'FOREIGN KEY'")
+        eq_(self.cursor.fetchone(), (0,))
+
+    def test_drop_foreign_key_long_name(self):
+        """Truncated names of foreign keys match the database
+        """
+        referenced = Table(SqlScript(
+            'CREATE TABLE test_%s (id INTEGER PRIMARY KEY);' % ('r' * 40)))
+        source = Table(SqlScript(
+            'CREATE TABLE test_%s (%s INTEGER REFERENCES test_%s (id));' % (
+                's' * 40, 'c' * 30, 'r' * 40)))
+        self._run(referenced.create_script(grant_permissions=False))
+        self._run(source.create_script(grant_permissions=False))
+        self._run(source.drop_foreign_key_script(['c' * 30]))
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.table_constraints "
+            "WHERE table_name = 'test_%s' "
+            "AND constraint_type = 'FOREIGN KEY'" % ('s' * 40))
+        eq_(self.cursor.fetchone(), (0,))
+
+    def test_diff_drop_foreign_key_copied_reference(self):
+        """Dropping a foreign key to a table that is copied migrates
+        """
+        sql = [
+            'CREATE TABLE test_parent (id INTEGER PRIMARY KEY, x INTEGER);',
+            'CREATE TABLE test_child (id INTEGER, '
+            'parent_id INTEGER REFERENCES test_parent (id));',
+        ]
+        current = Database(relations=[Table(SqlScript(x)) for x in sql])
+        target = Database(relations=[
+            Table(SqlScript('CREATE TABLE test_parent '
+                            '(id INTEGER PRIMARY KEY, x VARCHAR(10));')),
+            Table(SqlScript('CREATE TABLE test_child '
+                            '(id INTEGER, parent_id INTEGER);'))])
+
+        self._run(current.create_relations_script(grant_permissions=False))
+        self.cursor.execute("INSERT INTO test_parent VALUES (1, 10)")
+        self.cursor.execute("INSERT INTO test_child VALUES (1, 1)")
+        self._run(current.diff(target, grant_permissions=False))
+
+        self.cursor.execute('SELECT id, x FROM test_parent')
+        eq_(self.cursor.fetchall(), [(1, '10')])
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.table_constraints "
+            "WHERE table_name = 'test_child' "
+            "AND constraint_type = 'FOREIGN KEY'")
+        eq_(self.cursor.fetchone(), (0,))
+
+    def _create_history(self):
+        """History with repeated versions of the same values
+        """
+        history = HistoryTable(SqlScript(
+            """CREATE TABLE test_history (
+                effective_ts TIMESTAMP,
+                expiration_ts TIMESTAMP,
+                id INTEGER,
+                value VARCHAR(10)
+            );"""))
+        self._run(history.create_script(grant_permissions=False))
+        self.cursor.execute("""
+            INSERT INTO test_history VALUES
+                ('2015-01-01', '2015-01-01 23:59:59.999999', 1, 'a'),
+                ('2015-01-02', '2015-01-02 23:59:59.999999', 1, 'a'),
+                ('2015-01-03', '2015-01-03 23:59:59.999999', 1, 'b'),
+                ('2015-01-04', '9999-12-31 23:59:59.999999', 1, 'b'),
+                ('2015-01-01', '2015-01-01 23:59:59.999999', 2, 'a'),
+                ('2015-01-05', '9999-12-31 23:59:59.999999', 2, 'a'),
+                ('2015-01-01', '2015-01-01 23:59:59.999999', 3, NULL),
+                ('2015-01-02', '9999-12-31 23:59:59.999999', 3, NULL)
+        """)
+        return history
+
+    def _history_rows(self, table_name):
+        """All the versions of the history in a deterministic order
+        """
+        self.cursor.execute(
+            'SELECT id, value, effective_ts::DATE::VARCHAR, '
+            'expiration_ts::DATE::VARCHAR FROM %s ORDER BY 1, 3' % table_name)
+        return self.cursor.fetchall()
+
+    def test_history_compaction(self):
+        """Consecutive versions with the same values are merged
+        """
+        history = self._create_history()
+        for kwargs in [dict(batch_count=2), dict(hash_function='md5')]:
+            self.cursor.execute('SAVEPOINT before_compaction')
+            self._run(history.compaction_script(['id'], **kwargs))
+            eq_(self._history_rows('test_history'), [
+                (1, 'a', '2015-01-01', '2015-01-02'),
+                (1, 'b', '2015-01-03', '9999-12-31'),
+                (2, 'a', '2015-01-01', '2015-01-01'),
+                (2, 'a', '2015-01-05', '9999-12-31'),
+                (3, None, '2015-01-01', '9999-12-31'),
+            ])
+            self.cursor.execute('ROLLBACK TO SAVEPOINT before_compaction')
+
+    def test_history_retention(self):
+        """Versions expired before the horizon are moved to the archive
+        """
+        history = self._create_history()
+        archive = Table(SqlScript(
+            """CREATE TABLE test_history_archive (
+                effective_ts TIMESTAMP,
+                expiration_ts TIMESTAMP,
+                id INTEGER,
+                value VARCHAR(10)
+            );"""))
+        self._run(archive.create_script(grant_permissions=False))
+        self._run(history.retention_script(
+            "'2015-01-02'::TIMESTAMP", archive_table=archive))
+
+        eq_([row[:3] for row in self._history_rows('test_history_archive')], [
+            (1, 'a', '2015-01-01'),
+            (2, 'a', '2015-01-01'),
+            (3, None, '2015-01-01'),
+        ])
+        eq_(len(self._history_rows('test_history')), 5)
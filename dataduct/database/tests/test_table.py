@@ -0,0 +1,293 @@
+"""Tests for Table
+"""
+import pickle
+from copy import deepcopy
+
+from unittest import TestCase
+from nose.tools import eq_
+from nose.tools import raises
+
+from ..table import Table
+from ..table import default_constraint_name
+from ..table import equality_condition
+from ..table import order_by_list
+from ..select_statement import SelectStatement
+from ..sql import SqlScript
+
+
+class TestTable(TestCase):
+    """Tests for Table
+    """
+
+    def setUp(self):
+        """Setup test fixtures for the table tests
+        """
+        self.table = Table(SqlScript(
+            """CREATE TABLE test_table (
+                id INTEGER,
+                name VARCHAR(10) SORTKEY,
+                created DATE SORTKEY REFERENCES dates(day)
+            ) SORTKEY(created);"""))
+
+    def test_sort_key_order(self):
+        """Compound sort keys keep their order without duplicates
+        """
+        eq_(self.table.sort_keys, ['created', 'name'])
+
+    def test_primary_key_invalidation(self):
+        """Changing the primary flag of a column updates the cached keys
+        """
+        eq_(self.table.primary_key_names, [])
+        self.table.column('id').primary = True
+        eq_(self.table.primary_key_names, ['id'])
+        eq_([c.name for c in self.table.primary_keys], ['id'])
+
+    def test_copies_keep_owner(self):
+        """Copied columns invalidate the cache of the copied table
+        """
+        for table in [deepcopy(self.table),
+                      pickle.loads(pickle.dumps(self.table))]:
+            table.column('name').primary = True
+            eq_(table.primary_key_names, ['name'])
+            eq_(table.foreign_key_references(),
+                [(['created'], 'dates', ['day'])])
+        eq_(self.table.primary_key_names, [])
+
+    def test_temporary_clone(self):
+        """Temporary clones match the parsed clone script
+        """
+        self.table.column('id').primary = True
+        clone = self.table.temporary_clone()
+        parsed = Table(clone.sql_statement.copy())
+
+        eq_(clone.sql_statement.sql(),
+            'CREATE TEMPORARY TABLE test_table_temp ( id INTEGER,'
+            'name VARCHAR(10),created DATE, PRIMARY KEY( id ) ) '
+            'SORTKEY(created,name)')
+        eq_(clone.full_name, parsed.full_name)
+        eq_(clone.sort_keys, parsed.sort_keys)
+        eq_(clone.temporary, parsed.temporary)
+        eq_([str(c) for c in clone.columns()],
+            [str(c) for c in parsed.columns()])
+        eq_(clone.primary_key_names, parsed.primary_key_names)
+
+    @staticmethod
+    def test_delete_matching_rows_join():
+        """Join deletes match every primary key column
+        """
+        table = Table(SqlScript(
+            """CREATE TABLE dev.test_table (
+                id INTEGER,
+                day DATE,
+                value VARCHAR(10),
+                PRIMARY KEY (id, day)
+            );"""))
+        eq_(table.delete_matching_rows_script(
+                table.temporary_clone(), 'join').sql(),
+            'DELETE FROM dev.test_table USING test_table_temp WHERE '
+            'dev.test_table.id = test_table_temp.id AND '
+            'dev.test_table.day = test_table_temp.day;')
+
+        select = SelectStatement('SELECT id, day FROM other')
+        eq_(table.delete_matching_rows_script(select, 'join').sql(),
+            'DELETE FROM dev.test_table USING (SELECT id, day FROM other) '
+            'test_table_source WHERE '
+            'dev.test_table.id = test_table_source.id AND '
+            'dev.test_table.day = test_table_source.day;')
+
+    def test_equality_condition(self):
+        """Nullable columns are compared in a NULL safe way
+        """
+        eq_(equality_condition(self.table.column('id'), 'a', 'b'),
+            '(a.id = b.id OR (a.id IS NULL AND b.id IS NULL))')
+        self.table.column('id').primary = True
+        eq_(equality_condition(self.table.column('id'), 'a', 'b'),
+            'a.id = b.id')
+
+    @raises(ValueError)
+    def test_delete_matching_rows_unknown_method(self):
+        """Only the known delete methods are accepted
+        """
+        self.table.column('id').primary = True
+        self.table.delete_matching_rows_script(self.table, 'merge')
+
+    @staticmethod
+    def test_deduplicated_insert_script():
+        """Duplicates are dropped with a single ranked insert
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE test_table (id INTEGER PRIMARY KEY, value DATE);'))
+        select = SelectStatement('SELECT s.key, s.day AS value FROM source s')
+        eq_(table.deduplicated_insert_script(select, 'value DESC').sql(),
+            'INSERT INTO test_table ( SELECT key,value FROM ( SELECT *, '
+            'ROW_NUMBER() OVER (PARTITION BY key ORDER BY value DESC) rnk '
+            'FROM (SELECT s.key, s.day AS value FROM source s)) ranked '
+            'WHERE rnk = 1);')
+
+    @staticmethod
+    def test_order_by_list():
+        """Columns with orders are normalized
+        """
+        eq_(order_by_list('value desc nulls last,s.id'),
+            'value DESC NULLS LAST, s.id')
+        eq_(order_by_list(' "Day"  ASC '), '"Day" ASC')
+
+    @staticmethod
+    def test_order_by_list_invalid():
+        """Anything but columns and orders is rejected
+        """
+        for order_by in ['value -- comment', 'value; DROP TABLE t',
+                         "value DESC, 'a'", 'value /* a */', '', 'a,,b',
+                         'LEN(value)']:
+            try:
+                order_by_list(order_by)
+            except ValueError:
+                continue
+            raise AssertionError('%s was accepted' % order_by)
+
+    @staticmethod
+    @raises(ValueError)
+    def test_deduplicated_insert_script_invalid_order():
+        """The de-duplication order must be a list of columns
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE test_table (id INTEGER PRIMARY KEY, value DATE);'))
+        select = SelectStatement('SELECT s.key, s.day AS value FROM source s')
+        table.deduplicated_insert_script(select, 'value -- DESC')
+
+    @staticmethod
+    def test_deduplicated_insert_script_expressions():
+        """Sources with unnamed expressions are de-duplicated after the insert
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE test_table (id INTEGER PRIMARY KEY, value DATE);'))
+        select = SelectStatement('SELECT id, MAX(day) FROM source GROUP BY 1')
+        script = table.deduplicated_insert_script(select)
+        eq_(script.statements[0].sql(),
+            'INSERT INTO test_table (SELECT * FROM '
+            '(SELECT id, MAX(day) FROM source GROUP BY 1))')
+        eq_(len(script), 5)
+
+    @staticmethod
+    def test_temporary_clone_attributes():
+        """Temporary clones inherit encodings and keys unless overridden
+        """
+        table = Table(SqlScript(
+            """CREATE TABLE dev.test_table (
+                id INTEGER ENCODE delta DISTKEY,
+                day DATE SORTKEY,
+                PRIMARY KEY (id)
+            ) DISTSTYLE KEY;"""))
+        clone = table.temporary_clone()
+        parsed = Table(clone.sql_statement.copy())
+        eq_(clone.sql_statement.sql(),
+            'CREATE TEMPORARY TABLE test_table_temp ( id INTEGER ENCODE delta,'
+            'day DATE, PRIMARY KEY( id ) ) DISTSTYLE KEY DISTKEY(id) '
+            'SORTKEY(day)')
+        for attribute in ['diststyle', 'dist_keys', 'sort_keys']:
+            eq_(getattr(clone, attribute), getattr(parsed, attribute))
+        eq_(clone.column('id').encoding, parsed.column('id').encoding)
+
+        clone = table.temporary_clone(diststyle='ALL', dist_keys=[])
+        eq_(clone.sql_statement.sql(),
+            'CREATE TEMPORARY TABLE test_table_temp ( id INTEGER ENCODE delta,'
+            'day DATE, PRIMARY KEY( id ) ) DISTSTYLE ALL SORTKEY(day)')
+
+        clone = table.temporary_clone(inherit_attributes=False)
+        eq_(clone.sql_statement.sql(),
+            'CREATE TEMPORARY TABLE test_table_temp ( id INTEGER,day DATE, '
+            'PRIMARY KEY( id ) )')
+
+    @staticmethod
+    def test_merge_script():
+        """Sources with the columns of the table are merged directly
+        """
+        table = Table(SqlScript(
+            """CREATE TABLE test_table (
+                id INTEGER,
+                day DATE,
+                value VARCHAR(10),
+                PRIMARY KEY (id, day)
+            );"""))
+        source = Table(SqlScript(
+            'CREATE TABLE test_source (id INTEGER, day DATE, '
+            'value VARCHAR(10));'))
+        script = table.merge_script(source, enforce_primary_key=False)
+        eq_(script.sql(),
+            'MERGE INTO test_table target_rows USING test_source source_rows '
+            'ON target_rows.id = source_rows.id AND '
+            'target_rows.day = source_rows.day '
+            'WHEN MATCHED THEN UPDATE SET value = source_rows.value '
+            'WHEN NOT MATCHED THEN INSERT (id,day,value) '
+            'VALUES (source_rows.id,source_rows.day,source_rows.value);')
+
+        # Select statements and de-duplicated sources are staged first
+        select = SelectStatement('SELECT id, day, value FROM test_source')
+        for staged in [table.merge_script(select, enforce_primary_key=False),
+                       table.merge_script(source)]:
+            eq_(len(staged), 4)
+            assert 'USING test_table_temp source_rows' in \
+                staged.statements[2].sql()
+
+    @staticmethod
+    def test_chunked_upsert_script():
+        """Every chunk and the NULL chunk are upserted in their own
+        transaction
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE test_table (id INTEGER PRIMARY KEY, value DATE);'))
+        source = Table(SqlScript(
+            'CREATE TABLE test_source (id INTEGER, value DATE);'))
+        script = table.chunked_upsert_script(source, 3)
+        eq_([s.sql() for s in script].count('BEGIN'), 5)
+        eq_(script.statements[-1].sql(),
+            'DROP TABLE IF EXISTS test_table_upsert_chunks')
+
+    @staticmethod
+    @raises(ValueError)
+    def test_chunked_upsert_script_unnamed_column():
+        """The chunk column of the source must be named
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE test_table (id INTEGER PRIMARY KEY, value DATE);'))
+        select = SelectStatement('SELECT MAX(id), value FROM source')
+        table.chunked_upsert_script(select, 3)
+
+    @staticmethod
+    def test_swap_script():
+        """The shadow table replaces the table in a single transaction
+        """
+        table = Table(SqlScript(
+            'CREATE TABLE dev.test_table (id INTEGER PRIMARY KEY) '
+            'SORTKEY(id);'))
+        shadow = table.shadow_clone()
+        eq_(shadow.full_name, 'dev.test_table_shadow')
+        eq_(shadow.sort_keys, ['id'])
+
+        script = table.swap_script(shadow, grant_permissions=False)
+        eq_([s.sql() for s in script], [
+            'BEGIN',
+            'DROP TABLE IF EXISTS dev.test_table_old',
+            'ALTER TABLE dev.test_table RENAME TO test_table_old',
+            'ALTER TABLE dev.test_table_shadow RENAME TO test_table',
+            'DROP TABLE dev.test_table_old',
+            'COMMIT',
+        ])
+
+        # Dependencies are dropped with the replaced table and recreated
+        dependencies = SqlScript('CREATE VIEW dev.test_view AS '
+                                 'SELECT id FROM dev.test_table;')
+        script = table.swap_script(shadow, dependencies,
+                                   grant_permissions=False)
+        eq_(script.statements[4].sql(), 'DROP TABLE dev.test_table_old CASCADE')
+        eq_(script.statements[5].sql(), dependencies.statements[0].sql())
+
+    @staticmethod
+    def test_default_constraint_name():
+        """Constraint names are shortened like the database does
+        """
+        eq_(default_constraint_name('orders', ['id', 'day'], 'fkey'),
+            'orders_id_day_fkey')
+        name = default_constraint_name('t' * 40, ['c' * 30], 'fkey')
+        eq_(name, 't' * 29 + '_' + 'c' * 28 + '_fkey')
+        eq_(len(name), 63)
@@ -1,5 +1,6 @@
 """Script containing the view class object
 """
+from .parsers import cached_parse
 from .parsers import parse_create_view
 from .sql import SqlScript
 from .select_statement import SelectStatement
@@ -18,7 +19,7 @@ class View(Relation):
             # Take the first statement and ignore the rest
             sql = sql.statements[0]
 
-        parameters = parse_create_view(sql.sql())
+        parameters = cached_parse(parse_create_view, sql.sql())
 
         self.sql_statement = sql
         self.parameters = parameters
@@ -45,4 +46,5 @@ class View(Relation):
     def drop_script(self):
         """Sql script to drop the view
         """
-        return SqlScript('DROP VIEW IF EXISTS %s CASCADE' % self.full_name)
+        return SqlScript.from_trusted_sql(
+            'DROP VIEW IF EXISTS %s CASCADE' % self.full_name)
@@ -16,6 +16,7 @@ STEP_CLASSES = {
     'extract-rds': ExtractRdsStep,
     'extract-redshift': ExtractRedshiftStep,
     'extract-s3': ExtractS3Step,
+    'history-compaction': HistoryCompactionStep,
     'load-redshift': LoadRedshiftStep,
     'pipeline-dependencies': PipelineDependenciesStep,
     'primary-key-check': PrimaryKeyCheckStep,
@@ -27,6 +27,7 @@ class S3Node(PipelineObject):
                  s3_object,
                  precondition=None,
                  format=None,
+                 data_format=None,
                  **kwargs):
         """Constructor for the S3Node class
 
@@ -35,6 +36,9 @@ class S3Node(PipelineObject):
             schedule(Schedule): pipeline schedule
             s3_object(S3Path / S3File / S3Directory): s3 location
             precondition(Precondition): precondition to the data node
+            format(PipelineObject): data format object of the pipeline
+            data_format(str): format of the files written by the steps, one
+                of 'tsv' or 'parquet', tsv if None
             **kwargs(optional): Keyword arguments directly passed to base class
         """
 
@@ -52,6 +56,12 @@ class S3Node(PipelineObject):
                isinstance(s3_object, S3Directory)):
             raise ETLInputError('Mismatched type for S3 path')
 
+        if data_format is None:
+            data_format = const.TSV_FORMAT
+        if data_format not in const.DATA_FORMATS:
+            raise ETLInputError('Data format must be one of %s' %
+                                ', '.join(const.DATA_FORMATS))
+
         additional_args = {}
         if (isinstance(s3_object, S3Path) and s3_object.is_directory) or \
             (isinstance(s3_object, S3Directory)):
@@ -62,6 +72,10 @@ class S3Node(PipelineObject):
         # Save the s3_object variable
         self._s3_object = s3_object
 
+        # Data Pipeline has no parquet data format, so the format of the
+        # files is only known to the steps
+        self.data_format = data_format
+
         # Save the dependent nodes from the S3 Node
         self._dependency_nodes = list()
 
@@ -0,0 +1,62 @@
+"""Tests for the S3 utility functions
+"""
+import unittest
+from testfixtures import TempDirectory
+from nose.tools import raises
+from nose.tools import eq_
+
+from ..utils import build_copy_manifest
+from ..utils import iterate_parts
+from ..utils import local_s3_lister
+from ...utils.exceptions import ETLInputError
+
+
+class S3UtilsTests(unittest.TestCase):
+    """Tests for the S3 utility functions
+    """
+
+    def setUp(self):
+        """Setup a local stand in for S3
+        """
+        self.temp_dir = TempDirectory()
+        self.temp_dir.write('bucket/input1/part-0', 'abc')
+        self.temp_dir.write('bucket/input1/part-1', 'de')
+        self.temp_dir.write('bucket/input1/_SUCCESS', '')
+        self.temp_dir.write('bucket/input2/part-0', 'f')
+        self.temp_dir.write('bucket/input20/part-0', 'ghij')
+        self.lister = local_s3_lister(self.temp_dir.path)
+
+    def tearDown(self):
+        """Remove the local stand in for S3
+        """
+        self.temp_dir.cleanup()
+
+    def test_build_copy_manifest(self):
+        """Every object under the inputs is listed once with its length
+        """
+        manifest = build_copy_manifest(
+            ['s3://bucket/input1', 's3://bucket/input2/',
+             's3://bucket/input2/part-0'], mandatory=True, lister=self.lister)
+        eq_(manifest, {'entries': [
+            {'url': 's3://bucket/input1/part-0', 'mandatory': True,
+             'meta': {'content_length': 3}},
+            {'url': 's3://bucket/input1/part-1', 'mandatory': True,
+             'meta': {'content_length': 2}},
+            {'url': 's3://bucket/input2/part-0', 'mandatory': True,
+             'meta': {'content_length': 1}},
+        ]})
+
+    @raises(ETLInputError)
+    def test_build_copy_manifest_empty(self):
+        """Inputs without objects can not be loaded
+        """
+        build_copy_manifest(['s3://bucket/missing'], lister=self.lister)
+
+    @staticmethod
+    def test_iterate_parts():
+        """Chunks are grouped into parts of at least the part size
+        """
+        eq_(list(iterate_parts(['ab', 'c', 'de', 'f', 'g'], 3)),
+            ['abc', 'def', 'g'])
+        eq_(list(iterate_parts(['abc'], 3)), ['abc'])
+        eq_(list(iterate_parts([], 3)), [''])
@@ -2,11 +2,20 @@
 Shared utility functions
 """
 import boto.s3
+import boto.s3.multipart
 import os
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from StringIO import StringIO
 
 from .s3_path import S3Path
 from ..utils.exceptions import ETLInputError
 
+# Parts of a multipart upload must have at least 5 MB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 64 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 4
+
 
 def get_s3_bucket(bucket_name):
     """Returns an S3 bucket object from boto
@@ -63,6 +72,90 @@ def upload_to_s3(s3_path, file_name=None, file_text=None):
         key.set_contents_from_string(file_text)
 
 
+def iterate_parts(chunks, part_size=DEFAULT_PART_SIZE):
+    """Group the chunks of a stream into parts of at least the part size
+
+    Args:
+        chunks(iterable of str): Chunks of the stream
+        part_size(int): Minimum size of the parts, except the last one
+
+    Returns:
+        result(generator of str): Parts of the stream, a single empty part
+            for an empty stream
+    """
+    buffer = list()
+    size = 0
+    parts = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= part_size:
+            parts += 1
+            yield ''.join(buffer)
+            buffer = list()
+            size = 0
+
+    if buffer or parts == 0:
+        yield ''.join(buffer)
+
+
+def _upload_part(bucket_name, key_name, upload_id, part_number, data):
+    """Upload a part of a multipart upload with its own connection
+    """
+    upload = boto.s3.multipart.MultiPartUpload(get_s3_bucket(bucket_name))
+    upload.key_name = key_name
+    upload.id = upload_id
+    upload.upload_part_from_file(StringIO(data), part_number)
+
+
+def upload_stream_to_s3(s3_path, chunks, part_size=DEFAULT_PART_SIZE,
+                        workers=DEFAULT_UPLOAD_WORKERS):
+    """Uploads a stream to S3 with a parallel multipart upload
+
+    Note:
+        At most workers parts are uploaded at a time, so that the memory
+        used is bounded by workers + 1 parts whatever the size of the stream
+
+    Args:
+        s3_path(S3Path): Output path of the file to be uploaded
+        chunks(iterable of str): Chunks of the contents of the file
+        part_size(int): Size of the uploaded parts, at least 5 MB
+        workers(int): Number of parts uploaded in parallel
+
+    Returns:
+        result(int): Number of parts uploaded
+    """
+    assert isinstance(s3_path, S3Path), 'input path should be of type S3Path'
+    if part_size < MIN_PART_SIZE:
+        raise ETLInputError(
+            'Parts must have at least %d bytes' % MIN_PART_SIZE)
+
+    upload = get_s3_bucket(s3_path.bucket).initiate_multipart_upload(
+        s3_path.key)
+    pool = ThreadPool(workers)
+    pending = deque()
+    part_number = 0
+    try:
+        for part in iterate_parts(chunks, part_size):
+            # Wait for the oldest part before reading more of the stream
+            while len(pending) >= workers:
+                pending.popleft().get()
+            part_number += 1
+            pending.append(pool.apply_async(_upload_part, (
+                s3_path.bucket, upload.key_name, upload.id, part_number,
+                part)))
+        while pending:
+            pending.popleft().get()
+        upload.complete_upload()
+    except Exception:
+        upload.cancel_upload()
+        raise
+    finally:
+        pool.close()
+        pool.join()
+    return part_number
+
+
 def copy_within_s3(s3_old_path, s3_new_path, raise_when_no_exist=True):
     """Copies files from one S3 Path to another
 
@@ -158,3 +251,99 @@ def delete_dir_from_s3(s3_path):
     keys = bucket.get_all_keys(prefix=s3_path.key)
     for key in keys:
         key.delete()
+
+
+def list_s3_objects(s3_path):
+    """Lists the objects under an S3 path with their sizes
+
+    Args:
+        s3_path(S3Path): Path of a file or of a directory
+
+    Returns:
+        result(list of tuple): Uri and content length of every object
+    """
+    assert isinstance(s3_path, S3Path), 'input path should be of type S3Path'
+
+    bucket = get_s3_bucket(s3_path.bucket)
+    prefix = s3_path.key.rstrip('/')
+
+    # Other objects sharing the prefix are not part of the path
+    return [('s3://%s/%s' % (s3_path.bucket, key.name), key.size)
+            for key in bucket.list(prefix=prefix)
+            if key.name == prefix or key.name.startswith(prefix + '/')]
+
+
+def local_s3_lister(root_dir):
+    """Lister reading the objects of S3 paths from a local directory
+
+    Note:
+        The objects of s3://bucket/key are the files under root_dir/bucket/key,
+        which stands in for S3 in tests and local runs
+
+    Args:
+        root_dir(file_path): Directory with a sub directory per bucket
+
+    Returns:
+        lister(function): Lister with the signature of list_s3_objects
+    """
+    def lister(s3_path):
+        """Lists the local files standing in for the objects of the path
+        """
+        local_path = os.path.join(root_dir, s3_path.bucket, s3_path.key)
+        if os.path.isfile(local_path):
+            return [(s3_path.uri, os.path.getsize(local_path))]
+
+        result = list()
+        for root, _, file_names in os.walk(local_path):
+            for file_name in sorted(file_names):
+                local_file_path = os.path.join(root, file_name)
+                key = os.path.relpath(local_file_path, root_dir).split(
+                    os.sep, 1)[1]
+                result.append(('s3://%s/%s' % (s3_path.bucket, key),
+                               os.path.getsize(local_file_path)))
+        return result
+    return lister
+
+
+def build_copy_manifest(input_paths, mandatory=False, lister=None):
+    """Builds a Redshift COPY manifest of all the objects under the paths
+
+    Note:
+        Directory markers and the empty success files of hadoop jobs are
+        not loaded
+
+    Args:
+        input_paths(list of str): Uris of the input files or directories
+        mandatory(bool): Fail the COPY if any of the objects is missing
+        lister(function): Lists the uris and sizes of the objects under an
+            S3Path, defaults to listing S3 itself
+
+    Returns:
+        manifest(dict): Manifest with one entry per object
+
+    Raises:
+        ETLInputError: If there are no objects under the paths
+    """
+    if lister is None:
+        lister = list_s3_objects
+
+    entries = list()
+    seen = set()
+    for input_path in input_paths:
+        s3_path = S3Path(uri=input_path)
+        for uri, content_length in lister(s3_path):
+            file_name = uri.rsplit('/', 1)[-1]
+            if uri in seen or uri.endswith('/') or \
+                    uri.endswith('_$folder$') or file_name == '_SUCCESS':
+                continue
+            seen.add(uri)
+            entries.append({
+                'url': uri,
+                'mandatory': mandatory,
+                'meta': {'content_length': content_length},
+            })
+
+    if len(entries) == 0:
+        raise ETLInputError(
+            'No objects found under: %s' % ', '.join(input_paths))
+    return {'entries': entries}
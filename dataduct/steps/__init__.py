@@ -5,6 +5,7 @@ from .extract_local import ExtractLocalStep
 from .extract_rds import ExtractRdsStep
 from .extract_redshift import ExtractRedshiftStep
 from .extract_s3 import ExtractS3Step
+from .history_compaction import HistoryCompactionStep
 from .load_redshift import LoadRedshiftStep
 from .pipeline_dependencies import PipelineDependenciesStep
 from .sql_command import SqlCommandStep
@@ -20,15 +20,24 @@ class CountCheckStep(QATransformStep):
        select script with the number of rows in the destination table
     """
 
-    def __init__(self, id, source_host, source_sql=None, source_table_name=None,
-                 destination_table_name=None, destination_table_definition=None,
-                 destination_sql=None, tolerance=1.0, script_arguments=None,
-                 log_to_s3=False, script=None, **kwargs):
+    def __init__(self, id, source_host=None, source_sql=None,
+                 source_table_name=None, destination_table_name=None,
+                 destination_table_definition=None, destination_sql=None,
+                 tolerance=1.0, script_arguments=None, log_to_s3=False,
+                 script=None, data_format=None, **kwargs):
         """Constructor for the CountCheckStep class
 
+        Note:
+            With an input node the records of its files are counted instead
+            of running a source query, e.g. to check the output of an extract
+
         Args:
+            source_host(str): Host of the source database
             source_sql(str): SQL select script from the source table
+            source_table_name(str): Name of the source table
             destination_table_name(str): table name for the destination table
+            data_format(str): 'tsv' or 'parquet', the format of the input
+                files, the format of the input node if None
             **kwargs(optional): Keyword arguments directly passed to base class
         """
 
@@ -37,9 +46,13 @@ class CountCheckStep(QATransformStep):
             raise ETLInputError(
                 'One of dest table name/schema or dest sql needed')
 
-        if not exactly_one(source_sql, source_table_name):
+        source_input = kwargs.get('input_node') or kwargs.get('input_path')
+        if not exactly_one(source_sql, source_table_name, source_input):
             raise ETLInputError(
-                'One of source table name or source sql needed')
+                'One of source table name, source sql or input needed')
+
+        if source_input is None and source_host is None:
+            raise ETLInputError('Source host needed with a source query')
 
         if script_arguments is None:
             script_arguments = list()
@@ -54,16 +67,25 @@ class CountCheckStep(QATransformStep):
         dest_sql = self.convert_destination_to_count_sql(
             destination_table_name, destination_sql)
 
-        src_sql = self.convert_source_to_count_sql(
-            source_table_name, source_sql)
-
         script_arguments.extend([
             '--tolerance=%s' % str(tolerance),
             '--destination_sql=%s' % dest_sql,
-            '--source_sql=%s' % src_sql,
-            '--source_host=%s' % source_host
         ])
 
+        if source_input is not None:
+            script_arguments.extend([
+                '--source_files',
+                '--source_data_format=%s' % self.input_data_format(
+                    kwargs.get('input_node'), data_format),
+            ])
+        else:
+            src_sql = self.convert_source_to_count_sql(
+                source_table_name, source_sql)
+            script_arguments.extend([
+                '--source_sql=%s' % src_sql,
+                '--source_host=%s' % source_host
+            ])
+
         if log_to_s3:
             script_arguments.append('--log_to_s3')
 
@@ -74,6 +96,21 @@ class CountCheckStep(QATransformStep):
         super(CountCheckStep, self).__init__(
             id=id, script=script, script_arguments=script_arguments, **kwargs)
 
+    @classmethod
+    def arguments_processor(cls, etl, input_args):
+        """Parse the step arguments according to the ETL pipeline, keeping
+        the input node whose files are counted
+
+        Args:
+            etl(ETLPipeline): Pipeline object containing resources and steps
+            step_args(dict): Dictionary of the step arguments for the class
+        """
+        step_args = cls.base_arguments_processor(etl, input_args)
+        step_args['pipeline_name'] = etl.name
+        step_args['resource'] = etl.ec2_resource
+
+        return step_args
+
     @staticmethod
     def convert_destination_to_count_sql(destination_table_name=None,
                                          destination_sql=None):
@@ -3,11 +3,14 @@
 import os
 
 from .transform import TransformStep
+from ..database import Database
 from ..database import Table
 from ..database import SqlStatement
 from ..config import Config
 from ..utils import constants as const
+from ..utils.exceptions import ETLInputError
 from ..utils.helpers import parse_path
+from ..s3 import S3Path
 
 config = Config()
 
@@ -17,29 +20,78 @@ class CreateAndLoadStep(TransformStep):
     """
 
     def __init__(self, id, table_definition, input_node=None,
-                 script_arguments=None, **kwargs):
+                 script_arguments=None, maintenance=None, manifest=False,
+                 manifest_mandatory=False, split_compress=None, swap=False,
+                 swap_dependencies=None, data_format=None, **kwargs):
         """Constructor for the CreateAndLoadStep class
 
         Args:
             table_definition(filepath): schema file for the table to be loaded
             script_arguments(list of str): list of arguments to the script
+            maintenance(bool / dict): Analyze and vacuum the table after the
+                load when needed, with optional thresholds
+            manifest(bool): load all the input objects with a single COPY
+                from a manifest instead of one COPY per input
+            manifest_mandatory(bool): fail the load if an object of the
+                manifest is missing
+            split_compress(bool / dict): Split the input into compressed
+                parts for all the slices before the load
+            swap(bool): load a shadow table and swap it with the table, so
+                that readers never see an empty table
+            swap_dependencies(list of filepath): definitions of the views and
+                tables depending on the table, recreated after the swap
+            data_format(str): 'tsv' or 'parquet', the format of the input
+                node if None
             **kwargs(optional): Keyword arguments directly passed to base class
         """
         with open(parse_path(table_definition)) as f:
             table_def_string = f.read()
 
-        table_exists_script = Table(
-            SqlStatement(table_def_string)).exists_clone_script()
+        table = Table(SqlStatement(table_def_string))
+        table_exists_script = table.exists_clone_script()
 
         if isinstance(input_node, dict):
             input_paths = [i.path().uri for i in input_node.values()]
         else:
             input_paths = [input_node.path().uri]
 
-
         if script_arguments is None:
             script_arguments = list()
 
+        data_format = self.input_data_format(input_node, data_format)
+        if data_format == const.PARQUET_FORMAT:
+            if split_compress:
+                raise ETLInputError('Parquet files can not be split')
+            script_arguments.append('--data_format=%s' % data_format)
+
+        if split_compress:
+            # The parts are loaded instead of the input
+            split_path = S3Path(key='split', is_directory=True,
+                                parent_dir=kwargs['s3_data_dir'])
+            input_paths = [split_path.uri]
+            _, compression = self.split_compress_options(split_compress)
+            if compression:
+                script_arguments.append('--%s' % compression)
+
+        if manifest:
+            manifest_path = S3Path(key='copy.manifest',
+                                   parent_dir=kwargs['s3_data_dir'])
+            script_arguments.append('--manifest_path=%s' % manifest_path.uri)
+            if manifest_mandatory:
+                script_arguments.append('--manifest_mandatory')
+
+        if swap:
+            script_arguments.append('--swap')
+            if swap_dependencies:
+                database = Database(files=swap_dependencies)
+                dependencies = database.recreate_table_dependencies(
+                    table.full_name)
+                if len(dependencies) > 0:
+                    script_arguments.append(
+                        '--dependencies=%s' % dependencies.sql())
+        elif swap_dependencies:
+            raise ETLInputError('Swap dependencies need the swap mode')
+
         script_arguments.extend([
             '--table_definition=%s' % table_exists_script.sql(),
             '--s3_input_paths'] + input_paths)
@@ -51,6 +103,16 @@ class CreateAndLoadStep(TransformStep):
             id=id, script=script, input_node=input_node,
             script_arguments=script_arguments, **kwargs)
 
+        if split_compress:
+            load_activities = self.activities
+            split_activity = self.create_split_compress_activity(
+                self.input, split_compress, split_path)
+            for activity in load_activities:
+                activity['dependsOn'] = \
+                    self._required_activities + [split_activity]
+
+        self.create_maintenance_activity(table.full_name, maintenance)
+
     @classmethod
     def arguments_processor(cls, etl, input_args):
         """Parse the step arguments according to the ETL pipeline
@@ -1,18 +1,26 @@
 """
 Base class for an etl step
 """
+import os
+
 from ..config import Config
+from ..database.maintenance import DEFAULT_THRESHOLDS
 from ..pipeline import Activity
 from ..pipeline import CopyActivity
 from ..pipeline import S3Node
+from ..pipeline import ShellCommandActivity
 from ..s3 import S3Path
 from ..s3 import S3File
 from ..s3 import S3LogPath
 from ..utils import constants as const
 from ..utils.exceptions import ETLInputError
+from ..utils.file_split import GZIP
+from ..utils.file_split import copy_compression_option
 
 config = Config()
 MAX_RETRIES = config.etl.get('MAX_RETRIES', const.ZERO)
+SLICE_COUNT = getattr(config, 'redshift', dict()).get('SLICE_COUNT', const.ONE)
+SPLIT_COMPRESS_OPTIONS = ['slice_count', 'parts_per_slice', 'compression']
 
 
 class ETLStep(object):
@@ -246,6 +254,141 @@ class ETLStep(object):
 
         return activity
 
+    def create_maintenance_activity(self, table_name, maintenance):
+        """Create an activity that analyzes and vacuums the loaded table
+        after all the other activities of the step
+
+        Note:
+            Each command only runs when the statistics of the table cross
+            its threshold, see dataduct.database.maintenance
+
+        Args:
+            table_name(str): Full name of the table loaded by the step
+            maintenance(bool / dict): True for the default thresholds or a
+                dict overriding some of them, in percent of the rows
+
+        Returns:
+            activity(ShellCommandActivity): maintenance activity if needed
+        """
+        if not maintenance:
+            return None
+
+        thresholds = maintenance if isinstance(maintenance, dict) else dict()
+        unknown = set(thresholds) - set(DEFAULT_THRESHOLDS)
+        if unknown:
+            raise ETLInputError(
+                'Unknown maintenance thresholds: %s' % ', '.join(unknown))
+
+        script_arguments = ['--table_name=%s' % table_name]
+        script_arguments.extend(['--%s=%s' % (key, value) for key, value
+                                 in sorted(thresholds.iteritems())])
+
+        steps_path = os.path.abspath(os.path.dirname(__file__))
+        script = os.path.join(steps_path, const.TABLE_MAINTENANCE_SCRIPT_PATH)
+
+        step_activities = self.activities
+        activity = self.create_pipeline_object(
+            object_class=ShellCommandActivity,
+            input_node=None,
+            output_node=None,
+            resource=self.resource,
+            schedule=self.schedule,
+            script_uri=self.create_script(S3File(path=script)),
+            script_arguments=script_arguments,
+            max_retries=self.max_retries,
+        )
+        activity['dependsOn'] = self._required_activities + step_activities
+        return activity
+
+    @staticmethod
+    def input_data_format(input_node, data_format=None):
+        """Format of the input files of a step
+
+        Args:
+            input_node(S3Node / dict of S3Node): Input of the step
+            data_format(str): Format overriding the format of the input
+
+        Returns:
+            result(str): 'tsv' or 'parquet'
+        """
+        if data_format is None:
+            nodes = input_node.values() if isinstance(input_node, dict) \
+                else [input_node]
+            data_formats = set(getattr(n, 'data_format', None) for n in nodes)
+            if len(data_formats) > 1:
+                raise ETLInputError('Input nodes have different data formats')
+            data_format = data_formats.pop()
+        if data_format is None:
+            return const.TSV_FORMAT
+        if data_format not in const.DATA_FORMATS:
+            raise ETLInputError('Data format must be one of %s' %
+                                ', '.join(const.DATA_FORMATS))
+        return data_format
+
+    @staticmethod
+    def split_compress_options(split_compress):
+        """Number of parts and compression of a split and compress stage
+
+        Args:
+            split_compress(bool / dict): True for gzip compressed parts, one
+                per slice of the cluster, or a dict with the slice_count,
+                parts_per_slice and compression
+
+        Returns:
+            part_count(int): Number of parts, a multiple of the slice count
+            compression(str): 'gzip', 'zstd' or None for uncompressed parts
+        """
+        options = split_compress if isinstance(split_compress, dict) \
+            else dict()
+        unknown = set(options) - set(SPLIT_COMPRESS_OPTIONS)
+        if unknown:
+            raise ETLInputError(
+                'Unknown split_compress options: %s' % ', '.join(unknown))
+
+        slice_count = int(options.get('slice_count', SLICE_COUNT))
+        parts_per_slice = int(options.get('parts_per_slice', const.ONE))
+        if slice_count < 1 or parts_per_slice < 1:
+            raise ETLInputError('Slice count and parts per slice must be > 0')
+
+        compression = options.get('compression', GZIP)
+        copy_compression_option(compression)
+        return slice_count * parts_per_slice, compression
+
+    def create_split_compress_activity(self, input_node, split_compress,
+                                       output_path=None):
+        """Create an activity that splits the input on line boundaries
+        into compressed parts, so that COPY loads them on all the slices
+
+        Args:
+            input_node(S3Node): Node with the delimited input files
+            split_compress(bool / dict): see split_compress_options
+            output_path(S3Path): Directory for the parts, a directory of the
+                step if not specified
+
+        Returns:
+            activity(ShellCommandActivity): split activity, the parts are in
+                its output node
+        """
+        part_count, compression = self.split_compress_options(split_compress)
+        script_arguments = ['--part_count=%d' % part_count]
+        if compression:
+            script_arguments.append('--compression=%s' % compression)
+
+        steps_path = os.path.abspath(os.path.dirname(__file__))
+        script = os.path.join(steps_path, const.SPLIT_COMPRESS_SCRIPT_PATH)
+
+        return self.create_pipeline_object(
+            object_class=ShellCommandActivity,
+            input_node=input_node,
+            output_node=self.create_s3_data_node(output_path),
+            resource=self.resource,
+            schedule=self.schedule,
+            script_uri=self.create_script(S3File(path=script)),
+            script_arguments=script_arguments,
+            max_retries=self.max_retries,
+            depends_on=self.depends_on,
+        )
+
     def merge_s3_nodes(self, input_nodes):
         """Merge multi S3 input nodes
 
@@ -259,7 +402,8 @@ class ETLStep(object):
             new_depends_on(list of str): new dependencies for the step
         """
         depends_on = list()
-        combined_node = self.create_s3_data_node()
+        combined_node = self.create_s3_data_node(
+            data_format=self.input_data_format(input_nodes))
 
         for string_key, input_node in input_nodes.iteritems():
             dest_uri = S3Path(key=string_key, is_directory=True,
@@ -1,12 +1,17 @@
 """
 ETL step wrapper to extract data from RDS to S3
 """
+import os
+
 from ..config import Config
 from .etl_step import ETLStep
 from ..pipeline import CopyActivity
 from ..pipeline import MysqlNode
 from ..pipeline import PipelineObject
 from ..pipeline import ShellCommandActivity
+from ..s3 import S3File
+from ..s3 import S3Path
+from ..utils import constants as const
 from ..utils.helpers import exactly_one
 from ..utils.exceptions import ETLInputError
 from ..database import SelectStatement
@@ -19,7 +24,7 @@ MYSQL_CONFIG = config.mysql
 
 
 class ExtractRdsStep(ETLStep):
-    """Extract Redshift Step class that helps get data out of redshift
+    """Extract RDS Step class that helps get data out of a MySQL database
     """
 
     def __init__(self,
@@ -28,14 +33,23 @@ class ExtractRdsStep(ETLStep):
                  host_name=None,
                  database=None,
                  output_path=None,
+                 streaming=False,
+                 data_format=None,
+                 fetch_size=None,
                  **kwargs):
         """Constructor for the ExtractRdsStep class
 
         Args:
-            schema(str): schema from which table should be extracted
-            table(path): table name for extract
-            insert_mode(str): insert mode for redshift copy activity
-            redshift_database(RedshiftDatabase): database to excute the query
+            table(str): table to extract, exactly one of table and sql
+            sql(str): select statement to extract the rows of
+            host_name(str): key of the host in the mysql config
+            database(str): database on the host to run the query in
+            output_path(str): s3 path the rows are extracted to
+            streaming(bool): stream the rows from a server side cursor to s3
+                in a single activity instead of copying them with a
+                MysqlNode and fixing the copy in a second pass
+            data_format(str): 'tsv' or 'parquet', parquet needs streaming
+            fetch_size(int): rows fetched at a time, only when streaming
             **kwargs(optional): Keyword arguments directly passed to base class
         """
         if not exactly_one(table, sql):
@@ -50,6 +64,15 @@ class ExtractRdsStep(ETLStep):
         else:
             raise ETLInputError('Provide a sql statement or a table name')
 
+        data_format = self.input_data_format(None, data_format)
+        if streaming:
+            self.create_streaming_activity(
+                sql, host_name, database, output_path, data_format,
+                fetch_size)
+            return
+        if data_format != const.TSV_FORMAT or fetch_size is not None:
+            raise ETLInputError('Parquet and fetch_size need streaming')
+
         host = MYSQL_CONFIG[host_name]['HOST']
         user = MYSQL_CONFIG[host_name]['USERNAME']
         password = MYSQL_CONFIG[host_name]['PASSWORD']
@@ -104,6 +127,54 @@ class ExtractRdsStep(ETLStep):
             schedule=self.schedule,
         )
 
+    def create_streaming_activity(self, sql, host_name, database,
+                                  output_path, data_format, fetch_size):
+        """Create the activity streaming the rows of the query to s3
+
+        Args:
+            sql(str): query extracting the rows
+            host_name(str): key of the host in the mysql config
+            database(str): database the query runs in
+            output_path(str): s3 directory of the extracted file
+            data_format(str): 'tsv' or 'parquet'
+            fetch_size(int): rows fetched at a time
+        """
+        if host_name not in MYSQL_CONFIG:
+            raise ETLInputError('Host %s not in the MySQL config' % host_name)
+
+        self._output = self.create_s3_data_node(
+            self.get_output_s3_path(output_path), data_format=data_format)
+
+        file_name = 'part-0'
+        if data_format == const.PARQUET_FORMAT:
+            file_name += '.parquet'
+        output_file = S3Path(key=file_name, parent_dir=self.output.path())
+
+        script_arguments = [
+            '--host_name=%s' % host_name,
+            '--database=%s' % database,
+            '--sql=%s' % sql,
+            '--output_path=%s' % output_file.uri,
+            '--data_format=%s' % data_format,
+        ]
+        if fetch_size is not None:
+            script_arguments.append('--fetch_size=%d' % int(fetch_size))
+
+        steps_path = os.path.abspath(os.path.dirname(__file__))
+        script = os.path.join(steps_path, const.EXTRACT_RDS_SCRIPT_PATH)
+
+        self.create_pipeline_object(
+            object_class=ShellCommandActivity,
+            input_node=None,
+            output_node=self.output,
+            resource=self.resource,
+            schedule=self.schedule,
+            script_uri=self.create_script(S3File(path=script)),
+            script_arguments=script_arguments,
+            max_retries=self.max_retries,
+            depends_on=self.depends_on,
+        )
+
     @classmethod
     def arguments_processor(cls, etl, input_args):
         """Parse the step arguments according to the ETL pipeline
@@ -4,6 +4,7 @@ ETL step wrapper for RedshiftCopyActivity to extract data to S3
 from .etl_step import ETLStep
 from ..pipeline import RedshiftNode
 from ..pipeline import RedshiftCopyActivity
+from ..utils import constants as const
 
 
 class ExtractRedshiftStep(ETLStep):
@@ -16,6 +17,7 @@ class ExtractRedshiftStep(ETLStep):
                  redshift_database,
                  insert_mode="TRUNCATE",
                  output_path=None,
+                 data_format=None,
                  **kwargs):
         """Constructor for the ExtractRedshiftStep class
 
@@ -24,6 +26,7 @@ class ExtractRedshiftStep(ETLStep):
             table(path): table name for extract
             insert_mode(str): insert mode for redshift copy activity
             redshift_database(RedshiftDatabase): database to excute the query
+            data_format(str): unload the table as 'tsv' or 'parquet' files
             **kwargs(optional): Keyword arguments directly passed to base class
         """
         super(ExtractRedshiftStep, self).__init__(**kwargs)
@@ -37,8 +40,14 @@ class ExtractRedshiftStep(ETLStep):
             table_name=table,
         )
 
+        data_format = self.input_data_format(None, data_format)
         self._output = self.create_s3_data_node(
-            self.get_output_s3_path(output_path))
+            self.get_output_s3_path(output_path), data_format=data_format)
+
+        if data_format == const.PARQUET_FORMAT:
+            command_options = ['FORMAT AS PARQUET']
+        else:
+            command_options = ["DELIMITER '\t' ESCAPE"]
 
         self.create_pipeline_object(
             object_class=RedshiftCopyActivity,
@@ -49,7 +58,7 @@ class ExtractRedshiftStep(ETLStep):
             resource=self.resource,
             schedule=self.schedule,
             depends_on=self.depends_on,
-            command_options=["DELIMITER '\t' ESCAPE"],
+            command_options=command_options,
         )
 
     @classmethod
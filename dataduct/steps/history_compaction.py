@@ -0,0 +1,94 @@
+"""ETL step wrapper for the compaction and retention of history tables
+"""
+from .etl_step import ETLStep
+from ..pipeline import SqlActivity
+from ..database import Table
+from ..database import SqlScript
+from ..database import HistoryTable
+from ..database.history_table import HIST_GAP_TOLERANCE
+from ..database.history_table import IAM_ROLE_REGEX
+from ..s3 import S3File
+from ..utils.helpers import parse_path
+from ..utils.exceptions import ETLInputError
+
+
+class HistoryCompactionStep(ETLStep):
+    """HistoryCompaction Step class that shrinks history tables
+    """
+
+    def __init__(self, table_definition, redshift_database,
+                 key_columns=None, batch_count=1, compact=True,
+                 gap_tolerance=HIST_GAP_TOLERANCE, hash_function=None,
+                 retention_days=None, archive_table=None, archive_path=None,
+                 archive_iam_role=None, **kwargs):
+        """Constructor for the HistoryCompactionStep class
+
+        Args:
+            table_definition(filepath): schema file for the history table
+            key_columns(list of str): columns identifying the versioned rows
+            batch_count(int): number of key ranges compacted separately
+            compact(bool): merge consecutive versions with the same values
+            gap_tolerance(str): interval allowed between consecutive versions
+            hash_function(str): compare a 'md5' or 'fnv' hash of the values
+            retention_days(int): purge the versions expired before this many
+                days ago
+            archive_table(filepath): schema file for the table the purged
+                versions are copied into
+            archive_path(str): s3 prefix the purged versions are unloaded to
+            archive_iam_role(str): ARN of the IAM role of the cluster used
+                for the unload to s3
+            **kwargs(optional): Keyword arguments directly passed to base class
+        """
+        if not compact and retention_days is None:
+            raise ETLInputError('Nothing to do without compaction or retention')
+        if retention_days is None and (archive_table or archive_path):
+            raise ETLInputError('Archives need the retention days')
+        if archive_path is not None and (
+                archive_iam_role is None or
+                not IAM_ROLE_REGEX.match(archive_iam_role)):
+            raise ETLInputError('Unloading to s3 needs the ARN of an IAM role')
+
+        super(HistoryCompactionStep, self).__init__(**kwargs)
+
+        history = HistoryTable(SqlScript(
+            filename=parse_path(table_definition)))
+
+        script = SqlScript()
+        if retention_days is not None:
+            if archive_table is not None:
+                archive_table = Table(SqlScript(
+                    filename=parse_path(archive_table)))
+                script.append(archive_table.exists_clone_script())
+            script.append(history.retention_script(
+                "SYSDATE - INTERVAL '%d days'" % int(retention_days),
+                archive_table=archive_table,
+                archive_path=archive_path,
+                archive_iam_role=archive_iam_role))
+
+        # Compact after the purge so that purged versions are not rewritten
+        if compact:
+            script.append(history.compaction_script(
+                key_columns, batch_count, gap_tolerance, hash_function))
+
+        self.activity = self.create_pipeline_object(
+            object_class=SqlActivity,
+            resource=self.resource,
+            schedule=self.schedule,
+            depends_on=self.depends_on,
+            database=redshift_database,
+            max_retries=self.max_retries,
+            script=self.create_script(S3File(text=script.sql())))
+
+    @classmethod
+    def arguments_processor(cls, etl, input_args):
+        """Parse the step arguments according to the ETL pipeline
+
+        Args:
+            etl(ETLPipeline): Pipeline object containing resources and steps
+            step_args(dict): Dictionary of the step arguments for the class
+        """
+        step_args = cls.base_arguments_processor(etl, input_args)
+        cls.pop_inputs(step_args)
+        step_args['resource'] = etl.ec2_resource
+        step_args['redshift_database'] = etl.redshift_database
+        return step_args
@@ -4,6 +4,9 @@ ETL step wrapper for RedshiftCopyActivity to load data into Redshift
 from .etl_step import ETLStep
 from ..pipeline import RedshiftNode
 from ..pipeline import RedshiftCopyActivity
+from ..utils import constants as const
+from ..utils.exceptions import ETLInputError
+from ..utils.file_split import copy_compression_option
 
 
 class LoadRedshiftStep(ETLStep):
@@ -17,6 +20,9 @@ class LoadRedshiftStep(ETLStep):
                  insert_mode="TRUNCATE",
                  max_errors=None,
                  replace_invalid_char=None,
+                 maintenance=None,
+                 split_compress=None,
+                 data_format=None,
                  **kwargs):
         """Constructor for the LoadRedshiftStep class
 
@@ -27,6 +33,12 @@ class LoadRedshiftStep(ETLStep):
             redshift_database(RedshiftDatabase): database to excute the query
             max_errors(int): Maximum number of errors to be ignored during load
             replace_invalid_char(char): char to replace not utf-8 with
+            maintenance(bool / dict): Analyze and vacuum the table after the
+                load when needed, with optional thresholds
+            split_compress(bool / dict): Split the input into compressed
+                parts for all the slices before the load
+            data_format(str): 'tsv' or 'parquet', the format of the input
+                node if None
             **kwargs(optional): Keyword arguments directly passed to base class
         """
         super(LoadRedshiftStep, self).__init__(**kwargs)
@@ -40,18 +52,38 @@ class LoadRedshiftStep(ETLStep):
             table_name=table,
         )
 
-        command_options = ["DELIMITER '\t' ESCAPE TRUNCATECOLUMNS"]
-        command_options.append("NULL AS 'NULL' ")
+        data_format = self.input_data_format(self.input, data_format)
+        if data_format == const.PARQUET_FORMAT:
+            # Columnar files are typed and can not be split or compressed
+            if split_compress or max_errors or replace_invalid_char:
+                raise ETLInputError('Parquet loads do not support '
+                                    'split_compress, max_errors and '
+                                    'replace_invalid_char')
+            command_options = ['FORMAT AS PARQUET']
+        else:
+            command_options = ["DELIMITER '\t' ESCAPE TRUNCATECOLUMNS"]
+            command_options.append("NULL AS 'NULL' ")
+
+        input_node = self.input
+        split_activity = None
+        if split_compress:
+            split_activity = self.create_split_compress_activity(
+                input_node, split_compress)
+            input_node = split_activity.output
+            _, compression = self.split_compress_options(split_compress)
+            if compression:
+                command_options.append(copy_compression_option(compression))
+
         if max_errors:
             command_options.append('MAXERROR %d' % int(max_errors))
         if replace_invalid_char:
             command_options.append(
                 "ACCEPTINVCHARS AS '%s'" %replace_invalid_char)
 
-        self.create_pipeline_object(
+        copy_activity = self.create_pipeline_object(
             object_class=RedshiftCopyActivity,
             max_retries=self.max_retries,
-            input_node=self.input,
+            input_node=input_node,
             output_node=self.output,
             insert_mode=insert_mode,
             resource=self.resource,
@@ -59,6 +91,13 @@ class LoadRedshiftStep(ETLStep):
             depends_on=self.depends_on,
             command_options=command_options,
         )
+        if split_activity is not None:
+            copy_activity['dependsOn'] = \
+                self._required_activities + [split_activity]
+
+        if schema:
+            table = '%s.%s' % (schema, table)
+        self.create_maintenance_activity(table, maintenance)
 
     @classmethod
     def arguments_processor(cls, etl, input_args):
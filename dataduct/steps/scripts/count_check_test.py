@@ -5,10 +5,14 @@ number of rows in the destination table
 """
 
 import argparse
+import os
 import pandas.io.sql as pdsql
 from dataduct.data_access import redshift_connection
 from dataduct.data_access import rds_connection
 from dataduct.qa import CountCheck
+from dataduct.utils.constants import DATA_FORMATS
+from dataduct.utils.constants import TSV_FORMAT
+from dataduct.utils.parquet import read_rows
 
 
 def _get_source_data(sql, hostname):
@@ -28,6 +32,23 @@ def _get_source_data(sql, hostname):
     return data.iloc[0][0]
 
 
+def _get_source_file_count(input_dir, data_format=TSV_FORMAT):
+    """Counts the records of the staged input files
+
+    Args:
+        input_dir(path): Directory with the input files
+        data_format(str): 'tsv' or 'parquet', the format of the files
+
+    Returns:
+        int: The number of records in all the files
+    """
+    input_paths = list()
+    for root, _, file_names in os.walk(input_dir):
+        input_paths.extend(os.path.join(root, file_name)
+                           for file_name in sorted(file_names))
+    return sum(1 for _ in read_rows(sorted(input_paths), data_format))
+
+
 def _get_destination_data(sql):
     """Gets the DataFrame containing all the rows of the table
     The DataFrame will be indexed by the table's primary key(s)
@@ -51,12 +72,17 @@ def main():
 
     Args (taken in through argparse):
         source_sql: SQL script of the source data
+        source_files: Count the staged input files instead of the source
+        source_data_format: Format of the staged input files
         destination_sql: SQL script of the destination data
     """
     parser = argparse.ArgumentParser()
 
-    parser.add_argument('--source_sql', dest='source_sql', required=True)
-    parser.add_argument('--source_host', dest='source_host', required=True)
+    parser.add_argument('--source_sql', dest='source_sql', default=None)
+    parser.add_argument('--source_host', dest='source_host', default=None)
+    parser.add_argument('--source_files', action='store_true', default=False)
+    parser.add_argument('--source_data_format', dest='source_data_format',
+                        default=TSV_FORMAT, choices=DATA_FORMATS)
     parser.add_argument('--destination_sql', dest='destination_sql',
                         required=True)
     parser.add_argument('--tolerance', type=float, dest='tolerance',
@@ -69,7 +95,13 @@ def main():
 
     args = parser.parse_args()
 
-    source_count = _get_source_data(args.source_sql, args.source_host)
+    if args.source_files:
+        source_count = _get_source_file_count(
+            os.environ['INPUT1_STAGING_DIR'], args.source_data_format)
+    elif args.source_sql is None or args.source_host is None:
+        parser.error('source_sql and source_host needed without source_files')
+    else:
+        source_count = _get_source_data(args.source_sql, args.source_host)
     destination_count = _get_destination_data(args.destination_sql)
 
     check = CountCheck(source_count, destination_count,
@@ -4,15 +4,31 @@
 """
 
 import argparse
+import json
 from dataduct.config import get_aws_credentials
 from dataduct.data_access import redshift_connection
+from dataduct.database import SqlScript
 from dataduct.database import SqlStatement
 from dataduct.database import Table
+from dataduct.s3 import S3Path
+from dataduct.s3.utils import build_copy_manifest
+from dataduct.s3.utils import upload_to_s3
+from dataduct.utils.constants import DATA_FORMATS
+from dataduct.utils.constants import PARQUET_FORMAT
+from dataduct.utils.constants import TSV_FORMAT
 
 
 def load_redshift(table, input_paths, max_error=0,
-                  replace_invalid_char=None, no_escape=False, gzip=False):
+                  replace_invalid_char=None, no_escape=False, gzip=False,
+                  manifest_path=None, zstd=False, swap=False,
+                  data_format=TSV_FORMAT):
     """Load redshift table with the data in the input s3 paths
+
+    With a manifest path a single COPY loads all the objects listed in the
+    manifest, so that they are loaded in parallel. With swap the table is a
+    new shadow table, so its rows are not deleted and the statistics are
+    left to the ANALYZE before the swap. Parquet files are typed, so the
+    text options do not apply to them
     """
     table_name = table.full_name
     print 'Loading data into %s' % table_name
@@ -31,24 +47,66 @@ def load_redshift(table, input_paths, max_error=0,
     else:
         invalid_char_str = ''
 
-    query = [delete_statement]
+    if swap:
+        query = list()
+        update_options = 'COMPUPDATE OFF STATUPDATE OFF'
+    else:
+        query = [delete_statement]
+        update_options = ''
+
+    if gzip:
+        compression = 'GZIP'
+    elif zstd:
+        compression = 'ZSTD'
+    else:
+        compression = ''
+
+    if manifest_path is not None:
+        input_paths = [manifest_path]
+
+    if data_format == PARQUET_FORMAT:
+        file_options = 'FORMAT AS PARQUET'
+    else:
+        file_options = (
+            "DELIMITER '\t' {escape} {compression} NULL AS 'NULL' "
+            "TRUNCATECOLUMNS {max_error} {invalid_char_str}"
+        ).format(escape='ESCAPE' if not no_escape else '',
+                 compression=compression,
+                 max_error=error_string,
+                 invalid_char_str=invalid_char_str)
 
     for input_path in input_paths:
         statement = (
             "COPY {table} FROM '{path}' WITH CREDENTIALS AS '{creds}' "
-            "DELIMITER '\t' {escape} {gzip} NULL AS 'NULL' TRUNCATECOLUMNS "
-            "{max_error} {invalid_char_str};"
+            "{file_options} {manifest} {update_options};"
         ).format(table=table_name,
                  path=input_path,
                  creds=creds,
-                 escape='ESCAPE' if not no_escape else '',
-                 gzip='GZIP' if gzip else '',
-                 max_error=error_string,
-                 invalid_char_str=invalid_char_str)
+                 file_options=file_options,
+                 manifest='MANIFEST' if manifest_path is not None else '',
+                 update_options=update_options)
         query.append(statement)
     return ' '.join(query)
 
 
+def upload_manifest(input_paths, manifest_path, mandatory=False,
+                    lister=None):
+    """Upload a COPY manifest of all the objects under the input s3 paths
+
+    Args:
+        input_paths(list of str): Uris of the input files or directories
+        manifest_path(str): Uri the manifest is uploaded to
+        mandatory(bool): Fail the COPY if any of the objects is missing
+        lister(function): Lists the objects under a path, see
+            dataduct.s3.utils.build_copy_manifest
+    """
+    manifest = build_copy_manifest(input_paths, mandatory, lister)
+    print 'Loading %d objects with manifest %s' % (
+        len(manifest['entries']), manifest_path)
+    upload_to_s3(S3Path(uri=manifest_path),
+                 file_text=json.dumps(manifest, indent=2))
+
+
 def main():
     """Main Function
     """
@@ -60,10 +118,22 @@ def main():
                         default=None)
     parser.add_argument('--no_escape', action='store_true', default=False)
     parser.add_argument('--gzip', action='store_true', default=False)
+    parser.add_argument('--zstd', action='store_true', default=False)
     parser.add_argument('--s3_input_paths', dest='input_paths', nargs='+')
+    parser.add_argument('--manifest_path', dest='manifest_path', default=None)
+    parser.add_argument('--manifest_mandatory', action='store_true',
+                        default=False)
+    parser.add_argument('--swap', action='store_true', default=False)
+    parser.add_argument('--dependencies', dest='dependencies', default=None)
+    parser.add_argument('--data_format', dest='data_format',
+                        default=TSV_FORMAT, choices=DATA_FORMATS)
     args = parser.parse_args()
     print args
 
+    if args.manifest_path is not None:
+        upload_manifest(args.input_paths, args.manifest_path,
+                        args.manifest_mandatory)
+
     connection = redshift_connection()
     cursor = connection.cursor()
 
@@ -72,13 +142,31 @@ def main():
     # Create table in redshift, this is safe due to the if exists condition
     cursor.execute(table.create_script().sql())
 
+    if args.swap:
+        # Load a shadow table that replaces the table once it is loaded
+        load_table = table.shadow_clone()
+        cursor.execute(load_table.drop_script().sql())
+        cursor.execute(load_table.create_script(grant_permissions=False).sql())
+    else:
+        load_table = table
+
     # Load data into redshift
-    load_query = load_redshift(table, args.input_paths, args.max_error,
+    load_query = load_redshift(load_table, args.input_paths, args.max_error,
                                args.replace_invalid_char, args.no_escape,
-                               args.gzip)
+                               args.gzip, args.manifest_path, args.zstd,
+                               args.swap, args.data_format)
 
     cursor.execute(load_query)
     cursor.execute('COMMIT')
+
+    if args.swap:
+        cursor.execute(load_table.analyze_script().sql())
+        if args.dependencies is not None:
+            dependencies = SqlScript(args.dependencies)
+        else:
+            dependencies = None
+        cursor.execute(table.swap_script(load_table, dependencies).sql())
+
     cursor.close()
     connection.close()
 
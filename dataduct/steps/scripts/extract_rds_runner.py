@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""Replacement for the extract rds step that streams the rows of the query
+straight from a server side cursor to S3
+"""
+
+import argparse
+import os
+import tempfile
+from dataduct.data_access import get_sql_config
+from dataduct.data_access import rds_connection
+from dataduct.s3 import S3Path
+from dataduct.s3.utils import DEFAULT_PART_SIZE
+from dataduct.s3.utils import DEFAULT_UPLOAD_WORKERS
+from dataduct.s3.utils import upload_stream_to_s3
+from dataduct.utils.constants import DATA_FORMATS
+from dataduct.utils.constants import PARQUET_FORMAT
+from dataduct.utils.constants import TSV_FORMAT
+from dataduct.utils.parquet import arrow_value
+from dataduct.utils.parquet import cursor_parquet_schema
+from dataduct.utils.parquet import write_parquet
+from dataduct.utils.tsv import encode_tsv_record
+
+DEFAULT_FETCH_SIZE = 10000
+READ_SIZE = 1024 * 1024
+
+
+def fetch_rows(cursor, fetch_size=DEFAULT_FETCH_SIZE):
+    """Rows of the executed query, fetched in batches from the cursor
+    """
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+def read_chunks(file_name, size=READ_SIZE):
+    """Chunks of the contents of a file
+    """
+    with open(file_name, 'rb') as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def extract_rds(cursor, output_path, data_format=TSV_FORMAT,
+                fetch_size=DEFAULT_FETCH_SIZE, part_size=DEFAULT_PART_SIZE,
+                workers=DEFAULT_UPLOAD_WORKERS):
+    """Stream the rows of the executed query to a file in S3
+
+    Tab separated rows are encoded and uploaded as they are fetched. Parquet
+    files are written to local disk one row group per fetch, as the footer
+    of the file is only known at the end, and then uploaded.
+
+    Returns:
+        result(int): Number of parts uploaded
+    """
+    rows = fetch_rows(cursor, fetch_size)
+    if data_format != PARQUET_FORMAT:
+        return upload_stream_to_s3(
+            output_path, (encode_tsv_record(row) for row in rows),
+            part_size, workers)
+
+    schema = cursor_parquet_schema(cursor.description)
+    type_names = [str(field.type) for field in schema]
+    records = ([arrow_value(value, type_name) for value, type_name
+                in zip(row, type_names)] for row in rows)
+
+    file_descriptor, file_name = tempfile.mkstemp(suffix='.parquet')
+    os.close(file_descriptor)
+    try:
+        write_parquet(records, file_name, schema, fetch_size)
+        return upload_stream_to_s3(
+            output_path, read_chunks(file_name), part_size, workers)
+    finally:
+        os.remove(file_name)
+
+
+def main():
+    """Main Function
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host_name', dest='host_name', required=True)
+    parser.add_argument('--database', dest='database', required=True)
+    parser.add_argument('--sql', dest='sql', required=True)
+    parser.add_argument('--output_path', dest='output_path', required=True)
+    parser.add_argument('--data_format', dest='data_format',
+                        default=TSV_FORMAT, choices=DATA_FORMATS)
+    parser.add_argument('--fetch_size', dest='fetch_size', type=int,
+                        default=DEFAULT_FETCH_SIZE)
+    parser.add_argument('--part_size', dest='part_size', type=int,
+                        default=DEFAULT_PART_SIZE)
+    parser.add_argument('--upload_workers', dest='upload_workers', type=int,
+                        default=DEFAULT_UPLOAD_WORKERS)
+    args = parser.parse_args()
+
+    sql_creds = dict(get_sql_config(args.host_name))
+    sql_creds['DATABASE'] = args.database
+
+    # The server side cursor of the connection keeps the rows on the server
+    connection = rds_connection(sql_creds=sql_creds)
+    cursor = connection.cursor()
+    cursor.execute(args.sql)
+
+    parts = extract_rds(cursor, S3Path(uri=args.output_path),
+                        args.data_format, args.fetch_size, args.part_size,
+                        args.upload_workers)
+    print 'Uploaded %s in %d parts' % (args.output_path, parts)
+
+    cursor.close()
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+"""Script that splits the staged input files into compressed parts, so that
+a Redshift COPY loads them in parallel on all the slices
+"""
+
+import argparse
+import os
+from dataduct.utils.file_split import COMPRESSIONS
+from dataduct.utils.file_split import split_files
+
+
+def main():
+    """Main function
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--part_count', dest='part_count', type=int,
+                        required=True)
+    parser.add_argument('--compression', dest='compression', default=None,
+                        choices=sorted(COMPRESSIONS))
+
+    args = parser.parse_args()
+
+    input_dir = os.environ['INPUT1_STAGING_DIR']
+    output_dir = os.environ['OUTPUT1_STAGING_DIR']
+
+    input_paths = list()
+    for root, _, file_names in os.walk(input_dir):
+        input_paths.extend(os.path.join(root, file_name)
+                           for file_name in sorted(file_names))
+
+    parts = split_files(sorted(input_paths), output_dir, args.part_count,
+                        args.compression)
+    print 'Split %d files into %d parts' % (len(input_paths), len(parts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""Script that analyzes and vacuums a table only when its statistics need it
+"""
+
+import argparse
+from dataduct.data_access import redshift_connection
+from dataduct.database.maintenance import TABLE_INFO_COLUMNS
+from dataduct.database.maintenance import maintenance_decisions
+from dataduct.database.maintenance import maintenance_script
+from dataduct.database.maintenance import table_info_script
+
+
+def main():
+    """Main function
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--table_name', dest='table_name', required=True)
+    parser.add_argument('--analyze_threshold', dest='analyze_threshold',
+                        type=float, default=None)
+    parser.add_argument('--vacuum_delete_threshold',
+                        dest='vacuum_delete_threshold', type=float,
+                        default=None)
+    parser.add_argument('--vacuum_sort_threshold',
+                        dest='vacuum_sort_threshold', type=float,
+                        default=None)
+
+    args = parser.parse_args()
+
+    connection = redshift_connection()
+    # VACUUM can not run inside a transaction block
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    cursor.execute(table_info_script(args.table_name).sql())
+    row = cursor.fetchone()
+    table_info = dict(zip(TABLE_INFO_COLUMNS, row)) if row else None
+
+    decisions = maintenance_decisions(
+        table_info, args.analyze_threshold,
+        args.vacuum_delete_threshold, args.vacuum_sort_threshold)
+    for command, run, reason in decisions:
+        print '%s %s: %s' % ('Running' if run else 'Skipping', command, reason)
+
+    for statement in maintenance_script(args.table_name, decisions):
+        cursor.execute(statement.sql())
+
+    cursor.close()
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,30 @@
 """ETL step wrapper for Upsert SQL script
 """
 from .etl_step import ETLStep
+from ..config import Config
 from ..pipeline import SqlActivity
 from ..database import Table
 from ..database import SqlScript
 from ..database import SelectStatement
 from ..database import HistoryTable
+from ..database.table import DELETE_IN
+from ..database.table import order_by_list
 from ..s3 import S3File
 from ..utils.helpers import parse_path
 from ..utils.helpers import exactly_one
+from ..utils.helpers import atmost_one
+from ..utils.exceptions import ETLInputError
+
+import logging
+logger = logging.getLogger(__name__)
+
+config = Config()
+SUPPORTS_MERGE = getattr(config, 'redshift', dict()).get(
+    'SUPPORTS_MERGE', False)
+
+UPSERT_DELETE_INSERT = 'delete_insert'
+UPSERT_MERGE = 'merge'
+UPSERT_METHODS = [UPSERT_DELETE_INSERT, UPSERT_MERGE]
 
 
 class UpsertStep(ETLStep):
@@ -17,13 +33,61 @@ class UpsertStep(ETLStep):
 
     def __init__(self, destination, redshift_database, sql=None,
                  script=None, source=None, enforce_primary_key=True,
-                 delete_existing=False, history=None, **kwargs):
+                 delete_existing=False, history=None, delete_method=DELETE_IN,
+                 dedupe_order_by=None, dedupe_latest_column=None,
+                 staging_attributes=None, history_hash_function=None,
+                 history_hash_column=None, history_changes=None,
+                 history_watermark_column=None, history_detect_deletes=None,
+                 upsert_method=UPSERT_DELETE_INSERT, chunk_count=None,
+                 chunk_column=None, chunk_rows=None, maintenance=None,
+                 history_current=None, **kwargs):
         """Constructor for the UpsertStep class
 
         Args:
+            delete_method(str): 'in' to delete the matching rows with a
+                subquery or 'join' to delete them with a join
+            dedupe_order_by(str): Order of the source rows with the same
+                primary key, the first row is kept. Only a list of columns
+                with optional ASC / DESC and NULLS FIRST / LAST
+            dedupe_latest_column(str): Keep the source row with the latest
+                value of the column for every primary key
+            staging_attributes(dict): Overrides of the diststyle, dist_keys
+                and sort_keys of the staging tables, or inherit_attributes
+                set to false to use the default distribution
+            history_hash_function(str): Detect changed history rows with a
+                'md5' or 'fnv' hash of the non-key columns
+            history_hash_column(str): Last column of the history table that
+                stores the hash of every row
+            history_changes(str): Select statement for the changed rows of
+                the destination, to only update their history
+            history_watermark_column(str): Column of the destination that
+                increases with every change, to only update newer rows
+            history_detect_deletes(bool): Expire the history of rows deleted
+                from the destination, by default only for full updates
+            history_current(str): Definition of a table with the columns of
+                the destination, kept in sync with the current history rows
+            upsert_method(str): 'delete_insert' to delete the matching rows
+                and insert the source or 'merge' to use a MERGE statement,
+                which needs SUPPORTS_MERGE in the redshift config
+            chunk_count(int): Upsert the source in this many ranges of the
+                chunk column, committing every range separately so that a
+                failed run resumes from the first uncommitted range
+            chunk_column(str): Column of the destination the chunks are
+                ranges of, defaults to the first primary key
+            chunk_rows(int): Target number of rows of every chunk, with
+                chunk_count as the maximum number of chunks
+            maintenance(bool / dict): Analyze and vacuum the destination
+                after the upsert when needed, with optional thresholds
             **kwargs(optional): Keyword arguments directly passed to base class
         """
         assert exactly_one(sql, source, script), 'One of sql/source/script'
+        assert atmost_one(dedupe_order_by, dedupe_latest_column), \
+            'Only one of dedupe_order_by/dedupe_latest_column'
+        if upsert_method not in UPSERT_METHODS:
+            raise ETLInputError('Upsert method must be one of %s' %
+                                ', '.join(UPSERT_METHODS))
+        if chunk_count is None and (chunk_column or chunk_rows):
+            raise ETLInputError('Chunked upserts need a chunk_count')
         super(UpsertStep, self).__init__(**kwargs)
 
         # Input formatting
@@ -34,15 +98,70 @@ class UpsertStep(ETLStep):
             source_relation = SelectStatement(
                 SqlScript(sql=sql, filename=script).sql())
 
+        if dedupe_latest_column is not None:
+            dedupe_order_by = '%s DESC NULLS LAST' % dedupe_latest_column
+        if dedupe_order_by is not None:
+            # The order is put into the SQL as is, so only allow columns
+            try:
+                dedupe_order_by = order_by_list(dedupe_order_by)
+            except ValueError as error:
+                raise ETLInputError(error)
+
         # Create the destination table if doesn't exist
         script = dest.exists_clone_script()
-        script.append(dest.upsert_script(
-            source_relation, enforce_primary_key, delete_existing))
+        if upsert_method == UPSERT_MERGE and not SUPPORTS_MERGE:
+            logger.warning('Redshift does not support MERGE, upserting into '
+                           '%s with delete and insert', dest.full_name)
+            upsert_method = UPSERT_DELETE_INSERT
+
+        if chunk_count is not None:
+            if upsert_method == UPSERT_MERGE:
+                logger.warning('Chunked upserts into %s use delete and insert',
+                               dest.full_name)
+            script.append(dest.chunked_upsert_script(
+                source_relation, chunk_count,
+                chunk_column=chunk_column,
+                chunk_rows=chunk_rows,
+                enforce_primary_key=enforce_primary_key,
+                delete_existing=delete_existing,
+                delete_method=delete_method,
+                dedupe_order_by=dedupe_order_by,
+                staging_attributes=staging_attributes))
+        elif upsert_method == UPSERT_MERGE:
+            script.append(dest.merge_script(
+                source_relation,
+                enforce_primary_key=enforce_primary_key,
+                delete_existing=delete_existing,
+                dedupe_order_by=dedupe_order_by,
+                staging_attributes=staging_attributes))
+        else:
+            script.append(dest.upsert_script(
+                source_relation,
+                enforce_primary_key=enforce_primary_key,
+                delete_existing=delete_existing,
+                delete_method=delete_method,
+                dedupe_order_by=dedupe_order_by,
+                staging_attributes=staging_attributes))
 
         if history:
             hist = HistoryTable(SqlScript(
                 filename=parse_path(history)))
-            script.append(hist.update_history_script(dest))
+            if history_changes is not None:
+                history_changes = SelectStatement(history_changes)
+            if history_current is not None:
+                history_current = Table(SqlScript(
+                    filename=parse_path(history_current)))
+                script.append(history_current.exists_clone_script())
+            script.append(hist.update_history_script(
+                dest,
+                delete_method=delete_method,
+                staging_attributes=staging_attributes,
+                hash_function=history_hash_function,
+                hash_column=history_hash_column,
+                changes=history_changes,
+                watermark_column=history_watermark_column,
+                detect_deletes=history_detect_deletes,
+                current_table=history_current))
 
         self.activity = self.create_pipeline_object(
             object_class=SqlActivity,
@@ -53,6 +172,8 @@ class UpsertStep(ETLStep):
             max_retries=self.max_retries,
             script=self.create_script(S3File(text=script.sql())))
 
+        self.create_maintenance_activity(dest.full_name, maintenance)
+
     @classmethod
     def arguments_processor(cls, etl, input_args):
         """Parse the step arguments according to the ETL pipeline
@@ -34,3 +34,14 @@ COLUMN_CHECK_SCRIPT_PATH = os.path.join(
     SCRIPTS_DIRECTORY, 'column_check_test.py')
 CREATE_LOAD_SCRIPT_PATH = os.path.join(
     SCRIPTS_DIRECTORY, 'create_load_redshift_runner.py')
+TABLE_MAINTENANCE_SCRIPT_PATH = os.path.join(
+    SCRIPTS_DIRECTORY, 'table_maintenance.py')
+SPLIT_COMPRESS_SCRIPT_PATH = os.path.join(
+    SCRIPTS_DIRECTORY, 'split_compress.py')
+EXTRACT_RDS_SCRIPT_PATH = os.path.join(
+    SCRIPTS_DIRECTORY, 'extract_rds_runner.py')
+
+# Data formats of the files exchanged between steps
+TSV_FORMAT = 'tsv'
+PARQUET_FORMAT = 'parquet'
+DATA_FORMATS = [TSV_FORMAT, PARQUET_FORMAT]
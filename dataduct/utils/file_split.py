@@ -0,0 +1,124 @@
+"""
+Split delimited files into compressed parts for a parallel Redshift COPY
+"""
+import gzip
+import os
+
+from .exceptions import ETLInputError
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+# File extension and COPY option of every compression
+COMPRESSIONS = {
+    GZIP: ('.gz', 'GZIP'),
+    ZSTD: ('.zst', 'ZSTD'),
+}
+
+# Leading bytes of compressed files, none of them starts valid UTF-8 text
+MAGIC_NUMBERS = {
+    '\x1f\x8b': GZIP,
+    '\x28\xb5\x2f\xfd': ZSTD,
+    '\x89LZO': 'lzop',
+}
+
+
+def copy_compression_option(compression):
+    """Option of the Redshift COPY command for files with the compression
+
+    Args:
+        compression(str): 'gzip', 'zstd' or None for uncompressed files
+    """
+    if compression is None:
+        return None
+    if compression not in COMPRESSIONS:
+        raise ETLInputError('Compression must be one of %s' %
+                            ', '.join(sorted(COMPRESSIONS)))
+    return COMPRESSIONS[compression][1]
+
+
+def _check_uncompressed(input_file, input_path):
+    """Reject input files that are already compressed
+    """
+    header = input_file.read(max(len(x) for x in MAGIC_NUMBERS))
+    input_file.seek(0)
+    for magic_number, compression in MAGIC_NUMBERS.items():
+        if header.startswith(magic_number):
+            raise ETLInputError('Input %s is already compressed with %s' % (
+                input_path, compression))
+
+
+def _open_part(path, compression):
+    """Open a part file for writing with the compression
+    """
+    if compression == GZIP:
+        return gzip.open(path, 'wb')
+
+    if compression == ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise ETLInputError('Install zstandard to compress with zstd')
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+
+    return open(path, 'wb')
+
+
+def split_files(input_paths, output_dir, part_count, compression=None,
+                prefix='part-'):
+    """Split the lines of the input files into parts of similar sizes
+
+    Note:
+        The inputs are streamed, lines are never split and they keep their
+        order across the parts. A missing newline at the end of an input is
+        added so that its last line is not joined with the next input.
+
+    Args:
+        input_paths(list of file_path): Files to be split, in order
+        output_dir(file_path): Directory the parts are written to
+        part_count(int): Number of parts, fewer parts are written if the
+            input has fewer lines
+        compression(str): 'gzip', 'zstd' or None to leave the parts as is
+        prefix(str): Prefix of the names of the parts
+
+    Returns:
+        result(list of file_path): Paths of the parts that were written
+
+    Raises:
+        ETLInputError: If an input is compressed, as it can not be split
+    """
+    if part_count < 1:
+        raise ETLInputError('Part count must be positive')
+    copy_compression_option(compression)
+    extension = COMPRESSIONS[compression][0] if compression else ''
+
+    total_size = sum(os.path.getsize(path) for path in input_paths)
+    part_size = float(total_size) / part_count
+
+    parts = list()
+    part = None
+    position = 0
+    try:
+        for input_path in input_paths:
+            with open(input_path, 'rb') as input_file:
+                _check_uncompressed(input_file, input_path)
+                for line in input_file:
+                    if not line.endswith('\n'):
+                        line += '\n'
+                    # Start the next part once most of the line is past the
+                    # end of the current one
+                    if part is None or (
+                            len(parts) < part_count and
+                            position + len(line) / 2.0 >
+                            len(parts) * part_size):
+                        if part is not None:
+                            part.close()
+                        parts.append(os.path.join(output_dir, '%s%05d%s' % (
+                            prefix, len(parts), extension)))
+                        part = _open_part(parts[-1], compression)
+                    part.write(line)
+                    position += len(line)
+    finally:
+        if part is not None:
+            part.close()
+    return parts
@@ -0,0 +1,201 @@
+"""
+Write the Parquet files extracted from the databases and read the files
+exchanged between the steps for the QA checks
+
+Note:
+    pyarrow is only needed for reading and writing Parquet files, it is
+    imported when it is used
+"""
+from . import constants as const
+from .exceptions import ETLInputError
+from .tsv import read_tsv_records
+
+# Rows written in every row group, bounds the memory used by the writer
+DEFAULT_ROW_GROUP_SIZE = 100000
+
+# Arrow types of the MySQL field type codes of a cursor description, see
+# MySQLdb.constants.FIELD_TYPE
+MYSQL_ARROW_TYPES = {
+    0: 'decimal',           # DECIMAL
+    1: 'int16',             # TINY
+    2: 'int16',             # SHORT
+    3: 'int64',             # LONG, int64 for the unsigned values
+    4: 'float',             # FLOAT
+    5: 'double',            # DOUBLE
+    7: 'timestamp[us]',     # TIMESTAMP
+    8: 'int64',             # LONGLONG
+    9: 'int32',             # INT24
+    10: 'date32',           # DATE
+    12: 'timestamp[us]',    # DATETIME
+    13: 'int16',            # YEAR
+    14: 'date32',           # NEWDATE
+    246: 'decimal',         # NEWDECIMAL
+}
+DEFAULT_DECIMAL = (18, 0)
+MAX_DECIMAL_PRECISION = 38
+STRING_TYPE = 'string'
+
+
+def _import_pyarrow():
+    """Import pyarrow and its parquet module
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ETLInputError('Install pyarrow to read or write Parquet files')
+    return pyarrow, pyarrow.parquet
+
+
+def mysql_arrow_type_name(type_code, precision=None, scale=None):
+    """Name of the arrow type storing the values of a MySQL field type
+
+    Args:
+        type_code(int): Type code of the field in the cursor description
+        precision(int): Display size of the field, bounds the precision of
+            decimals
+        scale(int): Number of decimals of the field
+
+    Returns:
+        result(str): Arrow type alias or decimal(precision,scale), string for
+            the types without an arrow equivalent
+    """
+    type_name = MYSQL_ARROW_TYPES.get(type_code, STRING_TYPE)
+    if type_name == 'decimal':
+        return 'decimal(%d,%d)' % (
+            min(precision or DEFAULT_DECIMAL[0], MAX_DECIMAL_PRECISION),
+            scale or DEFAULT_DECIMAL[1])
+    return type_name
+
+
+def _arrow_type(type_name):
+    """Arrow type of the type name returned by mysql_arrow_type_name
+    """
+    pyarrow = _import_pyarrow()[0]
+    if type_name.startswith('decimal'):
+        precision, scale = type_name[len('decimal('):-1].split(',')
+        return pyarrow.decimal128(int(precision), int(scale))
+    return pyarrow.type_for_alias(type_name)
+
+
+def cursor_parquet_schema(description):
+    """Arrow schema with the columns of a MySQL cursor
+
+    Args:
+        description(list of tuple): Description of the cursor after the query
+    """
+    pyarrow = _import_pyarrow()[0]
+    return pyarrow.schema([
+        pyarrow.field(column[0], _arrow_type(mysql_arrow_type_name(
+            type_code=column[1], precision=column[4], scale=column[5])))
+        for column in description])
+
+
+def arrow_value(value, type_name):
+    """Convert a value returned by a database driver to the arrow type
+
+    Note:
+        Only the values of string columns are converted, as they also hold
+        the values of types without an arrow equivalent
+
+    Args:
+        value(object): Value of a column, None for NULL
+        type_name(str): Type name of the column
+    """
+    if value is None or type_name != STRING_TYPE or \
+            isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return unicode(value)
+
+
+def write_parquet(records, path, schema,
+                  row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Stream the records into a Parquet file one row group at a time
+
+    Args:
+        records(iterable of list): Values of the records in schema order
+        path(file_path): Path of the Parquet file
+        schema(pyarrow.Schema): Schema of the file, see
+            cursor_parquet_schema
+        row_group_size(int): Rows held in memory and written per row group
+
+    Returns:
+        result(int): Number of records written
+    """
+    pyarrow, parquet = _import_pyarrow()
+
+    def write_batch(writer, batch):
+        """Write the batch of records as a row group
+        """
+        arrays = [pyarrow.array(list(values), type=field.type)
+                  for values, field in zip(zip(*batch), schema)]
+        writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+
+    count = 0
+    batch = list()
+    writer = parquet.ParquetWriter(path, schema)
+    try:
+        for record in records:
+            if len(record) != len(schema):
+                raise ETLInputError('Record %d has %d values, expected %d' % (
+                    count + 1, len(record), len(schema)))
+            batch.append(record)
+            count += 1
+            if len(batch) >= row_group_size:
+                write_batch(writer, batch)
+                batch = list()
+        if batch:
+            write_batch(writer, batch)
+    finally:
+        writer.close()
+    return count
+
+
+def read_parquet(paths, columns=None):
+    """Read the rows of Parquet files one row group at a time
+
+    Args:
+        paths(list of file_path): Parquet files
+        columns(list of str): Columns to read, all of them if None
+
+    Returns:
+        result(generator of tuple): Values of every row
+    """
+    _, parquet = _import_pyarrow()
+    for path in paths:
+        parquet_file = parquet.ParquetFile(path)
+        for index in range(parquet_file.num_row_groups):
+            row_group = parquet_file.read_row_group(index, columns=columns)
+            values = [row_group.column(i).to_pylist()
+                      for i in range(row_group.num_columns)]
+            for row in zip(*values):
+                yield row
+
+
+def read_rows(paths, data_format=const.TSV_FORMAT):
+    """Read the rows of the files written by a step, used by the QA checks
+
+    Args:
+        paths(list of file_path): Files in the data format
+        data_format(str): 'tsv' or 'parquet'
+
+    Returns:
+        result(generator of tuple): Values of every row, the values of tab
+            separated files are strings
+    """
+    if data_format == const.PARQUET_FORMAT:
+        return read_parquet(paths)
+    if data_format != const.TSV_FORMAT:
+        raise ETLInputError('Data format must be one of %s' %
+                            ', '.join(const.DATA_FORMATS))
+
+    def tsv_rows():
+        """Rows of all the tab separated files
+        """
+        for path in paths:
+            with open(path) as input_file:
+                for record in read_tsv_records(input_file):
+                    yield tuple(record)
+    return tsv_rows()
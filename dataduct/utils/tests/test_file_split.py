@@ -0,0 +1,98 @@
+"""Tests for splitting files into compressed parts
+"""
+import gzip
+import os
+import unittest
+from testfixtures import TempDirectory
+from nose.tools import raises
+from nose.tools import eq_
+
+from ..file_split import copy_compression_option
+from ..file_split import split_files
+from ..exceptions import ETLInputError
+
+
+class FileSplitTests(unittest.TestCase):
+    """Tests for splitting files into compressed parts
+    """
+
+    def setUp(self):
+        """Setup the input files
+        """
+        self.temp_dir = TempDirectory()
+        self.lines = ['%d\trow %d\n' % (i, i) for i in range(10)]
+        self.input_paths = [
+            self.temp_dir.write('input/a.tsv', ''.join(self.lines[:7])),
+            self.temp_dir.write('input/b.tsv', ''.join(self.lines[7:])),
+        ]
+        self.output_dir = self.temp_dir.makedir('output')
+
+    def tearDown(self):
+        """Remove the files
+        """
+        self.temp_dir.cleanup()
+
+    def test_split_files(self):
+        """The lines are split in order into parts of similar sizes
+        """
+        parts = split_files(self.input_paths, self.output_dir, 4)
+        eq_([os.path.basename(p) for p in parts],
+            ['part-00000', 'part-00001', 'part-00002', 'part-00003'])
+
+        contents = [open(p).read() for p in parts]
+        eq_(''.join(contents), ''.join(self.lines))
+        for content in contents:
+            eq_(content.endswith('\n'), True)
+            eq_(len(content.splitlines()) in [2, 3], True)
+
+    def test_split_files_gzip(self):
+        """The parts are compressed with gzip
+        """
+        parts = split_files(self.input_paths, self.output_dir, 2, 'gzip')
+        eq_([os.path.basename(p) for p in parts],
+            ['part-00000.gz', 'part-00001.gz'])
+        eq_(''.join(gzip.open(p).read() for p in parts), ''.join(self.lines))
+
+    def test_split_files_few_lines(self):
+        """Lines are never split across parts
+        """
+        parts = split_files(self.input_paths[1:], self.output_dir, 10)
+        eq_(len(parts), 3)
+
+    def test_split_files_missing_newline(self):
+        """The last line of an input without a newline is kept apart
+        """
+        input_paths = [self.temp_dir.write('input/c.tsv', 'a\tb'),
+                       self.temp_dir.write('input/d.tsv', 'c\td\n')]
+        parts = split_files(input_paths, self.output_dir, 1)
+        eq_(open(parts[0]).read(), 'a\tb\nc\td\n')
+
+    @raises(ETLInputError)
+    def test_split_files_compressed_input(self):
+        """Compressed inputs can not be split into lines
+        """
+        path = self.temp_dir.getpath('input/c.tsv.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(''.join(self.lines))
+        split_files([path], self.output_dir, 2)
+
+    @staticmethod
+    def test_copy_compression_option():
+        """The COPY option of every compression
+        """
+        eq_(copy_compression_option('gzip'), 'GZIP')
+        eq_(copy_compression_option('zstd'), 'ZSTD')
+        eq_(copy_compression_option(None), None)
+
+    @staticmethod
+    @raises(ETLInputError)
+    def test_copy_compression_option_unknown():
+        """Only gzip and zstd are supported
+        """
+        copy_compression_option('bzip2')
+
+    @raises(ETLInputError)
+    def test_split_files_no_parts(self):
+        """At least one part is written
+        """
+        split_files(self.input_paths, self.output_dir, 0)
@@ -0,0 +1,107 @@
+"""Tests for reading and writing Parquet files
+"""
+import unittest
+from datetime import date
+from decimal import Decimal
+from testfixtures import TempDirectory
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+
+from ..parquet import arrow_value
+from ..parquet import cursor_parquet_schema
+from ..parquet import mysql_arrow_type_name
+from ..parquet import read_rows
+from ..parquet import write_parquet
+from ..exceptions import ETLInputError
+
+# Description of a MySQL cursor with an INT, DECIMAL(10,2), DATE and VARCHAR
+DESCRIPTION = [
+    ('id', 3, 11, 11, 11, 0, False),
+    ('amount', 246, 12, 12, 10, 2, True),
+    ('day', 10, 10, 10, 10, 0, True),
+    ('name', 253, 20, 20, 20, 0, True),
+]
+
+
+class ParquetTests(unittest.TestCase):
+    """Tests for reading and writing Parquet files
+    """
+
+    def setUp(self):
+        """Setup the output directory
+        """
+        self.temp_dir = TempDirectory()
+
+    def tearDown(self):
+        """Remove the files
+        """
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def test_mysql_arrow_type_name():
+        """MySQL field types are mapped to arrow types
+        """
+        eq_(mysql_arrow_type_name(3), 'int64')
+        eq_(mysql_arrow_type_name(246, 10, 2), 'decimal(10,2)')
+        eq_(mysql_arrow_type_name(246, 70, 4), 'decimal(38,4)')
+        eq_(mysql_arrow_type_name(0), 'decimal(18,0)')
+        eq_(mysql_arrow_type_name(12), 'timestamp[us]')
+        eq_(mysql_arrow_type_name(253), 'string')
+
+    @staticmethod
+    def test_arrow_value():
+        """Only the values of string columns are converted to unicode
+        """
+        eq_(arrow_value('caf\xc3\xa9', 'string'), u'caf\xe9')
+        eq_(arrow_value(Decimal('1.5'), 'string'), u'1.5')
+        eq_(arrow_value(12, 'int64'), 12)
+        eq_(arrow_value(None, 'string'), None)
+
+    def test_write_parquet(self):
+        """Records of a cursor are written into typed Parquet files
+        """
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise SkipTest('pyarrow is not installed')
+
+        records = [
+            [1, Decimal('1.50'), date(2015, 1, 1), u'first'],
+            [2, None, None, u'second'],
+        ]
+        path = self.temp_dir.getpath('data.parquet')
+        eq_(write_parquet(records, path, cursor_parquet_schema(DESCRIPTION),
+                          row_group_size=1), 2)
+
+        parquet_file = parquet.ParquetFile(path)
+        eq_(parquet_file.num_row_groups, 2)
+        eq_(list(read_rows([path], 'parquet')),
+            [tuple(record) for record in records])
+
+        # Records must have a value for every column
+        try:
+            write_parquet([[1]], path, cursor_parquet_schema(DESCRIPTION))
+        except ETLInputError:
+            pass
+        else:
+            raise AssertionError('Short record was written')
+
+    def test_read_rows(self):
+        """Tab separated files are read as rows of strings
+        """
+        self.temp_dir.write('part-0', 'a\tNULL\nb\\\tc\td\n')
+        self.temp_dir.write('part-1', 'e\tf')
+        eq_(list(read_rows([self.temp_dir.getpath('part-0'),
+                            self.temp_dir.getpath('part-1')])),
+            [('a', None), ('b\tc', 'd'), ('e', 'f')])
+
+    def test_read_rows_unknown_format(self):
+        """Only the data formats of the steps can be read
+        """
+        self.temp_dir.write('part-0', 'a')
+        try:
+            read_rows([self.temp_dir.getpath('part-0')], 'csv')
+        except ETLInputError:
+            pass
+        else:
+            raise AssertionError('Unknown format was read')
@@ -0,0 +1,62 @@
+"""Tests for encoding and decoding tab separated files
+"""
+import unittest
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+from nose.tools import eq_
+
+from ..tsv import encode_tsv_record
+from ..tsv import encode_tsv_value
+from ..tsv import read_tsv_records
+
+
+class TsvTests(unittest.TestCase):
+    """Tests for encoding and decoding tab separated files
+    """
+
+    @staticmethod
+    def test_encode_tsv_value():
+        """Values are written in the formats COPY reads
+        """
+        eq_(encode_tsv_value(None), 'NULL')
+        eq_(encode_tsv_value(12), '12')
+        eq_(encode_tsv_value(0.1), '0.1')
+        eq_(encode_tsv_value(True), 'true')
+        eq_(encode_tsv_value(Decimal('1.50')), '1.50')
+        eq_(encode_tsv_value(date(2015, 1, 2)), '2015-01-02')
+        eq_(encode_tsv_value(datetime(2015, 1, 2, 3, 4, 5)),
+            '2015-01-02 03:04:05')
+        eq_(encode_tsv_value(u'caf\xe9'), 'caf\xc3\xa9')
+
+    @staticmethod
+    def test_encode_tsv_value_escapes():
+        """Separators, backslashes and the null string are escaped
+        """
+        eq_(encode_tsv_value('a\tb\nc\\d\x00'), 'a\\\tb\\\nc\\\\d')
+        eq_(encode_tsv_value('NULL'), '\\NULL')
+
+    @staticmethod
+    def test_read_tsv_records():
+        """Escaped tabs and newlines are kept in the values
+        """
+        lines = ['1\tfirst\\\tline\n', '2\tNULL\tsecond\\\n', 'line\n']
+        eq_(list(read_tsv_records(lines)), [
+            ['1', 'first\tline'],
+            ['2', None, 'second\nline'],
+        ])
+
+    @staticmethod
+    def test_read_tsv_records_escaped_null():
+        """Only the unescaped null string is NULL
+        """
+        eq_(list(read_tsv_records(['a\\\\b\t\\NULL\tNULL'])),
+            [['a\\b', 'NULL', None]])
+
+    @staticmethod
+    def test_round_trip():
+        """Encoded records are read back as the strings of their values
+        """
+        record = (1, None, 'NULL', 'a\tb\\\nc', u'\xe9')
+        eq_(list(read_tsv_records([encode_tsv_record(record)])),
+            [['1', None, 'NULL', 'a\tb\\\nc', '\xc3\xa9']])
@@ -0,0 +1,104 @@
+"""
+Encode and decode the tab separated files exchanged between the steps
+
+Note:
+    The files are written for the COPY options DELIMITER '\\t' ESCAPE and
+    NULL AS 'NULL', backslashes escape the tabs, newlines and backslashes
+    that are part of the values
+"""
+import re
+
+from . import constants as const
+
+ESCAPE_REGEX = re.compile(r'[\\\t\n\r]')
+
+
+def encode_tsv_value(value, null_string=const.NULL_STR):
+    """Encode a value of a database row as an escaped field
+
+    Args:
+        value(object): Value returned by the database driver, None for NULL
+        null_string(str): Field representing NULL
+
+    Returns:
+        result(str): utf-8 encoded field, NUL characters are removed as
+            Redshift does not load them
+    """
+    if value is None:
+        return null_string
+
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif isinstance(value, bool):
+        value = 'true' if value else 'false'
+    elif isinstance(value, float):
+        value = repr(value)
+    elif not isinstance(value, str):
+        # Dates, times and decimals are written in the formats COPY reads
+        value = str(value)
+
+    value = ESCAPE_REGEX.sub(r'\\\g<0>', value.replace('\x00', ''))
+    if value == null_string:
+        # Values equal to the null string are escaped to stay values
+        return '\\' + value
+    return value
+
+
+def encode_tsv_record(record, null_string=const.NULL_STR):
+    """Encode a database row as an escaped line
+
+    Args:
+        record(tuple): Values of the row
+        null_string(str): Field representing NULL
+    """
+    return '\t'.join(encode_tsv_value(value, null_string)
+                     for value in record) + '\n'
+
+
+def read_tsv_records(lines, null_string=const.NULL_STR):
+    """Split tab separated lines written with the ESCAPE option into records
+
+    Note:
+        Escaped tabs and newlines are part of the values, so a record can
+        span several lines
+
+    Args:
+        lines(iterable of str): Lines of the files
+        null_string(str): Unescaped value representing NULL
+
+    Returns:
+        result(generator of list): Values of every record, None for NULL
+    """
+    fields = list()
+    value = list()
+    raw = list()
+    escaped = False
+    for line in lines:
+        # Most lines hold complete records without escapes
+        if not fields and not value and not raw and '\\' not in line:
+            yield [None if x == null_string else x
+                   for x in line.rstrip('\n').split('\t')]
+            continue
+
+        for char in line:
+            raw.append(char)
+            if escaped:
+                value.append(char)
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '\t' or char == '\n':
+                raw.pop()
+                fields.append(None if ''.join(raw) == null_string
+                              else ''.join(value))
+                value = list()
+                raw = list()
+                if char == '\n':
+                    yield fields
+                    fields = list()
+            else:
+                value.append(char)
+
+    if fields or raw:
+        fields.append(None if ''.join(raw) == null_string else ''.join(value))
+        yield fields
@@ -0,0 +1,6 @@
+CREATE TABLE dev.test_table_history(
+    effective_ts TIMESTAMP,
+    expiration_ts TIMESTAMP,
+    id INTEGER,
+    description VARCHAR(255)
+);
@@ -27,6 +27,10 @@ setup(
         'testfixtures',
         'sphinx_rtd_theme'
     ],
+    extras_require={
+        # Last pyarrow release supporting Python 2.7
+        'parquet': ['pyarrow==0.16.0'],
+    },
     scripts=['bin/dataduct'],
     classifiers=[
         'Development Status :: 5 - Production/Stable',